@@ -1,6 +1,12 @@
 import os
 from flask import Flask, render_template, session, request, redirect, url_for
 from flask_cors import CORS
+import compression
+import db
+import diagnostics
+import feedback_queue
+import metrics
+import serialization
 from models import init_db
 from routes.feedback import feedback_bp
 from routes.admin import admin_bp
@@ -13,6 +19,12 @@ app.secret_key = '1234'  # Необхідно для роботи з сесія
 app.config['ADMIN_PASSWORD'] = os.environ.get('ADMIN_PASSWORD', '123')
 # Пароль для доступу до API-Demo (можна задати змінною оточення)
 app.config['API_DEMO_PASSWORD'] = os.environ.get('API_DEMO_PASSWORD', '123')
+# Максимальний розмір сторінки для списків (API та /shop), клієнт не може запросити більше
+app.config['MAX_PAGE_SIZE'] = int(os.environ.get('MAX_PAGE_SIZE', 200))
+# Скільки секунд браузер/nginx можуть повторно використовувати відповіді каталогу й відгуків (ETag + 304 після цього)
+app.config['API_CACHE_MAX_AGE'] = int(os.environ.get('API_CACHE_MAX_AGE', 5))
+# Максимальна кількість замовлень в одному запиті POST /api/v1/orders/batch
+app.config['ORDER_BATCH_MAX'] = int(os.environ.get('ORDER_BATCH_MAX', 1000))
 
 # ============================================
 # НАЛАШТУВАННЯ CORS
@@ -38,8 +50,24 @@ try:
 except ImportError:
     print("Warning: Flasgger not installed. Install with: pip install Flasgger")
 
-# Ініціалізація бази даних
-init_db()
+# Ініціалізація бази даних (міграції). Під gunicorn її виконує init_db.py, який master
+# запускає окремим процесом (gunicorn.conf.py), і передає воркерам INIT_DB=0.
+if os.environ.get('INIT_DB', '1') != '0':
+    init_db()
+    # Дописуємо в БД відгуки, що лишились у спулі після аварійної зупинки (feedback_queue.py)
+    if feedback_queue.queue_enabled():
+        feedback_queue.get_queue().recover()
+# JSON через orjson, якщо він встановлений (JSON_BACKEND=json залишає стандартний json)
+serialization.init_app(app)
+# Стиснення відповідей (gzip, br/zstd за наявності модулів); реєструється першим, тож виконується
+# після решти after_request-обробників (COMPRESSION=0 вимикає, якщо стискає nginx)
+compression.init_app(app)
+# Час запитів і SQL по ендпоінтах: заголовок Server-Timing і /metrics (METRICS=0 вимикає)
+metrics.init_app(app)
+# Профілювання запиту для адміністратора (заголовок X-Profile: 1); повільні SQL-запити пише db.py у LOG_DIR
+diagnostics.init_app(app)
+# Повертаємо з'єднання з БД у пул після кожного запиту
+db.init_app(app)
 
 # Реєстрація блюпрінтів
 app.register_blueprint(feedback_bp)
@@ -0,0 +1,149 @@
+"""Cold storage for closed orders: one SQLite file per quarter.
+
+models.archive_old_orders moves delivered and cancelled orders older than
+ARCHIVE_AFTER_DAYS, with their items, out of the hot database into
+``orders-<YYYY>Q<n>.sqlite`` files in ARCHIVE_DIR (default: ``archive`` next
+to the database). ``archived_orders`` in the hot database maps each moved
+order id to its quarter, so models.get_order_details finds it by ATTACHing
+that file read-only on demand. Pooled connections keep the files attached;
+past MAX_ATTACHED the older ones are detached.
+
+Archive files are written by a single archiver with the rollback journal
+(WAL would need writable -shm files next to them for read-only readers).
+"""
+import os
+import re
+import sqlite3
+from urllib.parse import quote
+
+import db
+
+PERIOD_RE = re.compile(r'^\d{4}Q[1-4]$')
+FILE_RE = re.compile(r'^orders-(\d{4}Q[1-4])\.sqlite$')
+# SQLite allows 10 attached databases by default
+MAX_ATTACHED = 8
+
+
+def archive_dir():
+    return os.environ.get('ARCHIVE_DIR') or os.path.join(os.path.dirname(os.path.abspath(db.get_db_path())), 'archive')
+
+
+def period_of(date):
+    """Quarter ('2024Q3') of an orders.date string."""
+    return f'{date[:4]}Q{(int(date[5:7]) - 1) // 3 + 1}'
+
+
+def archive_path(period):
+    if not PERIOD_RE.match(period):
+        raise ValueError(f'Invalid archive period: {period}')
+    return os.path.join(archive_dir(), f'orders-{period}.sqlite')
+
+
+def periods():
+    """Quarters that have an archive file, oldest first."""
+    try:
+        names = os.listdir(archive_dir())
+    except FileNotFoundError:
+        return []
+    return sorted(match.group(1) for match in map(FILE_RE.match, names) if match)
+
+
+def attach(conn, period):
+    """Attach the quarter's file to ``conn`` read-only (once) and return its schema name.
+
+    ``conn`` must be opened with ``uri=True`` (db.connect does): otherwise
+    SQLite builds without SQLITE_USE_URI take the ``file:...?mode=ro`` URI
+    for a plain file name and create it.
+    """
+    schema = f'archive_{period.lower()}'
+    attached = [row[1] for row in conn.execute('PRAGMA database_list')]
+    if schema in attached:
+        return schema
+    archives = [name for name in attached if name.startswith('archive_')]
+    if len(archives) >= MAX_ATTACHED:
+        for name in archives:
+            conn.execute(f'DETACH DATABASE {name}')
+    conn.execute(f'ATTACH DATABASE ? AS {schema}', ('file:' + quote(archive_path(period)) + '?mode=ro',))
+    return schema
+
+
+def _open_for_writing(period, columns):
+    os.makedirs(archive_dir(), exist_ok=True)
+    conn = sqlite3.connect(archive_path(period), timeout=30.0)
+    conn.execute('PRAGMA journal_mode = DELETE')
+    conn.execute('CREATE TABLE IF NOT EXISTS orders (id INTEGER PRIMARY KEY)')
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(orders)')}
+    for name, declared in columns:
+        if name not in existing:
+            conn.execute(f'ALTER TABLE orders ADD COLUMN {name} {declared}')
+    conn.execute('CREATE TABLE IF NOT EXISTS order_items (id INTEGER PRIMARY KEY, order_id INTEGER, product_id INTEGER, quantity INTEGER)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items (order_id, product_id, quantity)')
+    return conn
+
+
+def store(period, columns, orders, items):
+    """Copy orders (and their items) into the quarter's file; copying the same order again replaces it.
+
+    ``columns`` is the hot orders table's ``(name, declared type)`` list,
+    ``orders`` and ``items`` are rows in hot column order.
+    """
+    conn = _open_for_writing(period, columns)
+    try:
+        names = ', '.join(name for name, _ in columns)
+        placeholders = ', '.join('?' * len(columns))
+        with conn:
+            conn.executemany('DELETE FROM order_items WHERE order_id = ?', [(order[0],) for order in orders])
+            conn.executemany(f'INSERT OR REPLACE INTO orders ({names}) VALUES ({placeholders})', orders)
+            conn.executemany('INSERT OR REPLACE INTO order_items (id, order_id, product_id, quantity) VALUES (?, ?, ?, ?)', items)
+    finally:
+        conn.close()
+
+
+def discard(period, order_ids):
+    """Remove copies of orders that stayed in the hot database after all."""
+    conn = sqlite3.connect(archive_path(period), timeout=30.0)
+    try:
+        with conn:
+            conn.executemany('DELETE FROM order_items WHERE order_id = ?', [(order_id,) for order_id in order_ids])
+            conn.executemany('DELETE FROM orders WHERE id = ?', [(order_id,) for order_id in order_ids])
+    finally:
+        conn.close()
+
+
+def sales_totals():
+    """Archived orders' share of the sales summaries: (daily, statuses, products) dicts.
+
+    Only orders recorded in ``archived_orders`` count, so a copy left behind
+    by an interrupted archive run is never added twice.
+    """
+    daily, statuses, products = {}, {}, {}
+    quarters = periods()
+    if not quarters:
+        return daily, statuses, products
+    # Plain connection: the caller may hold the write lock, which db.connect's PRAGMAs could wait for
+    conn = sqlite3.connect(db.get_db_path(), timeout=30.0, uri=True)
+    try:
+        for period in quarters:
+            schema = attach(conn, period)
+            for day, count, revenue in conn.execute(
+                    f"""SELECT substr(COALESCE(o.date, ''), 1, 10), COUNT(*), COALESCE(SUM(o.total_price), 0)
+                        FROM {schema}.orders o JOIN main.archived_orders a ON a.order_id = o.id
+                        GROUP BY substr(COALESCE(o.date, ''), 1, 10)"""):
+                previous = daily.get(day, (0, 0.0))
+                daily[day] = (previous[0] + count, previous[1] + revenue)
+            for status, count, revenue in conn.execute(
+                    f"""SELECT COALESCE(o.status, ''), COUNT(*), COALESCE(SUM(o.total_price), 0)
+                        FROM {schema}.orders o JOIN main.archived_orders a ON a.order_id = o.id
+                        GROUP BY COALESCE(o.status, '')"""):
+                previous = statuses.get(status, (0, 0.0))
+                statuses[status] = (previous[0] + count, previous[1] + revenue)
+            for product_id, units, count in conn.execute(
+                    f"""SELECT i.product_id, SUM(i.quantity), COUNT(DISTINCT i.order_id)
+                        FROM {schema}.order_items i JOIN main.archived_orders a ON a.order_id = i.order_id
+                        GROUP BY i.product_id"""):
+                previous = products.get(product_id, (0, 0))
+                products[product_id] = (previous[0] + units, previous[1] + count)
+            conn.execute(f'DETACH DATABASE {schema}')
+    finally:
+        conn.close()
+    return daily, statuses, products
@@ -0,0 +1,18 @@
+"""Move closed orders into the per-quarter archive files (archive.py).
+
+Runs in small batches with a pause between them, so it can run next to the
+live app (e.g. nightly from cron): ``python archive_orders.py --older-than-days 180``.
+"""
+import argparse
+
+from models import archive_old_orders
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--older-than-days', type=float, default=None,
+                        help='archive delivered/cancelled orders older than this (default: ARCHIVE_AFTER_DAYS or 180)')
+    parser.add_argument('--batch-size', type=int, default=None, help='orders per write transaction (default: ARCHIVE_BATCH_SIZE or 500)')
+    parser.add_argument('--pause', type=float, default=0.05, help='seconds between batches')
+    args = parser.parse_args()
+    moved = archive_old_orders(args.older_than_days, args.batch_size, args.pause)
+    print(f"Заархівовано замовлень: {moved}")
@@ -0,0 +1,92 @@
+"""Mixed checkout/catalog workload: N writer threads vs M reader threads.
+
+Writers call models.add_order, readers call models.get_products, all against
+the pooled connections from db.py. Reports throughput per side and how many
+operations failed with "database is locked".
+
+Usage: python -m benchmarks.bench_concurrency [--writers 4] [--readers 8]
+       [--ops 200] [--profile wal|legacy]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import db
+import models
+
+
+def run_mixed_workload(writers=4, readers=8, ops=200):
+    """Run the workload against the current DB_PATH and return a result dict."""
+    models.init_db()
+    models.add_product('Bench item', 10.0, '')
+    product = models.get_products(q='Bench item')[0]
+    cart = {str(product['id']): {'id': product['id'], 'price': product['price'], 'quantity': 1}}
+
+    counts = {'writes': 0, 'reads': 0, 'lock_errors': 0, 'other_errors': 0}
+    counts_lock = threading.Lock()
+    start = threading.Barrier(writers + readers + 1)
+
+    def worker(op):
+        start.wait()
+        done = locked = failed = 0
+        try:
+            for _ in range(ops):
+                try:
+                    op()
+                    done += 1
+                except sqlite3.OperationalError as e:
+                    if 'locked' in str(e) or 'busy' in str(e):
+                        locked += 1
+                    else:
+                        failed += 1
+        finally:
+            db.close_all()
+        return done, locked, failed
+
+    def run(op, key):
+        done, locked, failed = worker(op)
+        with counts_lock:
+            counts[key] += done
+            counts['lock_errors'] += locked
+            counts['other_errors'] += failed
+
+    threads = [threading.Thread(target=run, args=(lambda: models.add_order('bench@example.com', 'Addr', cart), 'writes'))
+               for _ in range(writers)]
+    threads += [threading.Thread(target=run, args=(lambda: models.get_products(min_price=1), 'reads'))
+                for _ in range(readers)]
+    for t in threads:
+        t.start()
+    start.wait()
+    began = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - began
+
+    counts['seconds'] = elapsed
+    counts['writes_per_sec'] = counts['writes'] / elapsed
+    counts['reads_per_sec'] = counts['reads'] / elapsed
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--ops', type=int, default=200)
+    parser.add_argument('--profile', default=db.DEFAULT_PROFILE, choices=sorted(db.STORAGE_PROFILES))
+    args = parser.parse_args()
+
+    os.environ['DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite')
+    os.environ['DB_PROFILE'] = args.profile
+    r = run_mixed_workload(args.writers, args.readers, args.ops)
+    print(f"profile={args.profile} writers={args.writers} readers={args.readers} ops/thread={args.ops}")
+    print(f"writes: {r['writes']:6d}  {r['writes_per_sec']:9.1f}/s")
+    print(f"reads:  {r['reads']:6d}  {r['reads_per_sec']:9.1f}/s")
+    print(f"lock errors: {r['lock_errors']}  other errors: {r['other_errors']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Compare requests/sec on /api/v1/products with and without connection pooling.
+
+Usage: python -m benchmarks.bench_connection_pool [--products 500] [--seconds 5]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def run(client, seconds):
+    done = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        r = client.get('/api/v1/products')
+        assert r.status_code == 200
+        done += 1
+    return done / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    os.environ['DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite')
+    # Import after DB_PATH is set: app.py runs init_db() at import time
+    from app import app
+    import db
+
+    conn = db.connect()
+    conn.executemany('INSERT INTO products (name, price, image, description) VALUES (?, ?, ?, ?)',
+                     [(f'Product {i}', float(i % 1000), '', '') for i in range(args.products)])
+    conn.commit()
+    conn.close()
+
+    client = app.test_client()
+    results = {}
+    for label, pool in (('before (connect per call)', '0'), ('after (pooled)', '1')):
+        os.environ['DB_POOL'] = pool
+        run(client, 0.5)  # warm-up
+        results[label] = run(client, args.seconds)
+        db.close_all()
+
+    for label, rps in results.items():
+        print(f'{label:28s} {rps:10.1f} req/s')
+    before, after = results.values()
+    print(f'speedup: {after / before:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Overhead of the request/SQL instrumentation (metrics.py): req/s with METRICS=0 vs METRICS=1.
+
+Each mode runs in its own process (metrics are installed at app import) on a
+copy of the same database; rounds alternate between the modes to even out
+noise. Endpoints: the catalog list (cache, no SQL), an order list with items
+(several queries) and a single order.
+
+Usage: python -m benchmarks.bench_metrics [--seconds 3] [--rounds 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ENDPOINTS = ['/api/v1/products', '/api/v1/orders?include=items&limit=20', '/api/v1/orders/1']
+
+
+def child(seconds):
+    from app import app
+    client = app.test_client()
+    results = {}
+    for url in ENDPOINTS:
+        for _ in range(50):  # warm-up
+            client.get(url)
+        done = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            assert client.get(url).status_code == 200
+            done += 1
+        results[url] = done / seconds
+    print(json.dumps(results))
+
+
+def prepare(db_path):
+    os.environ['DB_PATH'] = db_path
+    import models
+    models.init_db()
+    for i in range(200):
+        models.add_product(f'Product {i}', float(i + 1), '')
+    cart = {str(i): {'id': i, 'price': float(i), 'quantity': 1} for i in range(1, 4)}
+    models.add_orders_bulk([{'email': f'm{i}@example.com', 'address': 'A', 'cart': cart} for i in range(200)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.seconds)
+        return
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.sqlite')
+    prepare(db_path)
+    samples = {'0': [], '1': []}
+    for _ in range(args.rounds):
+        for mode in ('0', '1'):
+            env = dict(os.environ, DB_PATH=db_path, METRICS=mode, INIT_DB='0')
+            out = subprocess.run([sys.executable, '-m', 'benchmarks.bench_metrics', '--child', '--seconds', str(args.seconds)],
+                                 env=env, capture_output=True, text=True, check=True).stdout
+            samples[mode].append(json.loads(out.strip().splitlines()[-1]))
+
+    print(f"{'endpoint':42s} {'off req/s':>10s} {'on req/s':>10s} {'overhead':>9s}")
+    for url in ENDPOINTS:
+        off = statistics.median(s[url] for s in samples['0'])
+        on = statistics.median(s[url] for s in samples['1'])
+        print(f'{url:42s} {off:10.0f} {on:10.0f} {(off - on) / off:9.1%}')
+
+
+if __name__ == '__main__':
+    main()
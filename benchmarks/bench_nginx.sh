@@ -0,0 +1,34 @@
+#!/usr/bin/env bash
+# Hit-path latency through nginx (micro-cache + static offload) vs straight to the app.
+# Needs wrk (https://github.com/wg/wrk) and the production stack running:
+#   docker-compose -f docker-compose.prod.yml up --build -d
+# Usage: benchmarks/bench_nginx.sh [duration=15s] [connections=32]
+set -euo pipefail
+
+DURATION="${1:-15s}"
+CONNECTIONS="${2:-32}"
+NGINX="${NGINX_URL:-http://localhost}"
+APP="${APP_URL:-http://localhost:5000}"   # only reachable if the web port is published
+
+PATHS=(/api/v1/products /shop /about /photos/image.getproducts.webp)
+
+echo "== cache status (second request should be HIT) =="
+for path in "${PATHS[@]}"; do
+    curl -s -o /dev/null "$NGINX$path"
+    printf '%-40s %s\n' "$path" "$(curl -s -o /dev/null -D - "$NGINX$path" | tr -d '\r' | awk -F': ' 'tolower($1)=="x-cache-status"{print $2}')"
+done
+
+run() {
+    echo "== $1 =="
+    wrk -t2 -c"$CONNECTIONS" -d"$DURATION" --latency "$1" | grep -E 'Latency|Requests/sec|50%|99%'
+}
+
+for path in "${PATHS[@]}"; do
+    run "$NGINX$path"
+done
+
+if curl -s -o /dev/null "$APP/api/v1/health"; then
+    echo "== uncached, app directly =="
+    run "$APP/api/v1/products"
+    run "$APP/shop"
+fi
@@ -0,0 +1,68 @@
+"""Order ingestion: POST /api/v1/orders once per order vs POST /api/v1/orders/batch.
+
+Both paths go through the Flask test client (no network), so the difference is
+per-request and per-transaction overhead. Each order carries a 3-line cart.
+
+Usage: python -m benchmarks.bench_order_ingest [--orders 100000]
+       [--batch-size 1000] [--single-orders 100000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+
+def make_orders(n, product_ids, prefix, seed=42):
+    rng = random.Random(seed)
+    orders = []
+    for i in range(n):
+        cart = {str(pid): {'id': pid, 'price': 10.0, 'quantity': rng.randint(1, 3)}
+                for pid in rng.sample(product_ids, 3)}
+        orders.append({'idempotency_key': f'{prefix}-{i}', 'email': f'buyer{i % 5000}@example.com',
+                       'address': f'Street {i}', 'phone': '', 'cart': cart})
+    return orders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--single-orders', type=int, default=None,
+                        help='orders sent one per request (default: --orders)')
+    args = parser.parse_args()
+
+    os.environ['DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite')
+    os.environ.setdefault('ORDER_BATCH_MAX', str(args.batch_size))
+    from app import app
+    import models
+
+    for i in range(100):
+        models.add_product(f'Bench product {i}', 10.0, '')
+    product_ids = [row['id'] for row in models.get_products()]
+    client = app.test_client()
+
+    single = make_orders(args.single_orders or args.orders, product_ids, 'single')
+    started = time.perf_counter()
+    for order in single:
+        r = client.post('/api/v1/orders', json=order)
+        assert r.status_code == 201, r.get_data(as_text=True)
+    single_s = time.perf_counter() - started
+
+    batch = make_orders(args.orders, product_ids, 'batch')
+    started = time.perf_counter()
+    created = 0
+    for start in range(0, len(batch), args.batch_size):
+        r = client.post('/api/v1/orders/batch', json={'orders': batch[start:start + args.batch_size]})
+        assert r.status_code == 200, r.get_data(as_text=True)
+        created += r.get_json()['data']['created']
+    batch_s = time.perf_counter() - started
+    assert created == len(batch)
+
+    print(f"{'path':28s} {'orders':>8s} {'seconds':>9s} {'orders/s':>10s}")
+    print(f"{'POST /orders (1 per call)':28s} {len(single):8d} {single_s:9.2f} {len(single) / single_s:10.0f}")
+    print(f"{f'POST /orders/batch ({args.batch_size})':28s} {len(batch):8d} {batch_s:9.2f} {len(batch) / batch_s:10.0f}")
+
+
+if __name__ == '__main__':
+    main()
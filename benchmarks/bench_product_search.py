@@ -0,0 +1,72 @@
+"""Product search latency: LIKE '%q%' scan vs the FTS5 index, on a synthetic catalog.
+
+Usage: python -m benchmarks.bench_product_search [--products 1000000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import db
+import models
+from benchmarks.datagen import make_vocabulary
+
+
+def generate_catalog(n, seed=42):
+    """Insert n products and return a few search terms taken from their vocabulary."""
+    rng = random.Random(seed)
+    words = make_vocabulary(rng)
+    conn = db.connect()
+    batch = []
+    for i in range(n):
+        name = ' '.join(rng.choice(words) for _ in range(3)) + f' {i}'
+        description = ' '.join(rng.choice(words) for _ in range(12))
+        batch.append((name, round(rng.uniform(10, 5000), 2), '', description))
+        if len(batch) == 50000:
+            conn.executemany('INSERT INTO products (name, price, image, description) VALUES (?, ?, ?, ?)', batch)
+            batch.clear()
+    conn.executemany('INSERT INTO products (name, price, image, description) VALUES (?, ?, ?, ?)', batch)
+    conn.commit()
+    conn.close()
+    # whole word, as-you-type prefix, two-word phrase, no match
+    return [words[0], words[1][:4], f'{words[2]} {words[3]}', 'nomatchxyz']
+
+
+def time_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ['DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite')
+    models.init_db()
+    started = time.perf_counter()
+    queries = generate_catalog(args.products)
+    print(f'generated {args.products} products in {time.perf_counter() - started:.1f}s')
+
+    conn = db.connect()
+    if not models._has_search_index(conn):
+        print('FTS5 (trigram) not available in this SQLite build - only the LIKE path exists')
+    print(f"{'query':24s} {'LIKE ms':>10s} {'FTS5 ms':>10s} {'rows':>8s}")
+    for q in queries:
+        like_ms, rows = time_ms(lambda: conn.execute(
+            'SELECT * FROM products WHERE name LIKE ? OR description LIKE ? ORDER BY id',
+            (f'%{q}%', f'%{q}%')).fetchall(), args.repeat)
+        fts_ms, _ = time_ms(lambda: models.get_products(q=q), args.repeat)
+        print(f'{q:24s} {like_ms:10.1f} {fts_ms:10.1f} {rows:8d}')
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
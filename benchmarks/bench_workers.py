@@ -0,0 +1,108 @@
+"""Throughput of /api/v1/products under gunicorn for different worker counts.
+
+Starts gunicorn (gunicorn.conf.py) once per worker count against a seeded
+temporary database, drives it with keep-alive client threads and prints
+requests/sec for each configuration.
+
+Usage: python -m benchmarks.bench_workers [--workers 1,2,4] [--threads 4]
+       [--clients 16] [--seconds 10] [--products 500]
+"""
+import argparse
+import http.client
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(db_path, products):
+    os.environ['DB_PATH'] = db_path
+    import db
+    import models
+    models.init_db()
+    conn = db.connect()
+    conn.executemany('INSERT INTO products (name, price, image, description) VALUES (?, ?, ?, ?)',
+                     [(f'Product {i}', float(i % 1000), '', '') for i in range(products)])
+    conn.commit()
+    conn.close()
+
+
+def wait_ready(port, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/v1/health')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn did not start')
+
+
+def drive(port, clients, seconds, path='/api/v1/products'):
+    counts = [0] * clients
+    errors = [0] * clients
+    deadline = time.monotonic() + seconds
+
+    def client(i):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        while time.monotonic() < deadline:
+            try:
+                conn.request('GET', path)
+                r = conn.getresponse()
+                r.read()
+                if r.status == 200:
+                    counts[i] += 1
+                else:
+                    errors[i] += 1
+            except (OSError, http.client.HTTPException):
+                errors[i] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts) / seconds, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.sqlite')
+    seed(db_path, args.products)
+
+    print(f'{"workers":>8s} {"threads":>8s} {"req/s":>10s} {"errors":>8s}')
+    for workers in [int(w) for w in args.workers.split(',')]:
+        env = dict(os.environ, DB_PATH=db_path, WEB_CONCURRENCY=str(workers), THREADS=str(args.threads),
+                   PORT=str(args.port), HOST='127.0.0.1', LOG_LEVEL='warning')
+        proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                                 '--access-logfile', '/dev/null', 'wsgi:app'],
+                                cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(args.port)
+            drive(args.port, args.clients, 1.0)  # warm-up: caches, connections
+            rps, errors = drive(args.port, args.clients, args.seconds)
+            print(f'{workers:8d} {args.threads:8d} {rps:10.1f} {errors:8d}')
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
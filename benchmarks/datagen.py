@@ -0,0 +1,248 @@
+"""Synthetic shop database: products, orders with items, clients and feedback at production-like scale.
+
+The data is deterministic for a given --seed and shaped like a real shop:
+product popularity and customer activity are skewed (a few bestsellers and
+regulars), order ids follow their dates over the last --days days, old
+orders are mostly delivered while recent ones are still new or in transit,
+and feedback is short Ukrainian text. The schema comes from the app's own
+migrations; triggers and secondary indexes are dropped during the load and
+recreated afterwards (FTS index rebuilt, sales summaries recomputed), which
+is much faster than maintaining them row by row.
+
+Usage: python -m benchmarks.datagen --db /tmp/big.sqlite [--products 1000000]
+       [--items 10000000] [--feedback 200000] [--clients 50000] [--days 365] [--seed 42]
+"""
+import argparse
+import os
+import random
+import time
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+import db
+import migrations
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ro', 'ta', 've', 'zu', 'ni', 'bra', 'sto', 'gle', 'pri', 'dan', 'vor', 'kel']
+CATEGORIES = ['Курси', 'Джинси', 'Кросівки', 'Куртка', 'Шапка', 'Шкарпетки', 'Рюкзак', 'Годинник',
+              'Футболка', 'Сукня', 'Навушники', 'Книга', 'Чашка', 'Лампа', 'Гаманець', 'Окуляри']
+FIRST_NAMES = ['Олена', 'Іван', 'Марія', 'Андрій', 'Наталія', 'Олег', 'Тетяна', 'Дмитро', 'Юлія', 'Сергій',
+               'Ірина', 'Максим', 'Оксана', 'Богдан', 'Катерина', 'Тарас']
+LAST_NAMES = ['Шевченко', 'Коваленко', 'Бондаренко', 'Ткаченко', 'Кравченко', 'Олійник', 'Мельник',
+              'Поліщук', 'Лисенко', 'Руденко', 'Савченко', 'Гончаренко']
+CITIES = ['Київ', 'Львів', 'Харків', 'Одеса', 'Дніпро', 'Запоріжжя', 'Вінниця', 'Полтава', 'Чернігів', 'Ужгород']
+STREETS = ['Шевченка', 'Франка', 'Соборна', 'Незалежності', 'Садова', 'Лесі Українки', 'Грушевського', 'Центральна']
+FEEDBACK_OPENINGS = ['Дякую за швидку доставку.', 'Замовлення прийшло вчасно.', 'Товар відповідає опису.',
+                     'Посилка йшла довше, ніж обіцяли.', 'Дуже задоволена покупкою!', 'Розмір не підійшов.',
+                     'Чудовий магазин, замовляю вже втретє.', 'Упаковка була пошкоджена.']
+FEEDBACK_DETAILS = ['Якість на висоті.', 'Хотілося б більше кольорів.', 'Ціна трохи завищена.',
+                    'Менеджер швидко відповів на питання.', 'Рекомендую друзям.', 'Повернення оформили без проблем.',
+                    'Доставка Новою поштою була б зручнішою.', 'Сайт зручний, все зрозуміло.']
+DEVELOPER_MESSAGES = ['Фільтр за ціною скидається після пошуку.', 'Сторінка кошика довго завантажується.',
+                      'На мобільному кнопка оформлення перекриває футер.', 'Не працює пошук за кириличними словами.',
+                      'API повертає 500 при порожньому кошику.', 'Додайте сортування за популярністю.']
+# (status, weight) for orders older than two weeks and for recent ones
+OLD_STATUSES = [('Доставлено', 86), ('Скасовано', 8), ('Відправлено', 4), ('В обробці', 2)]
+RECENT_STATUSES = [('Нове', 35), ('В обробці', 25), ('Відправлено', 25), ('Доставлено', 10), ('Скасовано', 5)]
+# (lines per order, weight): mean ~2.3; (quantity per line, weight)
+LINES_PER_ORDER = [(1, 35), (2, 28), (3, 17), (4, 10), (5, 6), (6, 4)]
+QUANTITIES = [(1, 70), (2, 18), (3, 7), (4, 3), (5, 2)]
+# Tables filled here; their triggers and secondary indexes are rebuilt after the load
+LOADED_TABLES = ('products', 'orders', 'order_items', 'clients', 'feedback')
+CHUNK = 50000
+
+
+def make_vocabulary(rng, size=20000):
+    """Pseudo-words, so search terms are about as selective as in a real catalog."""
+    return [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(size)]
+
+
+def picker(pairs):
+    """Weighted choice over (value, weight) pairs; cheaper than rng.choices in the per-row loops."""
+    values, weights = zip(*pairs)
+    cumulative = list(accumulate(weights))
+    total = cumulative[-1]
+    return lambda rng: values[bisect(cumulative, rng.random() * total)]
+
+
+def skewed(rng, n, power=3.0):
+    """Index in [0, n) with low indexes much more likely (bestsellers, regular customers)."""
+    return int(n * rng.random() ** power)
+
+
+def person(rng, i):
+    return (f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}', f'customer{i}@example.com',
+            f'+380{rng.randrange(10 ** 8, 10 ** 9)}', f'м. {rng.choice(CITIES)}, вул. {rng.choice(STREETS)}, {rng.randint(1, 200)}')
+
+
+def products(rng, n, words):
+    for i in range(n):
+        name = f'{rng.choice(CATEGORIES)} {rng.choice(words)} {rng.choice(words)}'
+        price = round(min(rng.lognormvariate(6.3, 0.9), 99999), 2)
+        image = f'/photos/product_{i % 500}.jpg' if rng.random() < 0.7 else ''
+        description = ' '.join(rng.choice(words) for _ in range(rng.randint(6, 20)))
+        yield name, price, image, description
+
+
+def orders(rng, n_items, prices, customers, days):
+    """Yield (order row, [item rows]) until n_items order lines have been produced.
+
+    ``ts`` ignores DST changes within the span; fine for synthetic data.
+    """
+    n_products = len(prices)
+    # Dates are seconds after midnight of the first day; day strings are formatted once
+    midnight = (datetime.now() - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    midnight_ts = int(midnight.timestamp())
+    first = (datetime.now() - timedelta(days=days) - midnight).total_seconds()
+    span = days * 86400
+    day_names = [(midnight + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days + 2)]
+    recent = first + span - 14 * 86400
+    old_status, recent_status = picker(OLD_STATUSES), picker(RECENT_STATUSES)
+    line_count, quantity = picker(LINES_PER_ORDER), picker(QUANTITIES)
+    order_id, made = 0, 0
+    while made < n_items:
+        order_id += 1
+        count = min(line_count(rng), n_items - made, n_products)
+        lines = {}
+        while len(lines) < count:
+            lines[1 + skewed(rng, n_products)] = quantity(rng)
+        made += count
+        second = int(first + span * made / n_items)
+        date = f'{day_names[second // 86400]} {second // 3600 % 24:02d}:{second // 60 % 60:02d}:{second % 60:02d}'
+        status = old_status(rng) if second < recent else recent_status(rng)
+        customer = skewed(rng, len(customers), power=2.0)
+        _, email, phone, address = customers[customer]
+        total = round(sum(prices[product_id - 1] * quantity for product_id, quantity in lines.items()), 2)
+        yield ((order_id, email, address, total, status, date, phone, midnight_ts + second),
+               [(order_id, product_id, quantity) for product_id, quantity in lines.items()])
+
+
+def feedback(rng, n, customers):
+    for _ in range(n):
+        name, email, _, _ = customers[skewed(rng, len(customers), power=2.0)]
+        if rng.random() < 0.15:
+            yield name, email, rng.choice(DEVELOPER_MESSAGES), 'developer'
+        else:
+            message = ' '.join([rng.choice(FEEDBACK_OPENINGS)] + rng.sample(FEEDBACK_DETAILS, rng.randint(0, 2)))
+            yield name, email, message, 'general'
+
+
+def insert_chunks(conn, sql, rows, label, total):
+    """executemany in CHUNK-sized transactions so the WAL stays small; prints progress."""
+    started = time.perf_counter()
+    done = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == CHUNK:
+            conn.executemany(sql, batch)
+            conn.commit()
+            done += len(batch)
+            batch.clear()
+            if done % (CHUNK * 20) == 0:
+                print(f'  {label}: {done}/{total}', flush=True)
+    conn.executemany(sql, batch)
+    conn.commit()
+    done += len(batch)
+    print(f'{label}: {done} rows in {time.perf_counter() - started:.1f}s', flush=True)
+    return done
+
+
+def drop_triggers_and_indexes(conn):
+    """Drop triggers and secondary indexes on LOADED_TABLES; return their SQL for restore()."""
+    placeholders = ', '.join('?' * len(LOADED_TABLES))
+    saved = conn.execute(f"SELECT type, name, sql FROM sqlite_master WHERE type IN ('trigger', 'index') "
+                         f"AND sql IS NOT NULL AND tbl_name IN ({placeholders})", LOADED_TABLES).fetchall()
+    for kind, name, _ in saved:
+        conn.execute(f'DROP {kind.upper()} {name}')
+    conn.commit()
+    return saved
+
+
+def restore(conn, saved):
+    started = time.perf_counter()
+    for kind, _, sql in sorted(saved, key=lambda row: row[0]):  # indexes first, then triggers
+        conn.execute(sql)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'").fetchone():
+        conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+    migrations.rebuild_sales_summaries(conn)
+    migrations.rebuild_order_emails(conn)
+    conn.execute("UPDATE change_counters SET generation = generation + 1, changed_at = CAST(strftime('%s', 'now') AS INTEGER)")
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.commit()
+    print(f'indexes, triggers, search index and summaries rebuilt in {time.perf_counter() - started:.1f}s')
+
+
+def generate(db_path, n_products, n_items, n_feedback, n_clients, days, seed):
+    """Create the schema at ``db_path`` and fill it; also used by the micro-benchmark fixtures (tests/benchmarks)."""
+    migrations.migrate(db.connect(db_path))
+    rng = random.Random(seed)
+    words = make_vocabulary(rng)
+    customers = [person(rng, i) for i in range(max(n_items // 40, n_clients, 1))]
+
+    conn = db.connect(db_path)
+    conn.execute('PRAGMA synchronous = OFF')
+    saved = drop_triggers_and_indexes(conn)
+
+    prices = []
+
+    def priced(rows):
+        for row in rows:
+            prices.append(row[1])
+            yield row
+
+    insert_chunks(conn, 'INSERT INTO products (name, price, image, description) VALUES (?, ?, ?, ?)',
+                  priced(products(rng, n_products, words)), 'products', n_products)
+
+    item_rows = []
+
+    def order_rows():
+        for order, items in orders(rng, n_items, prices, customers, days):
+            item_rows.extend(items)
+            if len(item_rows) >= CHUNK:
+                conn.executemany('INSERT INTO order_items (order_id, product_id, quantity) VALUES (?, ?, ?)', item_rows)
+                item_rows.clear()
+            yield order
+
+    insert_chunks(conn, 'INSERT INTO orders (id, email, address, total_price, status, date, phone, ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                  order_rows(), 'orders (with their items)', f'~{n_items * 10 // 23}')
+    conn.executemany('INSERT INTO order_items (order_id, product_id, quantity) VALUES (?, ?, ?)', item_rows)
+    conn.commit()
+
+    clients = ((name, email, phone, address, int(rng.random() < 0.2)) for name, email, phone, address in customers[:n_clients])
+    insert_chunks(conn, 'INSERT INTO clients (name, email, phone, address, has_courses) VALUES (?, ?, ?, ?, ?)',
+                  clients, 'clients', n_clients)
+    insert_chunks(conn, 'INSERT INTO feedback (name, email, message, feedback_type) VALUES (?, ?, ?, ?)',
+                  feedback(rng, n_feedback, customers), 'feedback', n_feedback)
+
+    restore(conn, saved)
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', required=True, help='path of the database to create')
+    parser.add_argument('--products', type=int, default=1000000)
+    parser.add_argument('--items', type=int, default=10000000, help='order lines (orders are ~items / 2.3)')
+    parser.add_argument('--feedback', type=int, default=200000)
+    parser.add_argument('--clients', type=int, default=50000)
+    parser.add_argument('--days', type=int, default=365, help='orders are spread over this many past days')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--overwrite', action='store_true', help='replace an existing file at --db')
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        if not args.overwrite:
+            parser.error(f'{args.db} exists (use --overwrite to replace it)')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    started = time.perf_counter()
+    generate(args.db, args.products, args.items, args.feedback, args.clients, args.days, args.seed)
+    print(f'done in {time.perf_counter() - started:.1f}s, {os.path.getsize(args.db) / 2 ** 20:.0f} MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,352 @@
+"""Scripted workload mix against the app: latency percentiles and throughput per endpoint.
+
+``run`` starts --users virtual users, each with its own cookie session, that
+pick scenarios by weight (see WORKLOAD): browse and search the shop, open
+products, add to cart and check out, look at the admin dashboard, read and
+write through the API. Every request is timed and reported per route as
+p50/p95/p99 and req/s; the results are saved as JSON. The run writes to the
+database (checkouts, API orders and products), so point it at a copy.
+
+Without --url the app runs in-process behind the Flask test client (no
+network or server in the numbers, one GIL shared by all users); with --url
+the requests go over HTTP to a running server. --db is read either way to
+pick existing product ids, order ids, e-mails and search terms.
+
+``compare`` diffs two result files and exits with status 1 when a route got
+slower (p50/p95/p99) or lost throughput by more than --tolerance percent.
+
+Usage: python -m benchmarks.loadtest run --db /tmp/big.sqlite [--url http://127.0.0.1:5000]
+           [--users 8] [--duration 60] [--warmup 5] [--seed 1] [--out results.json]
+       python -m benchmarks.loadtest compare base.json new.json [--tolerance 10] [--min-ms 0.5]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+PERCENTILES = (50, 95, 99)
+
+
+class LocalClient:
+    """The app in this process, through the Flask test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None, json=None):
+        response = self.client.open(path, method=method, data=data, json=json)
+        payload = response.get_json(silent=True) if response.is_json else None
+        response.close()
+        return response.status_code, payload
+
+
+class HTTPClient:
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def request(self, method, path, data=None, json=None):
+        response = self.session.request(method, self.base_url + path, data=data, json=json, allow_redirects=False)
+        is_json = response.headers.get('Content-Type', '').startswith('application/json')
+        return response.status_code, response.json() if is_json else None
+
+
+class Dataset:
+    """Ids, e-mails and search terms sampled from the database the app serves."""
+
+    def __init__(self, db_path, seed, sample=500):
+        conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+        rng = random.Random(seed)
+        self.max_product_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM products').fetchone()[0]
+        self.max_order_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM orders').fetchone()[0]
+        if not self.max_product_id:
+            raise SystemExit(f'{db_path} has no products (generate some with python -m benchmarks.datagen)')
+        ids = [rng.randint(1, self.max_product_id) for _ in range(sample)]
+        names = [row[0] for row in conn.execute(
+            f'SELECT name FROM products WHERE id IN ({",".join("?" * len(ids))})', ids)]
+        self.terms = sorted({word.lower() for name in names for word in name.split() if len(word) >= 4}) or ['test']
+        order_ids = [rng.randint(1, max(self.max_order_id, 1)) for _ in range(sample)]
+        self.emails = [row[0] for row in conn.execute(
+            f'SELECT DISTINCT email FROM orders WHERE id IN ({",".join("?" * len(order_ids))})', order_ids)] or ['nobody@example.com']
+        self.rows = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                     for table in ('products', 'orders', 'order_items', 'feedback')}
+        conn.close()
+
+    def product_id(self, rng):
+        return rng.randint(1, self.max_product_id)
+
+    def order_id(self, rng):
+        return rng.randint(1, max(self.max_order_id, 1))
+
+
+class User:
+    """One virtual user: a client with its own cookies, timing every call under a route name."""
+
+    def __init__(self, client, data, rng, recorder, admin_password):
+        self.client, self.data, self.rng, self.recorder = client, data, rng, recorder
+        self.admin_password = admin_password
+        self.is_admin = False
+
+    def call(self, name, method, path, data=None, json=None):
+        started = time.perf_counter()
+        try:
+            status, payload = self.client.request(method, path, data=data, json=json)
+        except Exception:
+            status, payload = 599, None
+        self.recorder.record(name, time.perf_counter() - started, status >= 400)
+        return payload
+
+
+def browse(u):
+    if u.rng.random() < 0.7:
+        u.call('GET /shop', 'GET', '/shop')
+    else:
+        low = u.rng.choice([0, 100, 500, 1000])
+        u.call('GET /shop?min_price', 'GET', f'/shop?min_price={low}&max_price={low * 3 + 300}')
+
+
+def search(u):
+    term = u.rng.choice(u.data.terms)
+    # as-you-type prefix half of the time
+    u.call('GET /shop?q', 'GET', f'/shop?q={term if u.rng.random() < 0.5 else term[:4]}')
+
+
+def product(u):
+    u.call('GET /product/<id>', 'GET', f'/product/{u.data.product_id(u.rng)}')
+
+
+def add_to_cart(u):
+    u.call('GET /add_to_cart/<id>', 'GET', f'/add_to_cart/{u.data.product_id(u.rng)}')
+
+
+def checkout(u):
+    for _ in range(u.rng.randint(1, 3)):
+        add_to_cart(u)
+    u.call('GET /cart', 'GET', '/cart')
+    email = u.rng.choice(u.data.emails)
+    u.call('POST /checkout', 'POST', '/checkout', data={'email': email, 'address': 'Load test 1', 'phone': ''})
+    u.call('GET /orders', 'GET', '/orders')
+
+
+def admin(u):
+    if not u.is_admin:
+        u.client.request('POST', '/admin/login', data={'password': u.admin_password})
+        u.is_admin = True
+    u.call('GET /admin', 'GET', '/admin')
+    u.call('GET /admin/section/orders', 'GET', '/admin/section/orders')
+    u.call('GET /admin/order/<id>', 'GET', f'/admin/order/{u.data.order_id(u.rng)}')
+
+
+def api_read(u):
+    rng = u.rng
+    choice = rng.randrange(6)
+    if choice == 0:
+        u.call('GET /api/v1/products', 'GET', '/api/v1/products?limit=20')
+    elif choice == 1:
+        u.call('GET /api/v1/products/<id>', 'GET', f'/api/v1/products/{u.data.product_id(rng)}')
+    elif choice == 2:
+        u.call('GET /api/v1/orders/<id>', 'GET', f'/api/v1/orders/{u.data.order_id(rng)}')
+    elif choice == 3:
+        u.call('GET /api/v1/orders?email', 'GET', f'/api/v1/orders?email={rng.choice(u.data.emails)}&limit=20')
+    elif choice == 4:
+        ids = ','.join(str(u.data.order_id(rng)) for _ in range(10))
+        u.call('GET /api/v1/orders/details', 'GET', f'/api/v1/orders/details?ids={ids}')
+    else:
+        u.call('GET /api/v1/stats/daily', 'GET', '/api/v1/stats/daily')
+
+
+def api_write(u):
+    rng = u.rng
+    if rng.random() < 0.3:
+        u.call('POST /api/v1/products', 'POST', '/api/v1/products',
+               json={'name': f'Load test product {rng.randrange(10 ** 9)}', 'price': round(rng.uniform(10, 1000), 2)})
+        return
+    cart = {}
+    for _ in range(rng.randint(1, 3)):
+        product_id = u.data.product_id(rng)
+        cart[str(product_id)] = {'id': product_id, 'price': round(rng.uniform(10, 1000), 2), 'quantity': rng.randint(1, 3)}
+    payload = u.call('POST /api/v1/orders', 'POST', '/api/v1/orders',
+                     json={'email': rng.choice(u.data.emails), 'address': 'Load test 1', 'cart': cart})
+    order_id = ((payload or {}).get('data') or {}).get('order_id')
+    if order_id:
+        u.call('PUT /api/v1/orders/<id>', 'PUT', f'/api/v1/orders/{order_id}', json={'status': 'В обробці'})
+        if rng.random() < 0.5:
+            u.call('DELETE /api/v1/orders/<id>', 'DELETE', f'/api/v1/orders/{order_id}')
+
+
+# (weight, scenario): mostly reads, like a real shop
+WORKLOAD = [
+    (25, browse),
+    (15, search),
+    (15, product),
+    (8, add_to_cart),
+    (4, checkout),
+    (3, admin),
+    (22, api_read),
+    (8, api_write),
+]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+        self.enabled = False
+
+    def record(self, name, seconds, error):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.samples.setdefault(name, []).append(seconds)
+            if error:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def summarize(samples, errors, duration):
+    ordered = sorted(samples)
+    cuts = statistics.quantiles(ordered, n=100, method='inclusive') if len(ordered) > 1 else ordered * 99
+    summary = {'requests': len(ordered), 'errors': errors, 'throughput_rps': round(len(ordered) / duration, 2),
+               'mean_ms': round(statistics.fmean(ordered) * 1000, 3), 'max_ms': round(ordered[-1] * 1000, 3)}
+    for p in PERCENTILES:
+        summary[f'p{p}_ms'] = round(cuts[p - 1] * 1000, 3)
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    data = Dataset(args.db, args.seed)
+    if args.url:
+        make_client = lambda: HTTPClient(args.url)
+    else:
+        os.environ['DB_PATH'] = args.db
+        from app import app
+        make_client = lambda: LocalClient(app)
+
+    recorder = Recorder()
+    scenarios = [scenario for weight, scenario in WORKLOAD for _ in range(weight)]
+    stop = threading.Event()
+
+    def virtual_user(number):
+        rng = random.Random(args.seed * 1000 + number)
+        user = User(make_client(), data, rng, recorder, args.admin_password)
+        while not stop.is_set():
+            rng.choice(scenarios)(user)
+            if args.think_ms:
+                time.sleep(rng.expovariate(1000 / args.think_ms))
+
+    threads = [threading.Thread(target=virtual_user, args=(i,), daemon=True) for i in range(args.users)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.warmup)
+    recorder.enabled = True
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    recorder.enabled = False
+    duration = time.perf_counter() - started
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    everything = [s for samples in recorder.samples.values() for s in samples]
+    if not everything:
+        raise SystemExit('no requests completed')
+    results = {
+        'meta': {'started': datetime.now().isoformat(timespec='seconds'), 'git': git_commit(),
+                 'target': args.url or 'in-process', 'db': os.path.abspath(args.db), 'rows': data.rows,
+                 'users': args.users, 'duration_s': round(duration, 2), 'warmup_s': args.warmup,
+                 'think_ms': args.think_ms, 'seed': args.seed,
+                 'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version},
+        'total': summarize(everything, sum(recorder.errors.values()), duration),
+        'endpoints': {name: summarize(samples, recorder.errors.get(name, 0), duration)
+                      for name, samples in sorted(recorder.samples.items())},
+    }
+    print_results(results)
+    out = args.out or f'loadtest-{datetime.now():%Y%m%d-%H%M%S}.json'
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f'saved {out}')
+
+
+def print_results(results):
+    print(f"{'route':34s} {'reqs':>7s} {'err':>5s} {'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}")
+    rows = list(results['endpoints'].items()) + [('TOTAL', results['total'])]
+    for name, s in rows:
+        print(f"{name:34s} {s['requests']:7d} {s['errors']:5d} {s['throughput_rps']:8.1f} "
+              f"{s['p50_ms']:8.2f} {s['p95_ms']:8.2f} {s['p99_ms']:8.2f}")
+
+
+def compare(args):
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+    limit = args.tolerance / 100
+    regressions = []
+    print(f"{'route':34s} {'metric':>10s} {'base':>10s} {'new':>10s} {'change':>8s}")
+    routes = [('TOTAL', base['total'], new['total'])] + [
+        (name, base['endpoints'][name], new['endpoints'][name])
+        for name in sorted(set(base['endpoints']) & set(new['endpoints']))]
+    for name, old, current in routes:
+        for metric in [f'p{p}_ms' for p in PERCENTILES] + ['throughput_rps']:
+            before, after = old[metric], current[metric]
+            change = (after - before) / before if before else 0.0
+            if metric == 'throughput_rps':
+                worse = change < -limit
+            else:
+                worse = change > limit and after - before >= args.min_ms
+            if worse:
+                regressions.append((name, metric))
+            print(f"{name:34s} {metric:>10s} {before:10.2f} {after:10.2f} {change:+8.1%}{'  REGRESSION' if worse else ''}")
+    for name in sorted(set(base['endpoints']) ^ set(new['endpoints'])):
+        print(f'{name}: only in {"base" if name in base["endpoints"] else "new"}')
+    if regressions:
+        print(f'{len(regressions)} regression(s) beyond {args.tolerance}%')
+        sys.exit(1)
+    print(f'no regressions beyond {args.tolerance}%')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run the workload and save the results')
+    run_parser.add_argument('--db', default=os.environ.get('DB_PATH', 'db.sqlite'))
+    run_parser.add_argument('--url', help='base URL of a running server (default: in-process test client)')
+    run_parser.add_argument('--users', type=int, default=8)
+    run_parser.add_argument('--duration', type=float, default=60.0, help='measured seconds')
+    run_parser.add_argument('--warmup', type=float, default=5.0, help='seconds run before measuring')
+    run_parser.add_argument('--think-ms', type=float, default=0.0, help='mean pause between scenarios')
+    run_parser.add_argument('--seed', type=int, default=1)
+    run_parser.add_argument('--admin-password', default=os.environ.get('ADMIN_PASSWORD', '123'))
+    run_parser.add_argument('--out', help='results file (default: loadtest-<timestamp>.json)')
+    compare_parser = commands.add_parser('compare', help='diff two result files, exit 1 on regressions')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--tolerance', type=float, default=10.0, help='allowed change in percent')
+    compare_parser.add_argument('--min-ms', type=float, default=0.5,
+                                help='ignore latency changes smaller than this many ms')
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""Server-side shopping carts.
+
+The session cookie only carries a short ``cart_id``; the cart itself lives in
+a store chosen with CART_STORE:
+
+- ``sqlite`` (default): ``carts`` / ``cart_items`` tables, shared by all workers
+- ``memory``: per-process LRU with TTL (single-process deployments, tests)
+
+A cart holds ``{product_id: quantity}`` plus a running total that every
+add/update/remove adjusts by the line's delta, so reading the total never
+walks the cart. Each line keeps the unit price it was counted at: a change
+takes the line's old amount out at that price and puts the new one in at
+the current catalog price, so the total always equals the sum of its lines
+(and an emptied cart is back at 0) whatever the catalog did in between.
+The cart page and checkout both price every line from the catalog; the
+page uses the counted-at prices (and the running total) only to point out
+prices that changed since the line was added.
+"""
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import models
+
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+class Cart:
+    def __init__(self, lines=None, total=0.0, prices=None):
+        self.lines = lines or {}
+        self.total = total
+        # product_id -> unit price the line was counted at
+        self.prices = prices or {}
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def __len__(self):
+        return sum(self.lines.values())
+
+
+def new_cart_id():
+    return secrets.token_urlsafe(12)
+
+
+class MemoryCartStore:
+    """LRU of carts in this process; idle carts expire after ``ttl`` seconds."""
+
+    def __init__(self, max_carts=10000, ttl=DEFAULT_TTL):
+        self.max_carts = max_carts
+        self.ttl = ttl
+        self._carts = OrderedDict()  # cart_id -> [{product_id: (quantity, unit_price)}, total, expires_at]
+        self._lock = threading.Lock()
+
+    def _entry(self, cart_id, create=False):
+        entry = self._carts.get(cart_id)
+        now = time.monotonic()
+        if entry is not None and entry[2] < now:
+            del self._carts[cart_id]
+            entry = None
+        if entry is None:
+            if not create:
+                return None
+            entry = self._carts[cart_id] = [{}, 0.0, 0]
+            while len(self._carts) > self.max_carts:
+                self._carts.popitem(last=False)
+        self._carts.move_to_end(cart_id)
+        entry[2] = now + self.ttl
+        return entry
+
+    def get(self, cart_id):
+        with self._lock:
+            entry = self._entry(cart_id)
+            if not entry:
+                return Cart()
+            lines = entry[0]
+            return Cart({product_id: line[0] for product_id, line in lines.items()}, entry[1],
+                        {product_id: line[1] for product_id, line in lines.items()})
+
+    def _set_line(self, entry, product_id, unit_price, quantity):
+        lines = entry[0]
+        old_quantity, old_price = lines.pop(product_id, (0, 0.0))
+        if quantity > 0:
+            lines[product_id] = (quantity, unit_price)
+        else:
+            quantity = 0
+        entry[1] = round(entry[1] + quantity * unit_price - old_quantity * old_price, 2) if lines else 0.0
+
+    def set_quantity(self, cart_id, product_id, unit_price, quantity):
+        """Set a line's quantity (0 removes it) at ``unit_price`` and adjust the running total."""
+        with self._lock:
+            self._set_line(self._entry(cart_id, create=True), product_id, unit_price, quantity)
+
+    def add(self, cart_id, product_id, unit_price, quantity=1):
+        with self._lock:
+            entry = self._entry(cart_id, create=True)
+            current = entry[0].get(product_id, (0, 0.0))[0]
+            self._set_line(entry, product_id, unit_price, current + quantity)
+
+    def remove(self, cart_id, product_id):
+        with self._lock:
+            entry = self._entry(cart_id)
+            if entry:
+                self._set_line(entry, product_id, 0.0, 0)
+
+    def clear(self, cart_id):
+        with self._lock:
+            self._carts.pop(cart_id, None)
+
+
+class SQLiteCartStore:
+    """Carts in the ``carts`` / ``cart_items`` tables (see migrations.py)."""
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+
+    def get(self, cart_id):
+        conn = models.get_db_connection()
+        cart = conn.execute('SELECT total, updated_at FROM carts WHERE id = ?', (cart_id,)).fetchone()
+        if cart is None or cart['updated_at'] < time.time() - self.ttl:
+            conn.close()
+            return Cart()
+        items = conn.execute('SELECT product_id, quantity, unit_price FROM cart_items WHERE cart_id = ?', (cart_id,)).fetchall()
+        conn.close()
+        return Cart({row['product_id']: row['quantity'] for row in items}, cart['total'],
+                    {row['product_id']: row['unit_price'] for row in items})
+
+    def _touch(self, conn, cart_id, delta):
+        now = int(time.time())
+        cur = conn.execute('UPDATE carts SET total = ROUND(total + ?, 2), updated_at = ? WHERE id = ?', (delta, now, cart_id))
+        if cur.rowcount == 0:
+            # New cart: good moment to drop abandoned ones
+            conn.execute('DELETE FROM cart_items WHERE cart_id IN (SELECT id FROM carts WHERE updated_at < ?)', (now - self.ttl,))
+            conn.execute('DELETE FROM carts WHERE updated_at < ?', (now - self.ttl,))
+            conn.execute('INSERT INTO carts (id, total, updated_at) VALUES (?, ROUND(?, 2), ?)', (cart_id, delta, now))
+
+    def _drop_if_expired(self, conn, cart_id):
+        # An expired cart reads as empty, so a write starts it afresh rather than reviving its lines
+        cur = conn.execute('DELETE FROM carts WHERE id = ? AND updated_at < ?', (cart_id, int(time.time()) - self.ttl))
+        if cur.rowcount:
+            conn.execute('DELETE FROM cart_items WHERE cart_id = ?', (cart_id,))
+
+    def _set_line(self, conn, cart_id, product_id, unit_price, quantity):
+        row = conn.execute('SELECT quantity, unit_price FROM cart_items WHERE cart_id = ? AND product_id = ?',
+                           (cart_id, product_id)).fetchone()
+        old = row['quantity'] * row['unit_price'] if row else 0
+        if quantity > 0:
+            conn.execute('INSERT OR REPLACE INTO cart_items (cart_id, product_id, quantity, unit_price) VALUES (?, ?, ?, ?)',
+                         (cart_id, product_id, quantity, unit_price))
+            self._touch(conn, cart_id, quantity * unit_price - old)
+        elif row:
+            conn.execute('DELETE FROM cart_items WHERE cart_id = ? AND product_id = ?', (cart_id, product_id))
+            self._touch(conn, cart_id, -old)
+            # Rounding leftovers must not outlive the last line
+            conn.execute('UPDATE carts SET total = 0 WHERE id = ? AND NOT EXISTS '
+                         '(SELECT 1 FROM cart_items WHERE cart_id = ?)', (cart_id, cart_id))
+
+    def set_quantity(self, cart_id, product_id, unit_price, quantity):
+        with models.write_transaction() as conn:
+            self._drop_if_expired(conn, cart_id)
+            self._set_line(conn, cart_id, product_id, unit_price, quantity)
+
+    def add(self, cart_id, product_id, unit_price, quantity=1):
+        with models.write_transaction() as conn:
+            self._drop_if_expired(conn, cart_id)
+            row = conn.execute('SELECT quantity FROM cart_items WHERE cart_id = ? AND product_id = ?',
+                               (cart_id, product_id)).fetchone()
+            self._set_line(conn, cart_id, product_id, unit_price, (row['quantity'] if row else 0) + quantity)
+
+    def remove(self, cart_id, product_id):
+        with models.write_transaction() as conn:
+            self._drop_if_expired(conn, cart_id)
+            self._set_line(conn, cart_id, product_id, 0.0, 0)
+
+    def clear(self, cart_id):
+        with models.write_transaction() as conn:
+            conn.execute('DELETE FROM cart_items WHERE cart_id = ?', (cart_id,))
+            conn.execute('DELETE FROM carts WHERE id = ?', (cart_id,))
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_cart_store():
+    """The store selected by CART_STORE (``sqlite`` or ``memory``)."""
+    kind = os.environ.get('CART_STORE', 'sqlite').lower()
+    with _stores_lock:
+        store = _stores.get(kind)
+        if store is None:
+            ttl = int(os.environ.get('CART_TTL', DEFAULT_TTL))
+            if kind == 'memory':
+                store = MemoryCartStore(ttl=ttl)
+            elif kind == 'sqlite':
+                store = SQLiteCartStore(ttl=ttl)
+            else:
+                raise ValueError(f'Unknown CART_STORE: {kind}')
+            _stores[kind] = store
+        return store
@@ -0,0 +1,155 @@
+"""In-process product catalog cache.
+
+Products are read on nearly every page, so each worker keeps the whole
+catalog in memory: an id-indexed dict, the sorted id list (for keyset pages)
+and a price-sorted array (for range filters via bisect).
+
+Coherence between workers comes from the ``change_counters`` row for
+``products``, which triggers bump on every insert/update/delete. Writes made
+through models.py patch the local cache immediately (write-through); writes
+from other processes are noticed the next time the counter is checked, at
+most every CATALOG_CACHE_CHECK_INTERVAL seconds. Reads in between never touch
+the database.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+
+
+def cache_enabled():
+    return os.environ.get('CATALOG_CACHE', '1').lower() not in ('0', 'false', 'no', 'off')
+
+
+def read_generation(conn, table='products'):
+    row = conn.execute('SELECT generation FROM change_counters WHERE table_name = ?', (table,)).fetchone()
+    return row[0] if row else 0
+
+
+class CatalogCache:
+    def __init__(self, check_interval=None):
+        if check_interval is None:
+            check_interval = float(os.environ.get('CATALOG_CACHE_CHECK_INTERVAL', 1.0))
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self.generation = None  # None = not loaded
+        self._checked_at = 0.0
+        self._by_id = {}
+        self._ids = []
+        self._by_price = []  # sorted (price, id)
+
+    # ---- loading and coherence ----
+
+    def invalidate(self):
+        with self._lock:
+            self.generation = None
+
+    def _load(self, conn):
+        own_transaction = not conn.in_transaction
+        if own_transaction:
+            # Counter and rows from the same snapshot
+            conn.execute('BEGIN')
+        try:
+            generation = read_generation(conn)
+            rows = [dict(row) for row in conn.execute('SELECT * FROM products ORDER BY id')]
+        finally:
+            if own_transaction:
+                conn.commit()
+        self._by_id = {row['id']: row for row in rows}
+        self._ids = [row['id'] for row in rows]
+        # NULL prices never match a price range in SQL either
+        self._by_price = sorted((row['price'], row['id']) for row in rows if row['price'] is not None)
+        self.generation = generation
+
+    def ensure_fresh(self, get_connection):
+        """Reload if never loaded or another process changed the catalog."""
+        now = time.monotonic()
+        if self.generation is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            conn = get_connection()
+            try:
+                if self.generation is None or read_generation(conn) != self.generation:
+                    self._load(conn)
+            finally:
+                conn.close()
+            self._checked_at = now
+
+    def ensure_generation(self, get_connection, generation):
+        """Reload now unless the cache already reflects ``generation`` (or newer)."""
+        if self.generation is not None and self.generation >= generation:
+            return
+        with self._lock:
+            conn = get_connection()
+            try:
+                self._load(conn)
+            finally:
+                conn.close()
+            self._checked_at = time.monotonic()
+
+    def apply(self, generation, product_id, row):
+        """Write-through after a committed change; ``row`` is None for a delete.
+
+        ``generation`` is the counter value the change produced. If the cache
+        missed a change in between, it is dropped and reloaded on next read.
+        """
+        with self._lock:
+            if self.generation is None or self.generation >= generation:
+                return
+            if self.generation != generation - 1:
+                self.generation = None
+                return
+            old = self._by_id.pop(product_id, None)
+            if old is not None and old['price'] is not None:
+                del self._by_price[bisect_left(self._by_price, (old['price'], product_id))]
+            if row is None:
+                if old is not None:
+                    del self._ids[bisect_left(self._ids, product_id)]
+            else:
+                if old is None:
+                    insort(self._ids, product_id)
+                self._by_id[product_id] = row
+                if row['price'] is not None:
+                    insort(self._by_price, (row['price'], product_id))
+            self.generation = generation
+
+    # ---- reads ----
+
+    def get(self, get_connection, product_id):
+        self.ensure_fresh(get_connection)
+        return self._by_id.get(product_id)
+
+    def query(self, get_connection, min_price=None, max_price=None, has_image=None, after_id=None, limit=None):
+        """Products in id order, with the same filters as models.get_products (minus search)."""
+        self.ensure_fresh(get_connection)
+        with self._lock:
+            if min_price is not None or max_price is not None:
+                lo = 0 if min_price is None else bisect_left(self._by_price, (min_price,))
+                hi = len(self._by_price) if max_price is None else bisect_right(self._by_price, (max_price, float('inf')))
+                ids = sorted(pid for _, pid in self._by_price[lo:hi])
+            else:
+                ids = self._ids
+            start = 0 if after_id is None else bisect_right(ids, after_id)
+            result = []
+            for pid in islice(ids, start, None):
+                row = self._by_id[pid]
+                if has_image is True and not row['image']:
+                    continue
+                result.append(row)
+                if limit is not None and len(result) >= limit:
+                    break
+            return result
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def for_db(db_path):
+    """The cache for one database file (tests and tools may use several)."""
+    with _caches_lock:
+        cache = _caches.get(db_path)
+        if cache is None:
+            cache = _caches[db_path] = CatalogCache()
+        return cache
@@ -0,0 +1,224 @@
+"""Response compression (gzip; br and zstd when brotli / zstandard are installed).
+
+``init_app`` registers an after-request hook that compresses text-like
+responses (HTML, JSON, NDJSON, CSV, ...) with the best encoding the client
+accepts (Accept-Encoding q-values, ties broken by ENCODINGS order) and adds
+``Vary: Accept-Encoding``. Bodies below COMPRESSION_MIN_SIZE bytes stay as
+they are; COMPRESSION_LEVEL sets the gzip level (1-9), COMPRESSION_BR_LEVEL
+and COMPRESSION_ZSTD_LEVEL the others.
+
+Streamed responses (exports) are compressed chunk by chunk, each chunk
+flushed so the client keeps receiving data as it is produced.
+
+A compressed body is a different representation, so its strong ETag gets
+the encoding as a suffix (``"<tag>-gzip"``); http_cache answers 304 for
+either. For responses with a strong ETag the compressed body is kept in a
+small per-process LRU (COMPRESSION_CACHE_BYTES) keyed by that ETag: while the
+data doesn't change, each representation is compressed once per worker.
+COMPRESSION=0 switches it all off (e.g. when nginx compresses instead).
+"""
+import gzip
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # gzip (and zstd) only
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # gzip (and br) only
+    zstandard = None
+
+COMPRESSIBLE_TYPES = frozenset({
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript', 'text/xml',
+    'application/json', 'application/x-ndjson', 'application/javascript', 'application/xml', 'image/svg+xml',
+})
+
+
+def compression_enabled():
+    return os.environ.get('COMPRESSION', '1').lower() not in ('0', 'false', 'no', 'off')
+
+
+def _level(name, default):
+    return int(os.environ.get(name, default))
+
+
+class Gzip:
+    name = 'gzip'
+
+    def __init__(self):
+        self.level = _level('COMPRESSION_LEVEL', 6)
+
+    def compress(self, data):
+        # mtime=0: the same body always compresses to the same bytes
+        return gzip.compress(data, self.level, mtime=0)
+
+    def stream(self, chunks):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            if chunk:
+                yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+class Brotli:
+    name = 'br'
+
+    def __init__(self):
+        self.level = _level('COMPRESSION_BR_LEVEL', 5)
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.level)
+
+    def stream(self, chunks):
+        compressor = brotli.Compressor(quality=self.level)
+        for chunk in chunks:
+            if chunk:
+                yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+
+
+class Zstd:
+    name = 'zstd'
+
+    def __init__(self):
+        self.level = _level('COMPRESSION_ZSTD_LEVEL', 3)
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def stream(self, chunks):
+        compressor = zstandard.ZstdCompressor(level=self.level).compressobj()
+        for chunk in chunks:
+            if chunk:
+                yield compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        yield compressor.flush()
+
+
+def available_encodings():
+    """Encoders in server preference order (best ratio for text first)."""
+    encoders = []
+    if brotli is not None:
+        encoders.append(Brotli())
+    if zstandard is not None:
+        encoders.append(Zstd())
+    encoders.append(Gzip())
+    return encoders
+
+
+ENCODING_NAMES = ('br', 'zstd', 'gzip')
+
+
+def negotiate(accept_encodings, encoders):
+    """The encoder to use for werkzeug's parsed Accept-Encoding, or None (identity)."""
+    best, best_quality = None, 0
+    for encoder in encoders:
+        quality = accept_encodings[encoder.name]
+        if quality > best_quality:
+            best, best_quality = encoder, quality
+    return best
+
+
+def etag_variants(etag):
+    """The ETags a client may hold for the representations of ``etag`` (identity first)."""
+    return [etag] + [f'{etag}-{name}' for name in ENCODING_NAMES]
+
+
+class CompressedCache:
+    """LRU of compressed bodies keyed by (ETag, encoding), bounded by total size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+class Compressor:
+    def __init__(self, min_size=None, cache_bytes=None):
+        self.min_size = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024)) if min_size is None else min_size
+        if cache_bytes is None:
+            cache_bytes = int(os.environ.get('COMPRESSION_CACHE_BYTES', 16 * 1024 * 1024))
+        self.encoders = available_encodings()
+        self.cache = CompressedCache(cache_bytes)
+
+    def __call__(self, response):
+        """after_request hook."""
+        if response.mimetype not in COMPRESSIBLE_TYPES and response.status_code != 304:
+            return response
+        response.vary.add('Accept-Encoding')
+        if (response.status_code in (204, 206, 304) or response.status_code < 200
+                or 'Content-Encoding' in response.headers or response.direct_passthrough
+                or 'no-transform' in response.headers.get('Cache-Control', '')):
+            return response
+        encoder = negotiate(request.accept_encodings, self.encoders)
+        if encoder is None:
+            return response
+
+        if response.is_streamed:
+            original = response.response
+            chunks = response.iter_encoded()
+
+            def stream():
+                try:
+                    yield from encoder.stream(chunks)
+                finally:
+                    if hasattr(original, 'close'):
+                        original.close()
+
+            response.response = stream()
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            etag, weak = response.get_etag()
+            key = (etag, encoder.name, len(data)) if etag and not weak else None
+            body = self.cache.get(key) if key else None
+            if body is None:
+                body = encoder.compress(data)
+                if key:
+                    self.cache.put(key, body)
+            response.set_data(body)
+            if key:
+                response.set_etag(f'{etag}-{encoder.name}')
+        response.headers['Content-Encoding'] = encoder.name
+        return response
+
+
+def init_app(app):
+    if not compression_enabled():
+        return
+    app.extensions['compression'] = compressor = Compressor()
+    app.after_request(compressor)
@@ -0,0 +1,59 @@
+"""Admin dashboard aggregates.
+
+Order figures come from the incrementally maintained summary tables
+(daily_sales, status_counts, product_sales); feedback counts are a GROUP BY
+over the feedback type index. Nothing pulls rows into Python. The result is kept per
+database for DASHBOARD_CACHE_TTL seconds, so reloading the dashboard or
+several admins looking at it cost one round of aggregate queries per TTL.
+Figures can be that many seconds stale; the admin routes that change orders,
+products or feedback call ``invalidate`` so the admin's own change shows up
+on the redirect back to the dashboard.
+"""
+import os
+import threading
+import time
+
+import db
+import models
+
+DEFAULT_TTL = 30.0
+
+_cache = {}  # db path -> (expires_at, stats)
+_lock = threading.Lock()
+
+
+def cache_ttl():
+    return float(os.environ.get('DASHBOARD_CACHE_TTL', DEFAULT_TTL))
+
+
+def compute_stats():
+    by_status = [dict(row) for row in models.get_order_stats_by_status()]
+    return {
+        'orders_total': sum(row['orders'] for row in by_status),
+        'revenue_total': round(sum(row['revenue'] for row in by_status), 2),
+        'by_status': by_status,
+        'by_day': [dict(row) for row in models.get_order_stats_by_day()],
+        'top_products': [dict(row) for row in models.get_top_products()],
+        'feedback_by_type': {row['feedback_type']: row['count'] for row in models.get_feedback_counts_by_type()},
+        'generated_at': time.time(),
+    }
+
+
+def get_stats():
+    """Dashboard figures, recomputed at most once per TTL."""
+    key = db.get_db_path()
+    now = time.monotonic()
+    with _lock:
+        cached = _cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+    stats = compute_stats()
+    with _lock:
+        _cache[key] = (now + cache_ttl(), stats)
+    return stats
+
+
+def invalidate():
+    """Drop the cached figures of this process (other workers catch up within the TTL)."""
+    with _lock:
+        _cache.clear()
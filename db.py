@@ -0,0 +1,253 @@
+"""SQLite connection management.
+
+Every data-access helper in ``models.py`` follows the same pattern: get a
+connection, run a query, ``close()`` it. Opening a fresh ``sqlite3``
+connection for each of those calls means re-reading the schema and losing
+the per-connection prepared statement cache every time, so instead each
+thread keeps one long-lived connection per database file and ``close()``
+just hands it back.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import diagnostics
+import metrics
+
+# Number of prepared statements sqlite3 keeps per connection (default is 128)
+STATEMENT_CACHE_SIZE = 256
+
+# Storage profiles: PRAGMAs applied to every new connection. DB_PROFILE picks
+# one; DB_CACHE_SIZE / DB_MMAP_SIZE override the matching values.
+STORAGE_PROFILES = {
+    # Rollback journal and SQLite defaults (the original behaviour)
+    'legacy': {},
+    # Readers never block behind a writer and vice versa; NORMAL sync is
+    # durable across application crashes, only an OS crash can lose the
+    # last transactions.
+    'wal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,       # KiB when negative -> 64 MiB page cache
+        'mmap_size': 268435456,     # 256 MiB
+    },
+}
+DEFAULT_PROFILE = 'wal'
+
+_local = threading.local()
+# One writer per process at a time; BEGIN IMMEDIATE handles other processes
+_write_lock = threading.RLock()
+
+
+def get_db_path():
+    # Allow overriding DB file path via environment variable (useful for containers)
+    return os.environ.get('DB_PATH', 'db.sqlite')
+
+
+def pool_enabled():
+    """Pooling can be switched off with DB_POOL=0 (benchmarks, debugging)."""
+    return os.environ.get('DB_POOL', '1').lower() not in ('0', 'false', 'no', 'off')
+
+
+def _timed(method):
+    """Add the call's duration to the current request's query time (metrics.py), if a request is running."""
+    @wraps(method)
+    def wrapper(self, *args):
+        stats = metrics.current_stats()
+        if stats is None:
+            return method(self, *args)
+        start = time.perf_counter()
+        try:
+            return method(self, *args)
+        finally:
+            stats.query_time += time.perf_counter() - start
+    return wrapper
+
+
+def _timed_statement(method, starts_statement=False):
+    """Like ``_timed``, and also add the time to the cursor's current statement for the slow-query log.
+
+    The execute and fetch calls of one statement are summed; it is logged
+    once, by the call that takes it over the connection's threshold.
+    """
+    @wraps(method)
+    def wrapper(self, *args):
+        stats = metrics.current_stats()
+        threshold = getattr(self.connection, 'slow_query_threshold', 0)
+        if stats is None and not threshold:
+            return method(self, *args)
+        if starts_statement:
+            self.statement, self.statement_time = args, 0.0
+        start = time.perf_counter()
+        try:
+            return method(self, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            if stats is not None:
+                stats.query_time += elapsed
+            statement = getattr(self, 'statement', None)
+            if threshold and statement is not None:
+                self.statement_time += elapsed
+                if self.statement_time >= threshold:
+                    self.statement = None
+                    _log_slow(self.connection, statement, self.statement_time, method is sqlite3.Cursor.executemany)
+    return wrapper
+
+
+def _log_slow(conn, statement, seconds, many):
+    sql, parameters = statement[0], (statement[1] if len(statement) > 1 else ())
+    if many:
+        # Plan and parameters of the first row; executemany accepts any iterable, which may be spent by now
+        rows = parameters if isinstance(parameters, (list, tuple)) else []
+        diagnostics.log_slow_query(conn, sql, rows[0] if rows else (), seconds, batch_size=len(rows) or None)
+    else:
+        diagnostics.log_slow_query(conn, sql, parameters, seconds)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    execute = _timed_statement(sqlite3.Cursor.execute, starts_statement=True)
+    executemany = _timed_statement(sqlite3.Cursor.executemany, starts_statement=True)
+    fetchone = _timed_statement(sqlite3.Cursor.fetchone)
+    fetchmany = _timed_statement(sqlite3.Cursor.fetchmany)
+    fetchall = _timed_statement(sqlite3.Cursor.fetchall)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose statements are timed per request (counting is done by the trace callback)
+    and checked against the slow-query threshold."""
+
+    slow_query_threshold = 0
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    commit = _timed(sqlite3.Connection.commit)
+
+
+class PooledConnection(InstrumentedConnection):
+    """Connection that survives ``close()``.
+
+    ``close()`` only discards uncommitted work (which is what a real close
+    would do) once the outermost caller has released the connection, so a
+    helper called in the middle of another helper's transaction can't roll
+    it back.
+    """
+
+    checkouts = 0
+
+    def close(self):
+        self.checkouts = max(self.checkouts - 1, 0)
+        if not self.checkouts and self.in_transaction:
+            self.rollback()
+
+    def dispose(self):
+        """Actually close the underlying sqlite3 connection."""
+        super().close()
+
+
+def get_storage_profile():
+    """Return the PRAGMAs for the configured DB_PROFILE."""
+    name = os.environ.get('DB_PROFILE', DEFAULT_PROFILE).lower()
+    if name not in STORAGE_PROFILES:
+        raise ValueError(f'Unknown DB_PROFILE: {name}')
+    pragmas = dict(STORAGE_PROFILES[name])
+    for pragma, var in (('cache_size', 'DB_CACHE_SIZE'), ('mmap_size', 'DB_MMAP_SIZE')):
+        if os.environ.get(var):
+            pragmas[pragma] = int(os.environ[var])
+    return pragmas
+
+
+def configure_connection(conn):
+    """Per-connection settings, applied once when the connection is opened."""
+    conn.row_factory = sqlite3.Row
+    if metrics.metrics_enabled():
+        conn.set_trace_callback(metrics.trace_statement)
+    if isinstance(conn, InstrumentedConnection):
+        conn.slow_query_threshold = diagnostics.slow_query_threshold()
+    conn.execute('PRAGMA temp_store = MEMORY')
+    for pragma, value in get_storage_profile().items():
+        conn.execute(f'PRAGMA {pragma} = {value}')
+    return conn
+
+
+def connect(db_path=None, factory=InstrumentedConnection):
+    """Open a new, configured connection (not pooled)."""
+    # uri: archive.attach passes a file: URI (mode=ro), which SQLite only honours on URI-enabled connections
+    conn = sqlite3.connect(db_path or get_db_path(), timeout=30.0, isolation_level='DEFERRED',
+                           factory=factory, cached_statements=STATEMENT_CACHE_SIZE, uri=True)
+    return configure_connection(conn)
+
+
+def get_connection():
+    """Return this thread's connection for the current DB_PATH."""
+    if not pool_enabled():
+        return connect()
+    db_path = get_db_path()
+    pool = getattr(_local, 'connections', None)
+    if pool is None:
+        pool = _local.connections = {}
+    conn = pool.get(db_path)
+    if conn is None:
+        conn = pool[db_path] = connect(db_path, factory=PooledConnection)
+    conn.checkouts += 1
+    return conn
+
+
+@contextmanager
+def write_transaction(conn):
+    """Run a block of writes on ``conn`` as one ``BEGIN IMMEDIATE`` transaction.
+
+    Taking the write lock up front means a writer waits (up to the busy
+    timeout) before it starts instead of failing with "database is locked"
+    when it tries to upgrade a read lock halfway through. Writers inside the
+    process are serialized by a lock so they don't spin on SQLite's busy
+    handler. A nested call joins the transaction that is already open.
+    The connection is closed (returned to the pool) afterwards.
+    """
+    try:
+        if conn.in_transaction:
+            yield conn
+            return
+        with _write_lock:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def release_connection(exc=None):
+    """Teardown hook: reset this thread's connections after a request.
+
+    Anything a request left uncommitted (e.g. a helper that raised before
+    ``commit()``) is rolled back so it doesn't keep holding a lock.
+    """
+    for conn in getattr(_local, 'connections', {}).values():
+        conn.checkouts = 0
+        if conn.in_transaction:
+            conn.rollback()
+
+
+def close_all():
+    """Close this thread's pooled connections for real."""
+    pool = getattr(_local, 'connections', {})
+    for conn in pool.values():
+        conn.dispose()
+    pool.clear()
+
+
+def init_app(app):
+    app.teardown_appcontext(release_connection)
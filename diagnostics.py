@@ -0,0 +1,190 @@
+"""Slow-query log and an opt-in per-request profiler.
+
+Both write to rotating files in LOG_DIR (``/var/log/laba-5`` in the Docker
+image, falling back to stderr when the directory can't be written):
+
+- ``slow_queries.log`` — one JSON object per statement whose execute/fetch
+  calls took longer than SLOW_QUERY_MS in total: SQL, parameters with string
+  values redacted, duration and ``EXPLAIN QUERY PLAN``. Timing is done by the
+  cursors from db.py, so it covers every query made through ``models``.
+- ``profiles.log`` — call trees of profiled requests. A logged-in admin
+  sends ``X-Profile: 1`` to a ``/api`` or shop route and gets the call tree
+  back instead of the normal body (the status code is kept). pyinstrument is
+  used when installed, cProfile otherwise. Only the view is profiled, not
+  the body of a streamed response.
+"""
+import cProfile
+import json
+import logging
+import os
+import pstats
+import sqlite3
+import sys
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+from flask import Response, g, has_request_context, request, session
+
+try:
+    from pyinstrument import Profiler as _Pyinstrument
+except ImportError:
+    _Pyinstrument = None
+
+DEFAULT_LOG_DIR = '/var/log/laba-5'
+# Blueprints whose requests may be profiled
+PROFILED_BLUEPRINTS = ('api', 'shop')
+# Call-tree lines below this share of the request's time are left out
+TREE_MIN_SHARE = 0.01
+TREE_MAX_DEPTH = 40
+
+_loggers_lock = threading.Lock()
+
+
+def slow_query_threshold():
+    """SLOW_QUERY_MS as seconds; 0 (or unset to 0) disables the slow-query log."""
+    return float(os.environ.get('SLOW_QUERY_MS', 100)) / 1000
+
+
+def profiler_enabled():
+    return os.environ.get('REQUEST_PROFILER', '1').lower() not in ('0', 'false', 'no', 'off')
+
+
+def _get_logger(name, filename):
+    """Logger writing to LOG_DIR/filename, (re)attached when LOG_DIR changes."""
+    logger = logging.getLogger(f'laba5.{name}')
+    path = os.path.join(os.environ.get('LOG_DIR', DEFAULT_LOG_DIR), filename)
+    if getattr(logger, 'log_path', None) == path:
+        return logger
+    with _loggers_lock:
+        if getattr(logger, 'log_path', None) == path:
+            return logger
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+                                          backupCount=int(os.environ.get('LOG_BACKUPS', 5)), encoding='utf-8')
+        except OSError:
+            handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(process)d %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.log_path = path
+    return logger
+
+
+def redact(parameters):
+    """Keep numbers and NULLs (ids, limits, prices), replace text and blobs by their type and length."""
+    def one(value):
+        if value is None or isinstance(value, (int, float)):
+            return value
+        return f'<{type(value).__name__}:{len(value)}>' if hasattr(value, '__len__') else f'<{type(value).__name__}>'
+    if isinstance(parameters, dict):
+        return {key: one(value) for key, value in parameters.items()}
+    return [one(value) for value in parameters]
+
+
+def query_plan(conn, sql, parameters=()):
+    """EXPLAIN QUERY PLAN lines, or None for statements without one (PRAGMA, BEGIN, ...)."""
+    try:
+        # Plain sqlite3 execute: not timed or logged again
+        rows = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+    except sqlite3.Error:
+        return None
+    return [row[3] for row in rows] or None
+
+
+def log_slow_query(conn, sql, parameters, seconds, batch_size=None):
+    entry = {'duration_ms': round(seconds * 1000, 2), 'sql': ' '.join(sql.split()), 'params': redact(parameters)}
+    if batch_size is not None:
+        entry['batch_size'] = batch_size
+    if has_request_context():
+        entry['request'] = f'{request.method} {request.full_path.rstrip("?")}'
+    entry['plan'] = query_plan(conn, sql, parameters)
+    _get_logger('slow_queries', 'slow_queries.log').warning(json.dumps(entry, ensure_ascii=False, default=str))
+
+
+def call_tree(profile, min_share=TREE_MIN_SHARE, max_depth=TREE_MAX_DEPTH):
+    """Render a cProfile run as an indented tree of cumulative times, heaviest calls first."""
+    stats = pstats.Stats(profile).stats
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, (_, calls, _, cumulative) in callers.items():
+            callees.setdefault(caller, []).append((cumulative, calls, func))
+    roots = [func for func, entry in stats.items() if not entry[4]]
+    total = sum(stats[func][3] for func in roots) or 1e-9
+    lines = []
+
+    def walk(func, cumulative, calls, depth, path):
+        filename, line, name = func
+        if filename != '~':
+            relative = os.path.relpath(filename)
+            name = f'{name}  {filename if relative.startswith("..") else relative}:{line}'
+        lines.append(f'{"  " * depth}{cumulative * 1000:8.2f} ms {cumulative / total:6.1%}  {calls:>5}x  {name}')
+        if depth >= max_depth:
+            return
+        # cProfile only knows caller->callee totals, so a function reached from several places
+        # gets its callees' times split in proportion to the time spent on this path
+        share = cumulative / stats[func][3] if stats[func][3] else 0
+        for child_time, child_calls, child in sorted(callees.get(func, ()), key=lambda c: c[0], reverse=True):
+            if child not in path and child_time * share / total >= min_share:
+                walk(child, child_time * share, child_calls, depth + 1, path | {child})
+
+    for root in sorted(roots, key=lambda func: stats[func][3], reverse=True):
+        walk(root, stats[root][3], stats[root][1], 0, {root})
+    return '\n'.join(lines)
+
+
+def _wants_profile():
+    return (request.blueprint in PROFILED_BLUEPRINTS and request.headers.get('X-Profile', '') not in ('', '0')
+            and session.get('admin_logged_in'))
+
+
+def _start_profile():
+    if not _wants_profile():
+        return
+    profiler = _Pyinstrument() if _Pyinstrument is not None else cProfile.Profile()
+    g.profile = (profiler, time.perf_counter())
+    if _Pyinstrument is not None:
+        profiler.start()
+    else:
+        profiler.enable()
+
+
+def _finish_profile(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    profiler, started = profile
+    if _Pyinstrument is not None:
+        profiler.stop()
+        tree = profiler.output_text(unicode=True, color=False)
+    else:
+        profiler.disable()
+        tree = call_tree(profiler)
+    elapsed = time.perf_counter() - started
+    report = f'{request.method} {request.full_path.rstrip("?")} -> {response.status_code} in {elapsed * 1000:.2f} ms\n{tree}\n'
+    _get_logger('profiles', 'profiles.log').info(report)
+    return Response(report, status=response.status_code, mimetype='text/plain',
+                    headers={'Cache-Control': 'no-store', 'X-Profiler': 'pyinstrument' if _Pyinstrument else 'cProfile'})
+
+
+def _discard_profile(exc=None):
+    """A view that raised never reaches after_request; don't leave the profiler running on this thread."""
+    profile = g.pop('profile', None)
+    if profile is not None:
+        if _Pyinstrument is not None:
+            profile[0].stop()
+        else:
+            profile[0].disable()
+
+
+def init_app(app):
+    if not profiler_enabled():
+        return
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_discard_profile)
@@ -0,0 +1,44 @@
+"""Streaming NDJSON / CSV encoders for table exports (``/api/v1/export/...``).
+
+Each encoder takes the generator from ``models.iter_table_rows`` and yields
+one text chunk per fetched batch, so memory stays flat whatever the table
+size: only the current batch and its encoded text are alive at any time.
+"""
+import csv
+import io
+import json
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+# One encoder for every row: json.dumps would rebuild it per call
+_encode = json.JSONEncoder(ensure_ascii=False, check_circular=False, separators=(',', ':')).encode
+
+
+def ndjson_chunks(rows):
+    columns = next(rows)
+    for batch in rows:
+        yield ''.join(_encode(dict(zip(columns, row))) + '\n' for row in batch)
+
+
+def csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(next(rows))
+    for batch in rows:
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # header only (empty table) or anything not flushed yet
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+ENCODERS = {
+    'ndjson': ndjson_chunks,
+    'csv': csv_chunks,
+}
@@ -0,0 +1,331 @@
+"""Write-behind queue for feedback submissions.
+
+``POST /feedback`` and ``POST /api/v1/feedback`` don't insert into SQLite
+themselves: ``submit`` appends the entry as one JSON line to this worker's
+spool file and the route answers 202 with a provisional id. A background
+thread per worker takes whatever is queued every FEEDBACK_FLUSH_INTERVAL
+seconds (sooner once FEEDBACK_BATCH_SIZE entries wait) and inserts it in one
+transaction (models.add_feedback_batch), so a burst of submissions costs a
+few write locks instead of one each.
+
+Durability: an entry is acknowledged only after its line is in the spool.
+Every batch gets its own segment file, deleted only after the batch has
+committed. A process holds an exclusive flock on its segments for as long as
+it owns them, so a segment that can be locked was left behind by a process
+that is gone (crash, restart, deploy); the first flusher to find one replays
+it - at startup and then every FEEDBACK_RECOVER_INTERVAL seconds. The
+provisional id is stored in ``feedback.submission_id`` (unique), so a segment
+replayed after its batch committed inserts nothing: delivery is at least
+once, duplicates are dropped. Lines reach the OS on every submit, which
+survives a killed worker; FEEDBACK_SPOOL_FSYNC=1 also fsyncs them (power loss).
+
+The queue is bounded (FEEDBACK_QUEUE_MAX entries per worker); ``submit``
+raises QueueFull beyond that and the routes answer 503. FEEDBACK_QUEUE=0, or
+a platform without fcntl, keeps the synchronous insert.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, feedback is written synchronously
+    fcntl = None
+
+import db
+import metrics
+import models
+
+SPOOL_SUFFIX = '.spool'
+FLUSH_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+logger = logging.getLogger(__name__)
+
+
+def queue_enabled():
+    return fcntl is not None and os.environ.get('FEEDBACK_QUEUE', '1').lower() not in ('0', 'false', 'no', 'off')
+
+
+def spool_dir(db_path):
+    """FEEDBACK_SPOOL_DIR, or ``feedback-spool`` next to the database (same volume)."""
+    return os.environ.get('FEEDBACK_SPOOL_DIR') or os.path.join(os.path.dirname(os.path.abspath(db_path)), 'feedback-spool')
+
+
+class QueueFull(Exception):
+    """The worker already holds FEEDBACK_QUEUE_MAX unflushed entries; the client should retry later."""
+
+
+class Segment:
+    """One spool file, flock-ed for as long as this process owns it."""
+
+    def __init__(self, path, fd):
+        self.path = path
+        self.fd = fd
+
+    @classmethod
+    def create(cls, directory):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}-{uuid.uuid4().hex}')
+        fd = os.open(path + '.tmp', os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        # Only visible to recovery once locked
+        os.rename(path + '.tmp', path + SPOOL_SUFFIX)
+        return cls(path + SPOOL_SUFFIX, fd)
+
+    @classmethod
+    def claim(cls, path):
+        """Lock an orphaned segment, or None when its owner is alive (or it is gone)."""
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return None
+        return cls(path, fd)
+
+    def append(self, line, fsync=False):
+        os.write(self.fd, line)
+        if fsync:
+            os.fsync(self.fd)
+
+    def read(self):
+        """Entries in the file; a torn last line (crash mid-write) was never acknowledged and is skipped."""
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        entries = []
+        for line in data.splitlines():
+            try:
+                item = json.loads(line)
+                entries.append((item['id'], item['name'], item['email'], item['message'], item['type']))
+            except (ValueError, KeyError):
+                logger.warning('skipping unreadable line in %s', self.path)
+        return entries
+
+    def discard(self):
+        """Delete the file, then release the lock (in that order, so nobody replays it in between)."""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self.close()
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FeedbackQueue:
+    def __init__(self, directory, max_depth=None, batch_size=None, flush_interval=None, recover_interval=None):
+        self.directory = directory
+        self.max_depth = max_depth or int(os.environ.get('FEEDBACK_QUEUE_MAX', 10000))
+        self.batch_size = batch_size or int(os.environ.get('FEEDBACK_BATCH_SIZE', 500))
+        if flush_interval is None:
+            flush_interval = float(os.environ.get('FEEDBACK_FLUSH_INTERVAL', 0.2))
+        self.flush_interval = flush_interval
+        if recover_interval is None:
+            recover_interval = float(os.environ.get('FEEDBACK_RECOVER_INTERVAL', 30))
+        self.recover_interval = recover_interval
+        self.fsync = os.environ.get('FEEDBACK_SPOOL_FSYNC', '0').lower() in ('1', 'true', 'yes', 'on')
+        self._cond = threading.Condition()
+        self._segment = None   # receives new entries
+        self._pending = []     # entries in _segment
+        self._sealed = []      # (segment, entries) handed to the flusher, not committed yet
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        # /metrics figures
+        self.flushed = 0
+        self.replayed = 0
+        self.rejected = 0
+        self.errors = 0
+        self._flush_counts = [0] * (len(FLUSH_BUCKETS) + 1)
+        self._flush_seconds = 0.0
+
+    @property
+    def depth(self):
+        """Entries accepted by this process and not committed yet."""
+        with self._cond:
+            return len(self._pending) + sum(len(entries) for _, entries in self._sealed)
+
+    def submit(self, name, email, message, feedback_type='general'):
+        """Spool one entry and return its provisional id (``feedback.submission_id`` once flushed)."""
+        submission_id = uuid.uuid4().hex
+        line = json.dumps({'id': submission_id, 'name': name, 'email': email, 'message': message,
+                           'type': feedback_type}, ensure_ascii=False).encode('utf-8') + b'\n'
+        with self._cond:
+            if len(self._pending) + sum(len(entries) for _, entries in self._sealed) >= self.max_depth:
+                self.rejected += 1
+                raise QueueFull()
+            if self._segment is None:
+                self._segment = Segment.create(self.directory)
+            self._segment.append(line, self.fsync)
+            self._pending.append((submission_id, name, email, message, feedback_type))
+            if self._thread is None or not self._thread.is_alive():
+                self._start()
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        return submission_id
+
+    def flush(self):
+        """Commit everything queued so far; returns False if the database write failed (entries stay spooled)."""
+        with self._flush_lock:
+            with self._cond:
+                if self._pending:
+                    self._sealed.append((self._segment, self._pending))
+                    self._segment, self._pending = None, []
+                sealed = list(self._sealed)
+            for item in sealed:
+                segment, entries = item
+                started = time.perf_counter()
+                try:
+                    models.add_feedback_batch(entries)
+                except Exception:
+                    logger.exception('feedback flush of %d entries failed, retrying later', len(entries))
+                    with self._cond:
+                        self.errors += 1
+                    return False
+                elapsed = time.perf_counter() - started
+                segment.discard()
+                with self._cond:
+                    self._sealed.remove(item)
+                    self.flushed += len(entries)
+                    self._flush_counts[bisect_left(FLUSH_BUCKETS, elapsed)] += 1
+                    self._flush_seconds += elapsed
+            return True
+
+    def recover(self):
+        """Replay segments left behind by dead processes; returns the number of entries found."""
+        try:
+            names = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return 0
+        found = 0
+        for name in names:
+            if not name.endswith(SPOOL_SUFFIX):
+                continue
+            segment = Segment.claim(os.path.join(self.directory, name))
+            if segment is None:
+                continue
+            try:
+                entries = segment.read()
+                if entries:
+                    models.add_feedback_batch(entries)
+            except Exception:
+                segment.close()
+                raise
+            segment.discard()
+            found += len(entries)
+        if found:
+            logger.warning('replayed %d feedback entries from orphaned spool segments', found)
+            with self._cond:
+                self.replayed += found
+        return found
+
+    def _start(self):
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='feedback-flusher', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        next_recovery = 0.0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopping or len(self._pending) >= self.batch_size,
+                                    timeout=self.flush_interval)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+            if time.monotonic() >= next_recovery:
+                try:
+                    self.recover()
+                except Exception:
+                    logger.exception('feedback spool recovery failed')
+                next_recovery = time.monotonic() + self.recover_interval
+
+    def stop(self, timeout=10):
+        """Stop the flusher after a last flush (worker shutdown)."""
+        with self._cond:
+            thread, self._stopping = self._thread, True
+            self._cond.notify()
+        if thread is not None:
+            thread.join(timeout)
+        self._thread = None
+
+    def metric_values(self):
+        with self._cond:
+            depth = len(self._pending) + sum(len(entries) for _, entries in self._sealed)
+            return (depth, list(self._flush_counts), self._flush_seconds,
+                    self.flushed, self.replayed, self.rejected, self.errors)
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_queue(db_path=None):
+    """The queue for one database file, started lazily in the process that uses it."""
+    db_path = db_path or db.get_db_path()
+    with _queues_lock:
+        queue = _queues.get(db_path)
+        if queue is None:
+            queue = _queues[db_path] = FeedbackQueue(spool_dir(db_path))
+        return queue
+
+
+def shutdown():
+    """Flush and stop every queue of this process (gunicorn worker_exit, interpreter exit)."""
+    with _queues_lock:
+        queues = list(_queues.values())
+    for queue in queues:
+        queue.stop()
+
+
+def _forget_queues():
+    # A forked child starts with no flusher thread; the parent keeps its segments and their locks
+    global _queues
+    _queues = {}
+
+
+if hasattr(os, 'register_at_fork'):  # not on Windows, where feedback is written synchronously anyway
+    os.register_at_fork(after_in_child=_forget_queues)
+atexit.register(shutdown)
+
+
+def collect_metrics():
+    with _queues_lock:
+        queues = list(_queues.values())
+    if not queues:
+        return []
+    depth, counts, seconds, flushed, replayed, rejected, errors = 0, [0] * (len(FLUSH_BUCKETS) + 1), 0.0, 0, 0, 0, 0
+    for queue in queues:
+        q_depth, q_counts, q_seconds, q_flushed, q_replayed, q_rejected, q_errors = queue.metric_values()
+        depth += q_depth
+        counts = [a + b for a, b in zip(counts, q_counts)]
+        seconds += q_seconds
+        flushed += q_flushed
+        replayed += q_replayed
+        rejected += q_rejected
+        errors += q_errors
+    labels = f'pid="{metrics.process_id()}"'
+    lines = ['# HELP feedback_queue_depth Feedback entries accepted and not yet committed.',
+             '# TYPE feedback_queue_depth gauge',
+             f'feedback_queue_depth{{{labels}}} {depth}']
+    lines += metrics.histogram_lines('feedback_queue_flush_seconds', 'Time to commit one batch of queued feedback.',
+                                     labels, FLUSH_BUCKETS, counts, seconds)
+    for name, help_text, value in (('feedback_queue_flushed_total', 'Feedback entries committed by the flusher.', flushed),
+                                   ('feedback_queue_replayed_total', 'Feedback entries replayed from orphaned spool segments.', replayed),
+                                   ('feedback_queue_rejected_total', 'Feedback submissions rejected because the queue was full.', rejected),
+                                   ('feedback_queue_flush_errors_total', 'Failed flush attempts (entries stay spooled).', errors)):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter', f'{name}{{{labels}}} {value}']
+    return lines
+
+
+metrics.register_collector(collect_metrics)
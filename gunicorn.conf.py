@@ -0,0 +1,68 @@
+"""Gunicorn settings for the production container.
+
+Everything can be tuned through environment variables:
+
+    WEB_CONCURRENCY     worker processes (default: 2 * CPUs + 1)
+    THREADS             threads per worker; > 1 switches to the gthread worker (default 4)
+    KEEPALIVE           seconds to keep idle client connections open (default 5)
+    TIMEOUT             seconds before a stuck worker is killed and replaced (default 30)
+    GRACEFUL_TIMEOUT    seconds workers get to finish requests on restart/shutdown (default 30)
+    MAX_REQUESTS        recycle a worker after this many requests, 0 = never (default 1000)
+
+Graceful restart: ``kill -HUP <master pid>`` applies pending migrations,
+starts new workers with fresh code and lets the old ones finish their
+in-flight requests.
+"""
+import multiprocessing
+import os
+import subprocess
+import sys
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '5000')}"
+
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# nginx keeps upstream connections alive; don't drop them between requests
+keepalive = int(os.environ.get('KEEPALIVE', 5))
+timeout = int(os.environ.get('TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT', 30))
+# Recycle workers now and then (memory growth), staggered so they don't all restart at once
+max_requests = int(os.environ.get('MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info')
+
+# Workers import the app themselves (no preload) and the master never imports it
+# (see init_database), so code reloads on HUP work
+preload_app = False
+
+
+def init_database():
+    """Run init_db.py (migrations, orphaned feedback spool) in a child process.
+
+    The master must not import the app modules: a HUP re-forks workers from
+    the master, which would hand them the master's copy of db.py / models.py.
+    """
+    subprocess.run([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'init_db.py')],
+                   check=True)
+    os.environ['INIT_DB'] = '0'
+
+
+def on_starting(server):
+    """Migrate once, before any worker is forked."""
+    init_database()
+
+
+def on_reload(server):
+    """HUP: migrations of the new code run before its workers start."""
+    init_database()
+
+
+def worker_exit(server, worker):
+    """Commit the feedback this worker has queued before it goes away."""
+    import feedback_queue
+    feedback_queue.shutdown()
@@ -0,0 +1,76 @@
+"""HTTP conditional requests (ETag / Last-Modified / 304) for read endpoints.
+
+``@conditional('products')`` on a GET view derives a strong ETag from the
+``change_counters`` generation of the tables the response depends on plus
+the request path and query string. When the client's If-None-Match (or
+If-Modified-Since) still matches, a 304 is returned before the view runs,
+so nothing is queried or serialized. The tags compression.py gives
+compressed bodies (``<tag>-gzip`` ...) match as well, and the 304 repeats
+the one the client sent. Last-Modified (whole seconds) is only sent and
+compared once the second of the last change is over.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, request
+
+import compression
+import models
+
+
+def make_etag(versions):
+    """Strong ETag for the current request given ``{table: (generation, changed_at)}``."""
+    state = ','.join(f'{table}:{versions[table][0]}' for table in sorted(versions))
+    digest = hashlib.sha1(f'{request.full_path}|{state}'.encode()).hexdigest()[:20]
+    return digest
+
+
+def _set_cache_headers(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config.get('API_CACHE_MAX_AGE', 5)
+    return response
+
+
+def conditional(*tables):
+    """Decorator for GET views whose output depends only on ``tables`` and the URL."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = models.get_change_counters(tables)
+            if 'products' in versions:
+                # The catalog cache must not serve rows older than the tag we hand out
+                models.sync_catalog_cache(versions['products'][0])
+            etag = make_etag(versions)
+            changed_at = max((v[1] for v in versions.values()), default=0)
+            # A later write in the same second would keep the same date: until
+            # that second is over only the ETag can tell the versions apart
+            if changed_at and changed_at < int(time.time()):
+                last_modified = datetime.fromtimestamp(changed_at, timezone.utc)
+            else:
+                last_modified = None
+
+            # If-None-Match wins over If-Modified-Since when both are sent (RFC 9110). It compares
+            # weakly: nginx's gzip turns our tag into W/"..." and the client sends that back
+            if request.if_none_match:
+                held = [tag for tag in compression.etag_variants(etag) if request.if_none_match.contains_weak(tag)]
+                not_modified = bool(held)
+                if held:
+                    etag = held[0]
+            else:
+                not_modified = (last_modified is not None and request.if_modified_since is not None
+                                and last_modified <= request.if_modified_since)
+            if not_modified:
+                response = current_app.response_class(status=304)
+                return _set_cache_headers(response, etag, last_modified)
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                _set_cache_headers(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
@@ -1,5 +1,9 @@
+import feedback_queue
 from models import init_db
 
 if __name__ == '__main__':
     init_db()
-    print("База даних ініціалізована успішно.")
\ No newline at end of file
+    # Відгуки, що лишились у спулі після аварійної зупинки (feedback_queue.py)
+    if feedback_queue.queue_enabled():
+        feedback_queue.get_queue().recover()
+    print("База даних ініціалізована успішно.")
@@ -0,0 +1,199 @@
+"""Request timing and SQL instrumentation, exposed in Prometheus text format.
+
+``init_app`` installs before/after-request hooks that time every request and
+record it in a latency histogram labelled by blueprint, endpoint, method and
+status. While a request runs, the connections from db.py add to a per-thread
+``RequestStats``: a trace callback counts the statements SQLite executes, and
+the connection's execute/fetch calls are timed (rows consumed by iterating a
+cursor directly are not timed). Each response carries a ``Server-Timing``
+header (``app``, ``db``) and ``GET /metrics`` renders everything.
+
+Metrics live in the worker process: under gunicorn each worker reports its
+own, labelled with ``pid``. METRICS=0 switches all of it off.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, request
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+_local = threading.local()
+
+
+def metrics_enabled():
+    return os.environ.get('METRICS', '1').lower() not in ('0', 'false', 'no', 'off')
+
+
+class RequestStats:
+    __slots__ = ('queries', 'query_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+
+
+def current_stats():
+    """Stats of the request running on this thread, or None outside a request."""
+    return getattr(_local, 'stats', None)
+
+
+def trace_statement(sql):
+    """sqlite3 trace callback: count statements (trigger bodies are reported as '-- TRIGGER ...' and skipped)."""
+    stats = getattr(_local, 'stats', None)
+    if stats is not None and not sql.startswith('--'):
+        stats.queries += 1
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+_pid = os.getpid()
+
+
+def _reset_pid():
+    global _pid
+    _pid = os.getpid()
+
+
+def process_id():
+    return _pid
+
+
+# A forked child reports under its own pid (no fork hooks on Windows)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pid)
+
+
+class EndpointMetrics:
+    """Per-endpoint request and SQL figures, one dict entry per label set.
+
+    Everything a request records lives in one list, so a request costs a
+    single lock and dict lookup; the Prometheus families are derived from it
+    in ``render``.
+    """
+
+    LABELS = ('pid', 'blueprint', 'endpoint', 'method', 'status')
+
+    def __init__(self, latency_buckets=LATENCY_BUCKETS, query_buckets=QUERY_COUNT_BUCKETS):
+        self.latency_buckets = latency_buckets
+        self.query_buckets = query_buckets
+        self._q = len(latency_buckets) + 3  # buckets, overflow, sum, count; then the query-count part
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, seconds, queries, query_time):
+        """Record one request; ``labels`` is (blueprint, endpoint, method, status)."""
+        latency_slot = bisect_left(self.latency_buckets, seconds)
+        query_slot = self._q + bisect_left(self.query_buckets, queries)
+        q = self._q
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (q + len(self.query_buckets) + 3)
+            # buckets are stored non-cumulative; an overflow lands in the slot after the last bucket
+            series[latency_slot] += 1
+            series[q - 2] += seconds
+            series[q - 1] += 1
+            series[query_slot] += 1
+            series[-2] += queries
+            series[-1] += query_time
+
+    def _histogram(self, name, help_text, series, buckets, offset, total):
+        lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for labels, values in series:
+            cumulative = 0
+            for i, bound in enumerate(buckets):
+                cumulative += values[offset + i]
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {values[self._q - 1]}')
+            lines.append(f'{name}_sum{{{labels}}} {values[total]}')
+            lines.append(f'{name}_count{{{labels}}} {values[self._q - 1]}')
+        return lines
+
+    def render(self):
+        with self._lock:
+            snapshot = sorted((key, list(values)) for key, values in self._series.items())
+        series = [(','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.LABELS, (_pid,) + key)), values)
+                  for key, values in snapshot]
+        lines = self._histogram('http_request_duration_seconds', 'Time spent handling a request (excluding streamed bodies).',
+                                series, self.latency_buckets, 0, self._q - 2)
+        lines += self._histogram('http_request_db_queries', 'SQL statements executed per request.',
+                                 series, self.query_buckets, self._q, -2)
+        lines += ['# HELP db_queries_total SQL statements executed.', '# TYPE db_queries_total counter']
+        lines += [f'db_queries_total{{{labels}}} {values[-2]}' for labels, values in series]
+        lines += ['# HELP db_query_seconds_total Time spent in SQLite calls.', '# TYPE db_query_seconds_total counter']
+        lines += [f'db_query_seconds_total{{{labels}}} {values[-1]}' for labels, values in series]
+        return '\n'.join(lines) + '\n'
+
+
+def histogram_lines(name, help_text, labels, buckets, counts, total):
+    """Exposition lines for one histogram series; ``counts`` is per bucket plus overflow, not cumulative."""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    cumulative = 0
+    for bound, count in zip(buckets, counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {sum(counts)}')
+    lines.append(f'{name}_sum{{{labels}}} {total}')
+    lines.append(f'{name}_count{{{labels}}} {sum(counts)}')
+    return lines
+
+
+ENDPOINTS = EndpointMetrics()
+_collectors = []
+
+
+def register_collector(collect):
+    """Add ``collect()`` (returns exposition lines) to /metrics, e.g. feedback_queue's figures."""
+    if collect not in _collectors:
+        _collectors.append(collect)
+
+
+def render():
+    text = ENDPOINTS.render()
+    for collect in _collectors:
+        lines = collect()
+        if lines:
+            text += '\n'.join(lines) + '\n'
+    return text
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    _local.stats = RequestStats()
+
+
+def _finish_request(response):
+    started = g.pop('metrics_started', None)
+    stats = getattr(_local, 'stats', None)
+    if started is None or stats is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint
+    ENDPOINTS.observe((endpoint.rpartition('.')[0] if endpoint else '', endpoint or 'none', request.method, response.status_code),
+                      elapsed, stats.queries, stats.query_time)
+    response.headers['Server-Timing'] = (f'app;dur={elapsed * 1000:.2f}, '
+                                         f'db;dur={stats.query_time * 1000:.2f};desc="{stats.queries} queries"')
+    return response
+
+
+def _clear_request(exc=None):
+    _local.stats = None
+
+
+def metrics_view():
+    return Response(render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    if not metrics_enabled():
+        return
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_clear_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,336 @@
+"""Versioned schema migrations.
+
+Each migration is a ``(version, description, apply)`` entry in MIGRATIONS,
+applied in order inside one ``BEGIN IMMEDIATE`` transaction. The highest
+applied version is recorded in the ``schema_version`` table, so on an
+up-to-date database ``migrate()`` costs a single SELECT.
+
+To change the schema, append a new entry - never edit one that has shipped.
+"""
+import sqlite3
+from datetime import datetime
+
+import db
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def _add_column(conn, table, column, definition):
+    if column not in _columns(conn, table):
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+def _baseline(conn):
+    """Tables and columns the app had before migrations existed.
+
+    Databases created by older versions already have some or all of this,
+    so every step checks first instead of swallowing errors.
+    """
+    conn.execute('CREATE TABLE IF NOT EXISTS feedback (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, email TEXT, message TEXT)')
+    _add_column(conn, 'feedback', 'feedback_type', "TEXT DEFAULT 'general'")
+    conn.execute('CREATE TABLE IF NOT EXISTS products (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, price REAL, image TEXT)')
+    _add_column(conn, 'products', 'description', "TEXT DEFAULT ''")
+    conn.execute('CREATE TABLE IF NOT EXISTS orders (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT, address TEXT, total_price REAL, status TEXT, date TEXT)')
+    _add_column(conn, 'orders', 'phone', "TEXT DEFAULT ''")
+    conn.execute('CREATE TABLE IF NOT EXISTS order_items (id INTEGER PRIMARY KEY AUTOINCREMENT, order_id INTEGER, product_id INTEGER, quantity INTEGER, FOREIGN KEY (order_id) REFERENCES orders (id), FOREIGN KEY (product_id) REFERENCES products (id))')
+    conn.execute('CREATE TABLE IF NOT EXISTS clients (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, email TEXT, phone TEXT, address TEXT)')
+    _add_column(conn, 'clients', 'has_courses', 'INTEGER DEFAULT 0')
+
+
+def _access_path_indexes(conn):
+    # get_orders_by_email: equality on email, newest first without a sort step
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_orders_email_date ON orders (email, date)')
+    # get_order_details / delete_order: covers the join columns, no table lookup
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items (order_id, product_id, quantity)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_order_items_product ON order_items (product_id)')
+    # get_feedback_by_type: rowid is implicitly part of the key, so ORDER BY id is free
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_feedback_type ON feedback (feedback_type)')
+    # get_products(min_price/max_price)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_price ON products (price)')
+    conn.execute('ANALYZE')
+
+
+def fts5_trigram_available(conn):
+    """True when SQLite was built with FTS5 and the trigram tokenizer (3.34+)."""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x, tokenize='trigram')")
+        conn.execute('DROP TABLE temp.fts5_probe')
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def _product_search_index(conn):
+    """External-content FTS5 index over products.name/description.
+
+    The trigram tokenizer matches any substring of 3+ characters, so it keeps
+    the semantics of the old ``LIKE '%q%'`` search (prefixes included) while
+    answering from the index. Without FTS5 nothing is created and
+    get_products keeps using LIKE.
+    """
+    if not fts5_trigram_available(conn):
+        return
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+                 "name, description, content='products', content_rowid='id', tokenize='trigram')")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+    END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO products_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""")
+    conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+
+def _change_counters(conn):
+    """Per-table generation numbers, bumped by triggers on every row change.
+
+    Caches in any worker process compare their generation with this table to
+    find out whether their copy is stale.
+    """
+    conn.execute('CREATE TABLE IF NOT EXISTS change_counters (table_name TEXT PRIMARY KEY, generation INTEGER NOT NULL DEFAULT 0)')
+    conn.execute("INSERT OR IGNORE INTO change_counters (table_name, generation) VALUES ('products', 0)")
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS products_generation_{event.lower()} AFTER {event} ON products BEGIN
+            UPDATE change_counters SET generation = generation + 1 WHERE table_name = 'products';
+        END""")
+
+
+def _change_timestamps(conn):
+    """Record when each tracked table last changed (HTTP Last-Modified) and track feedback too."""
+    _add_column(conn, 'change_counters', 'changed_at', 'INTEGER NOT NULL DEFAULT 0')
+    for table in ('products', 'feedback'):
+        track_table_changes(conn, table)
+    conn.execute("UPDATE change_counters SET changed_at = CAST(strftime('%s', 'now') AS INTEGER) WHERE changed_at = 0")
+
+
+def track_table_changes(conn, table):
+    """(Re)create the triggers that bump ``table``'s generation and changed_at on every row change."""
+    conn.execute('INSERT OR IGNORE INTO change_counters (table_name, generation) VALUES (?, 0)', (table,))
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {table}_generation_{event.lower()}')
+        conn.execute(f"""CREATE TRIGGER {table}_generation_{event.lower()} AFTER {event} ON {table} BEGIN
+            UPDATE change_counters SET generation = generation + 1, changed_at = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE table_name = '{table}';
+        END""")
+
+
+def _carts(conn):
+    """Server-side carts (cart_store.SQLiteCartStore): a running total per cart, product id + quantity per line."""
+    conn.execute('CREATE TABLE IF NOT EXISTS carts (id TEXT PRIMARY KEY, total REAL NOT NULL DEFAULT 0, updated_at INTEGER NOT NULL)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_carts_updated_at ON carts(updated_at)')
+    conn.execute("""CREATE TABLE IF NOT EXISTS cart_items (
+        cart_id TEXT NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        PRIMARY KEY (cart_id, product_id)
+    ) WITHOUT ROWID""")
+
+
+def _order_idempotency_keys(conn):
+    """Idempotency keys of ingested orders (models.add_orders_bulk), so retried batches are not duplicated."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS order_idempotency_keys (
+        key TEXT PRIMARY KEY,
+        order_id INTEGER NOT NULL,
+        created_at TEXT
+    ) WITHOUT ROWID""")
+
+
+def _product_sales_index(conn):
+    """Covering index for the dashboard's per-product sales (no table reads, no temp b-tree).
+
+    Per-status and per-day figures come from the summary tables (version 9),
+    so orders gets no aggregate indexes for every write to maintain.
+    """
+    # Supersedes idx_order_items_product (same leading column) and covers SUM(quantity)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_order_items_product_quantity ON order_items (product_id, quantity)')
+    conn.execute('DROP INDEX IF EXISTS idx_order_items_product')
+    conn.execute('ANALYZE')
+
+
+def _sales_summaries(conn):
+    """Summary tables kept up to date by models.add_order / update_order_status / delete_order."""
+    conn.execute('CREATE TABLE IF NOT EXISTS daily_sales (day TEXT PRIMARY KEY, orders INTEGER NOT NULL, revenue REAL NOT NULL) WITHOUT ROWID')
+    conn.execute('CREATE TABLE IF NOT EXISTS status_counts (status TEXT PRIMARY KEY, orders INTEGER NOT NULL, revenue REAL NOT NULL) WITHOUT ROWID')
+    conn.execute('CREATE TABLE IF NOT EXISTS product_sales (product_id INTEGER PRIMARY KEY, units INTEGER NOT NULL, orders INTEGER NOT NULL)')
+    # Top sellers without sorting the table
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_product_sales_units ON product_sales (units)')
+    rebuild_sales_summaries(conn)
+
+
+def rebuild_sales_summaries(conn):
+    """Recompute the sales summary tables from orders / order_items (repairs any drift)."""
+    for table in ('daily_sales', 'status_counts', 'product_sales'):
+        conn.execute(f'DELETE FROM {table}')
+    conn.execute("""INSERT INTO daily_sales (day, orders, revenue)
+        SELECT substr(COALESCE(date, ''), 1, 10), COUNT(*), ROUND(COALESCE(SUM(total_price), 0), 2) FROM orders
+        GROUP BY substr(COALESCE(date, ''), 1, 10)""")
+    conn.execute("""INSERT INTO status_counts (status, orders, revenue)
+        SELECT COALESCE(status, ''), COUNT(*), ROUND(COALESCE(SUM(total_price), 0), 2) FROM orders GROUP BY COALESCE(status, '')""")
+    conn.execute("""INSERT INTO product_sales (product_id, units, orders)
+        SELECT product_id, SUM(quantity), COUNT(DISTINCT order_id) FROM order_items GROUP BY product_id""")
+
+
+def _feedback_submission_ids(conn):
+    """Provisional ids of queued feedback (feedback_queue.py), so a replayed spool segment inserts nothing twice."""
+    _add_column(conn, 'feedback', 'submission_id', 'TEXT')
+    # NULL for rows written synchronously; UNIQUE ignores NULLs
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_feedback_submission ON feedback (submission_id)')
+
+
+def _order_email_search(conn):
+    """Lookup structures for models.get_orders_matching_email.
+
+    ``order_emails`` holds every distinct normalized (trimmed, lower-case)
+    order email with its order count; its NOCASE unique index answers exact
+    and prefix matches, and an FTS5 trigram index over it answers substrings
+    (skipped without FTS5, then substrings scan this table with LIKE - still
+    far smaller than orders). Kept up to date by triggers; the per-address
+    index on orders needs ``ts`` and comes with it (version 12).
+    """
+    conn.execute("""CREATE TABLE IF NOT EXISTS order_emails (
+        id INTEGER PRIMARY KEY,
+        email TEXT NOT NULL UNIQUE COLLATE NOCASE,
+        orders INTEGER NOT NULL
+    )""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS order_emails_ai AFTER INSERT ON orders WHEN new.email IS NOT NULL BEGIN
+        INSERT INTO order_emails (email, orders) VALUES (lower(trim(new.email)), 1)
+        ON CONFLICT (email) DO UPDATE SET orders = orders + 1;
+    END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS order_emails_ad AFTER DELETE ON orders WHEN old.email IS NOT NULL BEGIN
+        UPDATE order_emails SET orders = orders - 1 WHERE email = lower(trim(old.email));
+        DELETE FROM order_emails WHERE email = lower(trim(old.email)) AND orders <= 0;
+    END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS order_emails_au AFTER UPDATE OF email ON orders
+        WHEN old.email IS NOT new.email BEGIN
+        UPDATE order_emails SET orders = orders - 1 WHERE email = lower(trim(old.email));
+        DELETE FROM order_emails WHERE email = lower(trim(old.email)) AND orders <= 0;
+        INSERT INTO order_emails (email, orders) SELECT lower(trim(new.email)), 1 WHERE new.email IS NOT NULL
+        ON CONFLICT (email) DO UPDATE SET orders = orders + 1;
+    END""")
+    if fts5_trigram_available(conn):
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS order_emails_fts USING fts5("
+                     "email, content='order_emails', content_rowid='id', tokenize='trigram')")
+        conn.execute("""CREATE TRIGGER IF NOT EXISTS order_emails_fts_ai AFTER INSERT ON order_emails BEGIN
+            INSERT INTO order_emails_fts (rowid, email) VALUES (new.id, new.email);
+        END""")
+        conn.execute("""CREATE TRIGGER IF NOT EXISTS order_emails_fts_ad AFTER DELETE ON order_emails BEGIN
+            INSERT INTO order_emails_fts (order_emails_fts, rowid, email) VALUES ('delete', old.id, old.email);
+        END""")
+    rebuild_order_emails(conn)
+    conn.execute('ANALYZE')
+
+
+def rebuild_order_emails(conn):
+    """Recompute order_emails (and its search index) from orders."""
+    conn.execute('DELETE FROM order_emails')
+    conn.execute("""INSERT INTO order_emails (email, orders)
+        SELECT lower(trim(email)), COUNT(*) FROM orders WHERE email IS NOT NULL GROUP BY lower(trim(email))""")
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'order_emails_fts'").fetchone():
+        conn.execute("INSERT INTO order_emails_fts (order_emails_fts) VALUES ('rebuild')")
+
+
+def _order_timestamps(conn):
+    """Integer epoch ``orders.ts`` next to the ``date`` string, for range queries.
+
+    ``date`` is server local time, so the backfill converts it with 'utc'.
+    models.py writes both columns; the triggers fill ts for writers that only
+    set ``date``. One (normalized email, ts) index replaces (email, date): it
+    returns one address's orders in (ts, id) order for the email search, and
+    per-customer lists check the exact address on the rows it finds.
+    """
+    _add_column(conn, 'orders', 'ts', 'INTEGER')
+    conn.execute("UPDATE orders SET ts = CAST(strftime('%s', date, 'utc') AS INTEGER) WHERE ts IS NULL AND date IS NOT NULL")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS orders_ts_ai AFTER INSERT ON orders
+        WHEN new.ts IS NULL AND new.date IS NOT NULL BEGIN
+        UPDATE orders SET ts = CAST(strftime('%s', new.date, 'utc') AS INTEGER) WHERE id = new.id;
+    END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS orders_ts_au AFTER UPDATE OF date ON orders
+        WHEN new.date IS NOT old.date BEGIN
+        UPDATE orders SET ts = CAST(strftime('%s', new.date, 'utc') AS INTEGER) WHERE id = new.id;
+    END""")
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_orders_email_norm_ts ON orders (lower(trim(email)), ts)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_orders_ts ON orders (ts)')
+    conn.execute('DROP INDEX IF EXISTS idx_orders_email_date')
+    conn.execute('ANALYZE')
+
+
+def _order_archive(conn):
+    """Where archived orders went (archive.py), how many per quarter, and the index the archiver selects them by.
+
+    status_counts keeps counting archived orders; archive_periods lets readers
+    tell how many of them are still in the hot table without counting rows.
+    """
+    conn.execute('CREATE TABLE IF NOT EXISTS archived_orders (order_id INTEGER PRIMARY KEY, period TEXT NOT NULL)')
+    conn.execute('CREATE TABLE IF NOT EXISTS archive_periods (period TEXT PRIMARY KEY, orders INTEGER NOT NULL) WITHOUT ROWID')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_orders_status_ts ON orders (status, ts)')
+    conn.execute('ANALYZE')
+
+
+def _cart_line_prices(conn):
+    """The unit price each cart line was counted into the running total at.
+
+    Existing lines take the current catalog price (0 for deleted products)
+    and every cart's total is recomputed from its lines.
+    """
+    _add_column(conn, 'cart_items', 'unit_price', 'REAL NOT NULL DEFAULT 0')
+    conn.execute('UPDATE cart_items SET unit_price = COALESCE((SELECT price FROM products WHERE id = product_id), 0)')
+    conn.execute('UPDATE carts SET total = ROUND(COALESCE((SELECT SUM(quantity * unit_price) FROM cart_items '
+                 'WHERE cart_id = carts.id), 0), 2)')
+
+
+MIGRATIONS = [
+    (1, 'baseline schema', _baseline),
+    (2, 'indexes for order, feedback and price lookups', _access_path_indexes),
+    (3, 'FTS5 product search index', _product_search_index),
+    (4, 'change counters for cache invalidation', _change_counters),
+    (5, 'change timestamps, feedback change counter', _change_timestamps),
+    (6, 'server-side carts', _carts),
+    (7, 'order idempotency keys', _order_idempotency_keys),
+    (8, 'covering index for product sales', _product_sales_index),
+    (9, 'sales summary tables', _sales_summaries),
+    (10, 'feedback submission ids', _feedback_submission_ids),
+    (11, 'indexed order email search', _order_email_search),
+    (12, 'order timestamps', _order_timestamps),
+    (13, 'order archive', _order_archive),
+    (14, 'cart line prices', _cart_line_prices),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    try:
+        row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    except sqlite3.OperationalError:
+        # No schema_version table yet: fresh or pre-migration database
+        return 0
+    return row[0] or 0
+
+
+def migrate(conn):
+    """Bring the database up to LATEST_VERSION and return the list of applied versions.
+
+    Closes ``conn`` (returns it to the pool) when done.
+    """
+    if current_version(conn) >= LATEST_VERSION:
+        conn.close()
+        return []
+    applied = []
+    with db.write_transaction(conn):
+        conn.execute('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, description TEXT, applied_at TEXT)')
+        # Re-check under the write lock: another process may have migrated meanwhile
+        version = current_version(conn)
+        for number, description, apply in MIGRATIONS:
+            if number <= version:
+                continue
+            apply(conn)
+            conn.execute('INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)',
+                         (number, description, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            applied.append(number)
+    return applied
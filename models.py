@@ -1,164 +1,613 @@
+import collections
+import heapq
+import itertools
+import logging
 import os
 import sqlite3
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
+
+import archive
+import catalog_cache
+import db
+import migrations
+
+logger = logging.getLogger(__name__)
+
 
 def get_db_connection():
-    # Allow overriding DB file path via environment variable (useful for containers)
-    db_path = os.environ.get('DB_PATH', 'db.sqlite')
-    conn = sqlite3.connect(db_path, timeout=30.0, isolation_level='DEFERRED')
-    conn.row_factory = sqlite3.Row
-    return conn
+    # Per-thread pooled connection (see db.py); DB_PATH still selects the file.
+    # close() on it returns the connection to the pool instead of closing it.
+    return db.get_connection()
+
+
+def write_transaction():
+    """Single write path: BEGIN IMMEDIATE transaction on a pooled connection.
+
+    Usage: ``with write_transaction() as conn: conn.execute(...)`` - commits
+    on success, rolls back on error.
+    """
+    return db.write_transaction(get_db_connection())
 
 def init_db():
-    conn = get_db_connection()
-    conn.execute('CREATE TABLE IF NOT EXISTS feedback (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, email TEXT, message TEXT)')
-    # Add feedback_type column (developer or general) if it doesn't exist
-    try:
-        conn.execute('ALTER TABLE feedback ADD COLUMN feedback_type TEXT DEFAULT "general"')
-    except Exception:
-        pass
-    conn.execute('CREATE TABLE IF NOT EXISTS products (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, price REAL, image TEXT)')
-    # Add description column to products if it doesn't exist
-    try:
-        conn.execute("ALTER TABLE products ADD COLUMN description TEXT DEFAULT ''")
-    except Exception:
-        pass
-    conn.execute('CREATE TABLE IF NOT EXISTS orders (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT, address TEXT, total_price REAL, status TEXT, date TEXT)')
-    # Ensure orders table has phone column for contact updates
-    try:
-        conn.execute('ALTER TABLE orders ADD COLUMN phone TEXT DEFAULT ""')
-    except Exception:
-        pass
-    conn.execute('CREATE TABLE IF NOT EXISTS order_items (id INTEGER PRIMARY KEY AUTOINCREMENT, order_id INTEGER, product_id INTEGER, quantity INTEGER, FOREIGN KEY (order_id) REFERENCES orders (id), FOREIGN KEY (product_id) REFERENCES products (id))')
-    # Додаткова таблиця для клієнтів
-    conn.execute('CREATE TABLE IF NOT EXISTS clients (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, email TEXT, phone TEXT, address TEXT)')
-    # Спробуємо додати колонку has_courses якщо її ще немає (старі БД)
+    """Apply pending schema migrations (see migrations.py); no-op when up to date."""
+    return migrations.migrate(get_db_connection())
+
+def _catalog():
+    return catalog_cache.for_db(db.get_db_path())
+
+
+def _price_bound(value):
+    """Numeric price filter, or None when missing or not a number (filter ignored)."""
+    if value is None:
+        return None
     try:
-        conn.execute('ALTER TABLE clients ADD COLUMN has_courses INTEGER DEFAULT 0')
-    except Exception:
-        # Якщо колонка вже існує або SQLite не дозволяє — ігноруємо помилку
-        pass
-    conn.commit()
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+_table_columns = {}
+
+
+def table_columns(table):
+    """Column names of ``table`` in schema order (cached per database file; the schema only changes at startup)."""
+    key = (db.get_db_path(), table)
+    columns = _table_columns.get(key)
+    if columns is None:
+        conn = get_db_connection()
+        columns = tuple(row[1] for row in conn.execute(f'PRAGMA table_info({table})'))
+        conn.close()
+        _table_columns[key] = columns
+    return columns
+
+
+def _select_list(table, fields, alias=''):
+    """SELECT list for a sparse fieldset: ``*`` without ``fields``; raises ValueError on unknown columns."""
+    if not fields:
+        return f'{alias}*'
+    unknown = set(fields) - set(table_columns(table))
+    if unknown:
+        raise ValueError(f'Unknown field: {sorted(unknown)[0]}')
+    return ', '.join(alias + field for field in fields)
+
+
+def get_change_counters(tables):
+    """``{table: (generation, changed_at)}`` from change_counters for the given tables."""
+    conn = get_db_connection()
+    placeholders = ', '.join('?' for _ in tables)
+    rows = conn.execute(f'SELECT table_name, generation, changed_at FROM change_counters WHERE table_name IN ({placeholders})',
+                        tuple(tables)).fetchall()
     conn.close()
+    return {row['table_name']: (row['generation'], row['changed_at']) for row in rows}
+
+
+def sync_catalog_cache(generation):
+    """Make sure cached catalog reads are at least as new as ``generation``."""
+    if catalog_cache.cache_enabled():
+        _catalog().ensure_generation(get_db_connection, generation)
+
+
+# bm25 column weights for products_fts: a hit in the name outranks the description
+SEARCH_RANK = 'bm25(products_fts, 10.0, 1.0)'
+
+
+def _has_search_index(conn, table='products_fts'):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+
+def _search_match(q):
+    """FTS5 MATCH expression for a search term, or None when the index can't answer it.
+
+    The whole term is one quoted phrase, which the trigram tokenizer matches as a
+    substring - same results as LIKE '%q%'. Terms shorter than a trigram need LIKE.
+    """
+    if len(q) < 3:
+        return None
+    return '"' + q.replace('"', '""') + '"'
+
 
-def get_products(q=None, min_price=None, max_price=None, has_image=None):
+def get_products(q=None, min_price=None, max_price=None, has_image=None, after_id=None, offset=0, limit=None, fields=None):
     """Return products optionally filtered by search term (q), price range and whether they have an image.
-    - q: substring to search in product name
+    - q: substring to search in product name or description; uses the FTS5 index
+      (ranked by bm25) when available, LIKE otherwise
     - min_price, max_price: numeric bounds
     - has_image: True to require non-empty image, None/False to ignore
+    - after_id / limit: keyset page of the id-ordered list; search results are
+      relevance-ordered, so page those with offset / limit instead
+    - fields: columns to select (all by default); the catalog cache always
+      returns whole rows
+    Without a search term the result comes from the in-memory catalog cache.
     """
+    min_price = _price_bound(min_price)
+    max_price = _price_bound(max_price)
+    if not q and catalog_cache.cache_enabled():
+        products = _catalog().query(get_db_connection, min_price=min_price, max_price=max_price, has_image=has_image,
+                                    after_id=after_id, limit=None if limit is None else offset + limit)
+        return products[offset:] if offset else products
+
     conn = get_db_connection()
-    query = 'SELECT * FROM products'
+    query = f"SELECT {_select_list('products', fields, 'p.')} FROM products p"
     clauses = []
     params = []
+    order = 'p.id'
     if q:
-        clauses.append('name LIKE ?')
-        params.append(f'%{q}%')
+        match = _search_match(q) if _has_search_index(conn) else None
+        if match:
+            query += ' JOIN products_fts ON products_fts.rowid = p.id'
+            clauses.append('products_fts MATCH ?')
+            params.append(match)
+            order = f'{SEARCH_RANK}, p.id'
+        else:
+            clauses.append('(p.name LIKE ? OR p.description LIKE ?)')
+            params.extend([f'%{q}%', f'%{q}%'])
     if min_price is not None:
-        try:
-            min_price_float = float(min_price)
-            clauses.append('price >= ?')
-            params.append(min_price_float)
-        except (ValueError, TypeError):
-            pass
+        clauses.append('p.price >= ?')
+        params.append(min_price)
     if max_price is not None:
-        try:
-            max_price_float = float(max_price)
-            clauses.append('price <= ?')
-            params.append(max_price_float)
-        except (ValueError, TypeError):
-            pass
+        clauses.append('p.price <= ?')
+        params.append(max_price)
     if has_image is True:
-        clauses.append("(image IS NOT NULL AND image != '')")
+        clauses.append("(p.image IS NOT NULL AND p.image != '')")
+    if after_id is not None:
+        clauses.append('p.id > ?')
+        params.append(after_id)
 
     if clauses:
         query += ' WHERE ' + ' AND '.join(clauses)
-    query += ' ORDER BY id'
+    query += ' ORDER BY ' + order
+    if limit is not None:
+        query += ' LIMIT ? OFFSET ?'
+        params.extend([limit, offset])
     products = conn.execute(query, tuple(params)).fetchall()
     conn.close()
     return products
 
 
 def get_product(product_id):
+    if catalog_cache.cache_enabled():
+        return _catalog().get(get_db_connection, product_id)
     conn = get_db_connection()
     product = conn.execute('SELECT * FROM products WHERE id = ?', (product_id,)).fetchone()
     conn.close()
     return product
 
 
+def _product_change(conn, product_id):
+    """Read back a product write inside its transaction, for the catalog cache write-through."""
+    row = conn.execute('SELECT * FROM products WHERE id = ?', (product_id,)).fetchone()
+    return catalog_cache.read_generation(conn), product_id, dict(row) if row else None
+
+
 def add_product(name, price, image='', description=''):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute('INSERT INTO products (name, price, image, description) VALUES (?, ?, ?, ?)',
-                (name, price, image, description))
-    conn.commit()
-    conn.close()
+    with write_transaction() as conn:
+        cur = conn.execute('INSERT INTO products (name, price, image, description) VALUES (?, ?, ?, ?)',
+                           (name, price, image, description))
+        change = _product_change(conn, cur.lastrowid)
+    _catalog().apply(*change)
 
 
 def update_product(product_id, name, price, image='', description=''):
-    conn = get_db_connection()
-    conn.execute('UPDATE products SET name = ?, price = ?, image = ?, description = ? WHERE id = ?',
-                 (name, price, image, description, product_id))
-    conn.commit()
-    conn.close()
+    with write_transaction() as conn:
+        conn.execute('UPDATE products SET name = ?, price = ?, image = ?, description = ? WHERE id = ?',
+                     (name, price, image, description, product_id))
+        change = _product_change(conn, product_id)
+    _catalog().apply(*change)
 
 
 def delete_product(product_id):
-    conn = get_db_connection()
-    conn.execute('DELETE FROM products WHERE id = ?', (product_id,))
-    conn.commit()
-    conn.close()
+    with write_transaction() as conn:
+        conn.execute('DELETE FROM products WHERE id = ?', (product_id,))
+        change = _product_change(conn, product_id)
+    _catalog().apply(*change)
+
+DAILY_SALES_UPSERT = ('INSERT INTO daily_sales (day, orders, revenue) VALUES (?, ?, ROUND(?, 2)) ON CONFLICT (day) DO UPDATE '
+                      'SET orders = orders + excluded.orders, revenue = ROUND(revenue + excluded.revenue, 2)')
+STATUS_COUNTS_UPSERT = ('INSERT INTO status_counts (status, orders, revenue) VALUES (?, ?, ROUND(?, 2)) ON CONFLICT (status) DO UPDATE '
+                        'SET orders = orders + excluded.orders, revenue = ROUND(revenue + excluded.revenue, 2)')
+PRODUCT_SALES_UPSERT = ('INSERT INTO product_sales (product_id, units, orders) VALUES (?, ?, ?) ON CONFLICT (product_id) DO UPDATE '
+                        'SET units = units + excluded.units, orders = orders + excluded.orders')
+
+
+def _apply_sales(conn, orders, sign=1):
+    """Add (sign=1) or subtract (sign=-1) orders in the sales summary tables.
+
+    Runs in the caller's write transaction, so the summaries change together
+    with the orders. ``orders`` holds ``(date, status, total_price, items)``
+    with items as ``(product_id, quantity)`` pairs. migrations.rebuild_sales_summaries
+    recomputes the same figures from scratch.
+    """
+    daily, statuses, products = {}, {}, {}
+    for date, status, total_price, items in orders:
+        total_price = total_price or 0
+        for table, key in ((daily, (date or '')[:10]), (statuses, status or '')):
+            count, revenue = table.get(key, (0, 0.0))
+            table[key] = (count + sign, revenue + sign * total_price)
+        units_by_product = {}
+        for product_id, quantity in items:
+            units_by_product[product_id] = units_by_product.get(product_id, 0) + quantity
+        for product_id, units in units_by_product.items():
+            total_units, count = products.get(product_id, (0, 0))
+            products[product_id] = (total_units + sign * units, count + sign)
+    conn.executemany(DAILY_SALES_UPSERT, [(day, count, revenue) for day, (count, revenue) in daily.items()])
+    conn.executemany(STATUS_COUNTS_UPSERT, [(status, count, revenue) for status, (count, revenue) in statuses.items()])
+    conn.executemany(PRODUCT_SALES_UPSERT, [(product_id, units, count) for product_id, (units, count) in products.items()])
+
+
+def _order_time():
+    """(date, ts) for an order placed now: the local-time string and its epoch seconds."""
+    now = datetime.now().replace(microsecond=0)
+    return now.strftime("%Y-%m-%d %H:%M:%S"), int(now.timestamp())
+
 
 def add_order(email, address, cart, phone=''):
     try:
-        conn = get_db_connection()
         total_price = sum(item['price'] * item['quantity'] for item in cart.values())
-        cur = conn.cursor()
-        cur.execute('INSERT INTO orders (email, address, total_price, status, date, phone) VALUES (?, ?, ?, ?, ?, ?)',
-                    (email, address, total_price, 'Нове', datetime.now().strftime("%Y-%m-%d %H:%M:%S"), phone))
-        order_id = cur.lastrowid
-        for item in cart.values():
-            cur.execute('INSERT INTO order_items (order_id, product_id, quantity) VALUES (?, ?, ?)',
-                        (order_id, item['id'], item['quantity']))
-        conn.commit()
-        conn.close()
+        with write_transaction() as conn:
+            cur = conn.cursor()
+            date, ts = _order_time()
+            cur.execute('INSERT INTO orders (email, address, total_price, status, date, phone, ts) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        (email, address, total_price, 'Нове', date, phone, ts))
+            order_id = cur.lastrowid
+            items = [(item['id'], item['quantity']) for item in cart.values()]
+            cur.executemany('INSERT INTO order_items (order_id, product_id, quantity) VALUES (?, ?, ?)',
+                            [(order_id, product_id, quantity) for product_id, quantity in items])
+            _apply_sales(conn, [(date, 'Нове', total_price, items)])
         return order_id
-    except sqlite3.OperationalError as e:
-        print(f'Database error in add_order: {e}')
+    except sqlite3.OperationalError:
+        logger.exception('Database error in add_order')
         raise
 
-def get_orders():
+
+def validate_order(order):
+    """Problems with one order payload ({email, address, phone?, cart?}); empty list if it is valid."""
+    if not isinstance(order, dict):
+        return ['order must be an object']
+    errors = []
+    for field in ('email', 'address'):
+        if not isinstance(order.get(field), str) or not order[field].strip():
+            errors.append(f'{field} is required')
+    if not isinstance(order.get('phone', ''), str):
+        errors.append('phone must be a string')
+    key = order.get('idempotency_key')
+    if key is not None and (not isinstance(key, str) or not key or len(key) > 255):
+        errors.append('idempotency_key must be a non-empty string of at most 255 characters')
+    cart = order.get('cart', {})
+    if not isinstance(cart, dict):
+        return errors + ['cart must be an object']
+    for name, item in cart.items():
+        if not isinstance(item, dict):
+            errors.append(f'cart[{name}] must be an object')
+            continue
+        if not isinstance(item.get('id'), int) or isinstance(item['id'], bool):
+            errors.append(f'cart[{name}].id must be an integer')
+        if not isinstance(item.get('price'), (int, float)) or isinstance(item['price'], bool) or item['price'] < 0:
+            errors.append(f'cart[{name}].price must be a non-negative number')
+        if not isinstance(item.get('quantity'), int) or isinstance(item['quantity'], bool) or item['quantity'] < 1:
+            errors.append(f'cart[{name}].quantity must be a positive integer')
+    return errors
+
+
+def _existing_idempotency_keys(conn, keys, chunk=500):
+    found = {}
+    keys = list(keys)
+    for start in range(0, len(keys), chunk):
+        part = keys[start:start + chunk]
+        rows = conn.execute(f'SELECT key, order_id FROM order_idempotency_keys WHERE key IN ({",".join("?" * len(part))})', part)
+        found.update((row['key'], row['order_id']) for row in rows)
+    return found
+
+
+def add_orders_bulk(orders):
+    """Insert many orders and their items in one transaction.
+
+    Returns one result per input order, in input order:
+    ``{'index', 'status': 'created' | 'duplicate' | 'invalid', 'order_id', 'errors'}``.
+    Invalid orders are reported and skipped; they do not abort the batch.
+    An order whose ``idempotency_key`` was already seen (in an earlier batch
+    or earlier in this one) is not inserted again and reports the original
+    order id, so a retried batch is safe.
+    """
+    results = []
+    valid = []
+    for index, order in enumerate(orders):
+        errors = validate_order(order)
+        results.append({'index': index, 'status': 'invalid' if errors else 'created', 'order_id': None, 'errors': errors})
+        if not errors:
+            valid.append(index)
+
+    with write_transaction() as conn:
+        seen = _existing_idempotency_keys(conn, {orders[i]['idempotency_key'] for i in valid if orders[i].get('idempotency_key')})
+        # Ids are assigned here rather than read back one by one (executemany has
+        # no lastrowid per row); the write lock makes the range ours.
+        next_id = conn.execute("SELECT MAX(COALESCE((SELECT MAX(id) FROM orders), 0), "
+                               "COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'orders'), 0))").fetchone()[0] + 1
+        date, ts = _order_time()
+        order_rows, item_rows, key_rows, sales = [], [], [], []
+        for index in valid:
+            order, result = orders[index], results[index]
+            key = order.get('idempotency_key')
+            if key and key in seen:
+                result.update(status='duplicate', order_id=seen[key])
+                continue
+            cart = order.get('cart', {})
+            total_price = sum(item['price'] * item['quantity'] for item in cart.values())
+            order_rows.append((next_id, order['email'], order['address'], total_price, 'Нове', date, order.get('phone', ''), ts))
+            items = [(item['id'], item['quantity']) for item in cart.values()]
+            item_rows.extend((next_id, product_id, quantity) for product_id, quantity in items)
+            sales.append((date, 'Нове', total_price, items))
+            if key:
+                seen[key] = next_id
+                key_rows.append((key, next_id, date))
+            result['order_id'] = next_id
+            next_id += 1
+        conn.executemany('INSERT INTO orders (id, email, address, total_price, status, date, phone, ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', order_rows)
+        conn.executemany('INSERT INTO order_items (order_id, product_id, quantity) VALUES (?, ?, ?)', item_rows)
+        conn.executemany('INSERT INTO order_idempotency_keys (key, order_id, created_at) VALUES (?, ?, ?)', key_rows)
+        _apply_sales(conn, sales)
+    return results
+
+
+def get_orders(after_id=None, limit=None, fields=None):
+    """All orders by id; after_id / limit return one keyset page, fields limits the columns."""
     conn = get_db_connection()
-    orders = conn.execute('SELECT * FROM orders').fetchall()
+    query = f"SELECT {_select_list('orders', fields)} FROM orders"
+    params = []
+    if after_id is not None:
+        query += ' WHERE id > ?'
+        params.append(after_id)
+    query += ' ORDER BY id'
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    orders = conn.execute(query, tuple(params)).fetchall()
     conn.close()
     return orders
 
 
-def get_orders_by_email(email):
+def get_orders_in_range(since=None, until=None, after=None, limit=None, fields=None):
+    """Orders with ``since <= ts < until`` (epoch seconds, either bound optional), oldest first.
+
+    ``after`` is the ``(ts, id)`` of the last order on the previous page.
+    Reads idx_orders_ts, whose entries are already in (ts, id) order.
+    """
+    if after is not None:
+        # Start the index range at the cursor, not at ``since``
+        since = after[0] if since is None else max(since, after[0])
     conn = get_db_connection()
-    orders = conn.execute('SELECT * FROM orders WHERE email = ? ORDER BY date DESC', (email,)).fetchall()
+    clauses = ['ts IS NOT NULL']
+    params = []
+    if since is not None:
+        clauses.append('ts >= ?')
+        params.append(since)
+    if until is not None:
+        clauses.append('ts < ?')
+        params.append(until)
+    if after is not None:
+        clauses.append('(ts, id) > (?, ?)')
+        params.extend(after)
+    query = f"SELECT {_select_list('orders', fields)} FROM orders WHERE " + ' AND '.join(clauses) + ' ORDER BY ts, id'
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    orders = conn.execute(query, tuple(params)).fetchall()
     conn.close()
     return orders
 
 
-def get_orders_matching_email(email):
-    """Return orders where email matches the provided value.
-    This does a case-insensitive partial match (LIKE) and trims the input.
-    Useful for searches from the frontend where users may enter partial or differently-cased emails.
+def get_orders_by_email(email, before=None, limit=None, since=None, until=None, fields=None):
+    """Orders for an email, newest first, optionally with ``since <= ts < until``.
+
+    ``before`` is the ``(ts, id)`` of the last order on the previous page;
+    id breaks ties between orders placed in the same second. The exact
+    address is checked on the rows idx_orders_email_norm_ts finds for its
+    normalized form. Hot orders only: archived ones are reached by id
+    (get_order_details).
     """
+    if before is not None:
+        until = before[0] + 1 if until is None else min(until, before[0] + 1)
     conn = get_db_connection()
-    if email is None:
+    # Unary + keeps the planner on the index rather than walking idx_orders_ts in order
+    query = f"SELECT {_select_list('orders', fields)} FROM orders WHERE lower(trim(email)) = lower(trim(?)) AND +email = ?"
+    params = [email, email]
+    if since is not None:
+        query += ' AND ts >= ?'
+        params.append(since)
+    if until is not None:
+        query += ' AND ts < ?'
+        params.append(until)
+    if before is not None:
+        query += ' AND (ts, id) < (?, ?)'
+        params.extend(before)
+    query += ' ORDER BY ts DESC, id DESC'
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    orders = conn.execute(query, tuple(params)).fetchall()
+    conn.close()
+    return orders
+
+
+def _order_items_by_order(conn, order_ids, chunk=500):
+    """Items of many orders in one IN (...) query per chunk, grouped by order id in a single pass."""
+    items = {order_id: [] for order_id in order_ids}
+    order_ids = list(items)
+    for start in range(0, len(order_ids), chunk):
+        part = order_ids[start:start + chunk]
+        rows = conn.execute('SELECT oi.order_id, oi.product_id, oi.quantity, p.name, p.price FROM order_items oi '
+                            f'JOIN products p ON oi.product_id = p.id WHERE oi.order_id IN ({",".join("?" * len(part))}) '
+                            'ORDER BY oi.order_id, oi.id', part)
+        for row in rows:
+            item = dict(row)
+            items[item.pop('order_id')].append(item)
+    return items
+
+
+def get_orders_with_items(ids=None, email=None, before=None, after_id=None, limit=None, since=None, until=None, after=None,
+                          fields=None):
+    """Orders with their line items, without a query per order.
+
+    ``ids`` selects orders by id (returned in id order); otherwise the
+    filters and paging are those of get_orders_by_email (``email``,
+    ``before``, ``since``, ``until``), get_orders_in_range (``since``,
+    ``until``, ``after``) or get_orders (``after_id``). Each order is a dict
+    with an ``items`` list shaped like get_order_details' items plus ``product_id``;
+    ``fields`` limits the order columns and must include ``id``. Like those
+    lists it reads the hot database only; archived orders are left out.
+    """
+    if ids is not None:
+        ids = list(dict.fromkeys(ids))
+        conn = get_db_connection()
+        orders = []
+        for start in range(0, len(ids), 500):
+            part = ids[start:start + 500]
+            orders.extend(conn.execute(f'SELECT {_select_list("orders", fields)} FROM orders WHERE id IN ({",".join("?" * len(part))})', part))
+        orders.sort(key=lambda order: order['id'])
         conn.close()
+    elif email is not None:
+        orders = get_orders_by_email(email, before=before, limit=limit, since=since, until=until, fields=fields)
+    elif since is not None or until is not None:
+        orders = get_orders_in_range(since, until, after=after, limit=limit, fields=fields)
+    else:
+        orders = get_orders(after_id=after_id, limit=limit, fields=fields)
+    conn = get_db_connection()
+    items = _order_items_by_order(conn, [order['id'] for order in orders])
+    conn.close()
+    return [dict(order, items=items[order['id']]) for order in orders]
+
+
+# Above this many matching addresses the result is a large share of the table:
+# one pass over orders beats merging per-address index reads
+EMAIL_MERGE_LIMIT = 200
+# One per-address query costs about as much as reading this many rows in that pass
+EMAIL_QUERY_COST = 25
+
+
+def _like_escape(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _matching_emails(conn, term, match):
+    """(email, order count) of the distinct normalized order emails matching ``term`` (up to EMAIL_MERGE_LIMIT + 1)."""
+    if match == 'prefix':
+        # NOCASE unique index: a range scan
+        sql = "SELECT email, orders FROM order_emails WHERE email LIKE ? ESCAPE '\\' LIMIT ?"
+        params = (_like_escape(term) + '%',)
+    else:
+        fts = _search_match(term) if _has_search_index(conn, 'order_emails_fts') else None
+        if fts:
+            # Only rowids from the external-content index: reading its email column looks each row up again
+            sql = ('SELECT e.email, e.orders FROM order_emails_fts JOIN order_emails e ON e.id = order_emails_fts.rowid '
+                   'WHERE order_emails_fts MATCH ? LIMIT ?')
+            params = (fts,)
+        else:
+            sql = "SELECT email, orders FROM order_emails WHERE email LIKE ? ESCAPE '\\' LIMIT ?"
+            params = ('%' + _like_escape(term) + '%',)
+    return conn.execute(sql, params + (EMAIL_MERGE_LIMIT + 1,)).fetchall()
+
+
+def _recent_matches(conn, emails, pattern, page, page_params, before, limit):
+    """One page from a newest-first pass over orders, or None when the merge should serve it.
+
+    Were the addresses' orders spread evenly in time, the pass would read
+    ``limit`` divided by their share of the hot orders. It is tried when that is
+    below what the per-address queries cost, over a few times that many of
+    the newest orders, and gives up if those are mostly someone else's.
+    """
+    budget = len(emails) * EMAIL_QUERY_COST
+    matching = sum(row[1] for row in emails)
+    if not budget or not matching:
+        return None
+    # order_emails counts hot orders only; status_counts still counts archived ones
+    total = conn.execute('SELECT (SELECT COALESCE(SUM(orders), 0) FROM status_counts) - '
+                         '(SELECT COALESCE(SUM(orders), 0) FROM archive_periods)').fetchone()[0]
+    expected = limit * total / matching
+    if expected > budget:
+        return None
+    window, window_params = _older_than(before, 1)
+    # idx_orders_ts alone: no table reads
+    floor = conn.execute('SELECT ts, id FROM orders WHERE 1' + window + ' OFFSET ?',
+                         window_params + (int(min(budget, 4 * expected)),)).fetchone()
+    if floor is None:
+        # Fewer orders than that are left: the pass covers them all
+        return conn.execute("SELECT * FROM orders WHERE lower(trim(email)) LIKE ? ESCAPE '\\'" + page,
+                            (pattern,) + page_params).fetchall()
+    orders = conn.execute("SELECT * FROM orders WHERE lower(trim(email)) LIKE ? ESCAPE '\\' AND (ts, id) >= (?, ?)" + page,
+                          (pattern,) + tuple(floor) + page_params).fetchall()
+    return orders if len(orders) == limit else None
+
+
+def _newest_first(row):
+    return row['ts'] or 0, row['id']
+
+
+def _older_than(before, limit):
+    """SQL suffix and params for one (ts DESC, id DESC) page before the ``(ts, id)`` cursor."""
+    sql, params = '', []
+    if before is not None:
+        sql += ' AND ts < ? AND (ts, id) < (?, ?)'
+        params.extend((before[0] + 1,) + tuple(before))
+    sql += ' ORDER BY ts DESC, id DESC'
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    return sql, tuple(params)
+
+
+def get_orders_matching_email(email, match='contains', before=None, limit=None):
+    """Return orders whose email matches the provided value, newest first.
+
+    The input is trimmed and matched case-insensitively. ``match`` is
+    'contains' (default, any part of the address), 'prefix' or 'exact'.
+    ``before`` is the ``(ts, id)`` of the last order on the previous page.
+    Exact matches read idx_orders_email_norm_ts directly. Otherwise the
+    matching addresses are looked up in order_emails (prefix: NOCASE index,
+    substring: trigram index) and each address's orders, already in ts
+    order in that index, are merged - no sort. Past EMAIL_MERGE_LIMIT
+    addresses a single pass over orders is cheaper. For one page, the newest
+    orders are tried first, up to as many rows as the per-address queries
+    would cost: broad terms fill the page there, and the merge serves the
+    rest.
+    """
+    if email is None:
         return []
-    email_search = f"%{email.strip().lower()}%"
-    orders = conn.execute('SELECT * FROM orders WHERE LOWER(email) LIKE ? ORDER BY date DESC', (email_search,)).fetchall()
+    term = email.strip().lower()
+    page, page_params = _older_than(before, limit)
+    conn = get_db_connection()
+    if match == 'exact':
+        orders = conn.execute('SELECT * FROM orders WHERE lower(trim(email)) = ?' + page, (term,) + page_params).fetchall()
+        conn.close()
+        return orders
+    emails = _matching_emails(conn, term, match)
+    pattern = _like_escape(term) + '%' if match == 'prefix' else '%' + _like_escape(term) + '%'
+    orders = None
+    if len(emails) > EMAIL_MERGE_LIMIT:
+        orders = conn.execute("SELECT * FROM orders WHERE lower(trim(email)) LIKE ? ESCAPE '\\'" + page,
+                              (pattern,) + page_params).fetchall()
+    elif limit is not None:
+        orders = _recent_matches(conn, emails, pattern, page, page_params, before, limit)
+    if orders is None:
+        # Open cursors: the merge reads each address's orders only as far as the page needs
+        per_email = [conn.execute('SELECT * FROM orders WHERE lower(trim(email)) = ?' + page, (address,) + page_params)
+                     for address, _ in emails]
+        orders = list(itertools.islice(heapq.merge(*per_email, key=_newest_first, reverse=True), limit))
     conn.close()
     return orders
 
 
-def get_clients():
+def get_clients(after_id=None, limit=None):
+    """All clients by id; after_id / limit return one keyset page."""
     conn = get_db_connection()
-    clients = conn.execute('SELECT * FROM clients').fetchall()
+    query = 'SELECT * FROM clients'
+    params = []
+    if after_id is not None:
+        query += ' WHERE id > ?'
+        params.append(after_id)
+    query += ' ORDER BY id'
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    clients = conn.execute(query, tuple(params)).fetchall()
     conn.close()
     return clients
 
@@ -171,73 +620,325 @@ def get_client(client_id):
 
 
 def add_client(name, email, phone, address, has_courses=0):
+    with write_transaction() as conn:
+        conn.execute('INSERT INTO clients (name, email, phone, address, has_courses) VALUES (?, ?, ?, ?, ?)',
+                     (name, email, phone, address, 1 if has_courses else 0))
+
+
+def update_client(client_id, name, email, phone, address, has_courses=0):
+    with write_transaction() as conn:
+        conn.execute('UPDATE clients SET name = ?, email = ?, phone = ?, address = ?, has_courses = ? WHERE id = ?',
+                     (name, email, phone, address, 1 if has_courses else 0, client_id))
+
+
+def delete_client(client_id):
+    with write_transaction() as conn:
+        conn.execute('DELETE FROM clients WHERE id = ?', (client_id,))
+
+def get_order_stats_by_status():
+    """Order count and revenue per status, from the status_counts summary."""
     conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute('INSERT INTO clients (name, email, phone, address, has_courses) VALUES (?, ?, ?, ?, ?)',
-                (name, email, phone, address, 1 if has_courses else 0))
-    conn.commit()
+    rows = conn.execute('SELECT status, orders, revenue FROM status_counts WHERE orders > 0 ORDER BY orders DESC').fetchall()
     conn.close()
+    return rows
 
 
-def update_client(client_id, name, email, phone, address, has_courses=0):
+def get_order_stats_by_day(days=30, since=None, until=None):
+    """Order count and revenue per calendar day, newest first, from the daily_sales summary.
+
+    ``since`` / ``until`` are inclusive YYYY-MM-DD bounds; without ``since``
+    the last ``days`` days are returned.
+    """
+    if since is None:
+        since = (datetime.now() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    query = 'SELECT day, orders, revenue FROM daily_sales WHERE day >= ?'
+    params = [since]
+    if until is not None:
+        query += ' AND day <= ?'
+        params.append(until)
     conn = get_db_connection()
-    conn.execute('UPDATE clients SET name = ?, email = ?, phone = ?, address = ?, has_courses = ? WHERE id = ?',
-                 (name, email, phone, address, 1 if has_courses else 0, client_id))
-    conn.commit()
+    rows = conn.execute(query + ' AND orders > 0 ORDER BY day DESC', tuple(params)).fetchall()
     conn.close()
+    return rows
 
 
-def delete_client(client_id):
+def get_top_products(limit=10):
+    """Best-selling products by units ordered, from the product_sales summary.
+
+    order_items doesn't record the price paid, so revenue is estimated at the
+    current catalog price; deleted products keep their id with a NULL name.
+    """
+    conn = get_db_connection()
+    rows = conn.execute('SELECT s.product_id, p.name, s.units, s.orders, ROUND(s.units * p.price, 2) AS revenue '
+                        'FROM product_sales s LEFT JOIN products p ON p.id = s.product_id '
+                        'WHERE s.units > 0 ORDER BY s.units DESC LIMIT ?', (limit,)).fetchall()
+    conn.close()
+    return rows
+
+
+def get_product_sales(product_id):
+    """Units sold and number of orders for one product (zeros if never ordered)."""
+    conn = get_db_connection()
+    row = conn.execute('SELECT units, orders FROM product_sales WHERE product_id = ?', (product_id,)).fetchone()
+    conn.close()
+    return {'product_id': product_id, 'units': row['units'] if row else 0, 'orders': row['orders'] if row else 0}
+
+
+def rebuild_sales_stats():
+    """Recompute daily_sales, status_counts and product_sales from the orders (see rebuild_stats.py).
+
+    Archived orders still count; holding the write lock keeps the archiver
+    from moving orders while their totals are read.
+    """
+    with write_transaction() as conn:
+        # Read through a second connection before this one has written anything
+        daily, statuses, products = archive.sales_totals()
+        migrations.rebuild_sales_summaries(conn)
+        conn.executemany(DAILY_SALES_UPSERT, [(day, count, revenue) for day, (count, revenue) in daily.items()])
+        conn.executemany(STATUS_COUNTS_UPSERT, [(status, count, revenue) for status, (count, revenue) in statuses.items()])
+        conn.executemany(PRODUCT_SALES_UPSERT, [(product_id, units, count) for product_id, (units, count) in products.items()])
+
+
+CLOSED_STATUSES = ('Доставлено', 'Скасовано')
+
+
+def archive_orders_batch(before_ts, batch_size=500):
+    """Move up to ``batch_size`` closed orders placed before ``before_ts`` into the archive.
+
+    The orders are copied to their quarter's file first, then deleted from
+    the hot database in one short write transaction - only those still
+    unchanged; anything edited in between stays hot and its copy is dropped.
+    The sales summaries keep counting archived orders. Returns how many moved.
+    """
     conn = get_db_connection()
-    conn.execute('DELETE FROM clients WHERE id = ?', (client_id,))
-    conn.commit()
+    orders = conn.execute(f'SELECT * FROM orders WHERE status IN ({", ".join("?" * len(CLOSED_STATUSES))}) AND ts < ? LIMIT ?',
+                          CLOSED_STATUSES + (before_ts, batch_size)).fetchall()
+    if not orders:
+        conn.close()
+        return 0
+    columns = [(row[1], row[2]) for row in conn.execute('PRAGMA table_info(orders)')]
+    ids = [order['id'] for order in orders]
+    items = conn.execute(f'SELECT id, order_id, product_id, quantity FROM order_items WHERE order_id IN ({",".join("?" * len(ids))})',
+                         ids).fetchall()
     conn.close()
 
+    by_period = {}
+    for order in orders:
+        by_period.setdefault(archive.period_of(order['date']), []).append(tuple(order))
+    items_by_order = {}
+    for item in items:
+        items_by_order.setdefault(item['order_id'], []).append(tuple(item))
+    for period, rows in by_period.items():
+        archive.store(period, columns, rows, [item for row in rows for item in items_by_order.get(row[0], [])])
+
+    moved, stale = [], {}
+    with write_transaction() as conn:
+        for period, rows in by_period.items():
+            for row in rows:
+                current = conn.execute('SELECT * FROM orders WHERE id = ?', (row[0],)).fetchone()
+                if current is not None and tuple(current) == row:
+                    moved.append((row[0], period))
+                else:
+                    stale.setdefault(period, []).append(row[0])
+        conn.executemany('DELETE FROM order_items WHERE order_id = ?', [(order_id,) for order_id, _ in moved])
+        conn.executemany('DELETE FROM orders WHERE id = ?', [(order_id,) for order_id, _ in moved])
+        conn.executemany('INSERT OR REPLACE INTO archived_orders (order_id, period) VALUES (?, ?)', moved)
+        per_period = collections.Counter(period for _, period in moved)
+        conn.executemany('INSERT INTO archive_periods (period, orders) VALUES (?, ?) ON CONFLICT (period) '
+                         'DO UPDATE SET orders = orders + excluded.orders', list(per_period.items()))
+    for period, order_ids in stale.items():
+        archive.discard(period, order_ids)
+    return len(moved)
+
+
+def archive_old_orders(older_than_days=None, batch_size=None, pause=0.05, max_batches=None):
+    """Archive closed orders older than ``older_than_days`` (ARCHIVE_AFTER_DAYS, default 180) batch by batch.
+
+    Sleeps ``pause`` seconds between batches so other writers get the lock.
+    Returns the number of orders moved (see archive_orders.py).
+    """
+    if older_than_days is None:
+        older_than_days = float(os.environ.get('ARCHIVE_AFTER_DAYS', 180))
+    if batch_size is None:
+        batch_size = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+    before_ts = int(time.time() - older_than_days * 86400)
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_orders_batch(before_ts, batch_size)
+        if not moved:
+            break
+        total += moved
+        batches += 1
+        time.sleep(pause)
+    return total
+
+
+def get_feedback_counts_by_type():
+    conn = get_db_connection()
+    rows = conn.execute('SELECT feedback_type, COUNT(*) AS count FROM feedback GROUP BY feedback_type').fetchall()
+    conn.close()
+    return rows
+
+
 def get_order_details(order_id):
+    """(order, items) for an order id; archived orders are read from their quarter's file."""
     conn = get_db_connection()
+    schema = 'main'
     order = conn.execute('SELECT * FROM orders WHERE id = ?', (order_id,)).fetchone()
-    items = conn.execute('SELECT oi.quantity, p.name, p.price FROM order_items oi JOIN products p ON oi.product_id = p.id WHERE oi.order_id = ?', (order_id,)).fetchall()
+    if order is None:
+        archived = conn.execute('SELECT period FROM archived_orders WHERE order_id = ?', (order_id,)).fetchone()
+        if archived is not None:
+            schema = archive.attach(conn, archived[0])
+            order = conn.execute(f'SELECT * FROM {schema}.orders WHERE id = ?', (order_id,)).fetchone()
+    items = conn.execute(f'SELECT oi.quantity, p.name, p.price FROM {schema}.order_items oi JOIN main.products p ON oi.product_id = p.id '
+                         'WHERE oi.order_id = ?', (order_id,)).fetchall()
     conn.close()
     return order, items
 
 
-def update_order_contact(order_id, address, phone):
+def is_order_archived(order_id):
+    """True when the order was moved to the archive (read-only from then on)."""
     conn = get_db_connection()
-    conn.execute('UPDATE orders SET address = ?, phone = ? WHERE id = ?', (address, phone, order_id))
-    conn.commit()
+    row = conn.execute('SELECT 1 FROM archived_orders WHERE order_id = ?', (order_id,)).fetchone()
     conn.close()
+    return row is not None
+
+
+def update_order_contact(order_id, address, phone):
+    """False when there is no such order in the hot database (unknown or archived)."""
+    with write_transaction() as conn:
+        return conn.execute('UPDATE orders SET address = ?, phone = ? WHERE id = ?', (address, phone, order_id)).rowcount > 0
 
 def update_order_status(order_id, status):
-    conn = get_db_connection()
-    conn.execute('UPDATE orders SET status = ? WHERE id = ?', (status, order_id))
-    conn.commit()
-    conn.close()
+    """False when there is no such order in the hot database (unknown or archived)."""
+    with write_transaction() as conn:
+        order = conn.execute('SELECT date, status, total_price FROM orders WHERE id = ?', (order_id,)).fetchone()
+        if order is None:
+            return False
+        if order['status'] == status:
+            return True
+        conn.execute('UPDATE orders SET status = ? WHERE id = ?', (status, order_id))
+        # Only status_counts changes: the order moves from one status row to another
+        total_price = order['total_price'] or 0
+        conn.executemany(STATUS_COUNTS_UPSERT, [(order['status'] or '', -1, -total_price), (status, 1, total_price)])
+    return True
 
 def delete_order(order_id):
+    """False when there is no such order in the hot database (unknown or archived)."""
+    with write_transaction() as conn:
+        order = conn.execute('SELECT date, status, total_price FROM orders WHERE id = ?', (order_id,)).fetchone()
+        if order is None:
+            return False
+        items = conn.execute('SELECT product_id, quantity FROM order_items WHERE order_id = ?', (order_id,)).fetchall()
+        conn.execute('DELETE FROM order_items WHERE order_id = ?', (order_id,))
+        conn.execute('DELETE FROM orders WHERE id = ?', (order_id,))
+        _apply_sales(conn, [(order['date'], order['status'], order['total_price'],
+                            [(item['product_id'], item['quantity']) for item in items])], sign=-1)
+    return True
+
+
+EXPORT_TABLES = ('orders', 'feedback', 'clients')
+
+
+def iter_table_rows(table, chunk_size=1000):
+    """Stream a whole table in id order without holding it in memory.
+
+    The first item yielded is the tuple of column names; each following item
+    is a list of up to ``chunk_size`` plain row tuples (``fetchmany``). The
+    rows come from a dedicated connection, so a long export reads one
+    consistent snapshot and never holds up the pooled connection or writers.
+    Closing the generator closes the connection.
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f'Unknown export table: {table}')
+    conn = db.connect()
+    conn.row_factory = None
+    try:
+        cur = conn.execute(f'SELECT * FROM {table} ORDER BY id')
+        yield tuple(column[0] for column in cur.description)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
+def get_all_feedback(before_id=None, limit=None, fields=None):
+    """All feedback, newest first; before_id / limit return one keyset page, fields limits the columns."""
     conn = get_db_connection()
-    conn.execute('DELETE FROM order_items WHERE order_id = ?', (order_id,))
-    conn.execute('DELETE FROM orders WHERE id = ?', (order_id,))
-    conn.commit()
+    query = f"SELECT {_select_list('feedback', fields)} FROM feedback"
+    params = []
+    if before_id is not None:
+        query += ' WHERE id < ?'
+        params.append(before_id)
+    query += ' ORDER BY id DESC'
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    feedback = conn.execute(query, tuple(params)).fetchall()
     conn.close()
+    return feedback
 
 
-def get_feedback_by_type(feedback_type='general'):
-    """Get feedback filtered by type (general or developer)."""
+def get_feedback_by_type(feedback_type='general', before_id=None, limit=None, fields=None):
+    """Get feedback filtered by type (general or developer), newest first; before_id / limit page it."""
     conn = get_db_connection()
-    feedback = conn.execute('SELECT * FROM feedback WHERE feedback_type = ? ORDER BY id DESC', (feedback_type,)).fetchall()
+    query = f"SELECT {_select_list('feedback', fields)} FROM feedback WHERE feedback_type = ?"
+    params = [feedback_type]
+    if before_id is not None:
+        query += ' AND id < ?'
+        params.append(before_id)
+    query += ' ORDER BY id DESC'
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    feedback = conn.execute(query, tuple(params)).fetchall()
     conn.close()
     return feedback
 
 
 def add_feedback(name, email, message, feedback_type='general'):
     """Add feedback with a type indicator."""
+    with write_transaction() as conn:
+        cur = conn.execute(
+            'INSERT INTO feedback (name, email, message, feedback_type) VALUES (?, ?, ?, ?)',
+            (name, email, message, feedback_type)
+        )
+        feedback_id = cur.lastrowid
+    return feedback_id
+
+
+def add_feedback_batch(entries):
+    """Insert queued feedback in one transaction (feedback_queue.py).
+
+    ``entries`` are (submission_id, name, email, message, feedback_type);
+    entries whose submission_id is already stored are skipped, so replaying
+    a spool segment is harmless.
+    """
+    with write_transaction() as conn:
+        conn.executemany(
+            'INSERT OR IGNORE INTO feedback (submission_id, name, email, message, feedback_type) VALUES (?, ?, ?, ?, ?)',
+            entries
+        )
+
+
+def get_feedback_by_submission(submission_id):
+    """Feedback row stored for a provisional id, or None while it is still queued."""
     conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        'INSERT INTO feedback (name, email, message, feedback_type) VALUES (?, ?, ?, ?)',
-        (name, email, message, feedback_type)
-    )
-    conn.commit()
-    feedback_id = cur.lastrowid
+    feedback = conn.execute('SELECT * FROM feedback WHERE submission_id = ?', (submission_id,)).fetchone()
     conn.close()
-    return feedback_id
\ No newline at end of file
+    return feedback
+
+
+def get_feedback(feedback_id):
+    conn = get_db_connection()
+    feedback = conn.execute('SELECT * FROM feedback WHERE id = ?', (feedback_id,)).fetchone()
+    conn.close()
+    return feedback
+
+
+def delete_feedback(feedback_id):
+    with write_transaction() as conn:
+        conn.execute('DELETE FROM feedback WHERE id = ?', (feedback_id,))
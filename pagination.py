@@ -0,0 +1,74 @@
+"""Cursor pagination helpers shared by the API and the HTML pages.
+
+Lists are paged by keyset on ``id`` (``WHERE id > last_id``), which stays
+cheap however deep the client pages. Cursors are opaque to clients:
+base64url-encoded JSON holding whatever the list needs to resume - the last
+id, the last sort key, or, for relevance-ranked search results whose order
+isn't an index, a row offset.
+"""
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(position):
+    raw = json.dumps(position, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor from a request; raises ValueError if it was tampered with."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(position, dict):
+        raise ValueError('Invalid cursor')
+    return position
+
+
+def parse_page_args(args, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Return ``(position, limit)`` from ``cursor``/``limit`` query args.
+
+    The limit is clamped to ``maximum`` whatever the client asks for.
+    Raises ValueError for a malformed cursor or a non-positive limit.
+    """
+    limit = args.get('limit')
+    if limit in (None, ''):
+        limit = default
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError('limit must be an integer')
+        if limit < 1:
+            raise ValueError('limit must be positive')
+    cursor = args.get('cursor')
+    position = decode_cursor(cursor) if cursor else {}
+    return position, min(limit, maximum)
+
+
+def cursor_int(position, key):
+    """Integer field of a decoded cursor, or None when absent."""
+    value = position.get(key)
+    if value is None:
+        return None
+    # SQLite integers are 64-bit: a larger one would fail in the query, not here
+    if not isinstance(value, int) or isinstance(value, bool) or not -2 ** 63 <= value < 2 ** 63:
+        raise ValueError('Invalid cursor')
+    return value
+
+
+def split_page(rows, limit, next_position):
+    """Split ``limit + 1`` fetched rows into the page and the cursor for the next one.
+
+    ``next_position(last_row)`` builds the cursor payload from the last row
+    on the page; the cursor is None on the last page.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(next_position(page[-1]))
@@ -0,0 +1,5 @@
+from models import rebuild_sales_stats
+
+if __name__ == '__main__':
+    rebuild_sales_stats()
+    print("Статистику продажів (daily_sales, status_counts, product_sales) перераховано.")
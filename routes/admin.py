@@ -1,10 +1,29 @@
-from flask import Blueprint, render_template, redirect, url_for, request, session, flash, current_app
-from models import get_db_connection, get_orders, get_order_details, update_order_status, delete_order
+from flask import Blueprint, render_template, redirect, url_for, request, session, flash, current_app, jsonify
+import dashboard
+from models import get_feedback_by_type, get_orders_with_items, get_order_details, update_order_status, delete_order
 from models import get_clients, add_client, update_client, delete_client
 from models import get_products, get_product, add_product, update_product, delete_product
+from models import delete_feedback as remove_feedback
+from pagination import cursor_int, parse_page_args, split_page
 
 admin_bp = Blueprint('admin', __name__)
 
+ADMIN_PAGE_SIZE = 50
+
+# Таблиці адмін-панелі підвантажуються сторінками: section -> (завантажити limit рядків після position, позиція наступної сторінки)
+SECTIONS = {
+    'products': (lambda position, limit: get_products(after_id=cursor_int(position, 'id'), limit=limit),
+                 lambda last: {'id': last['id']}),
+    'orders': (lambda position, limit: get_orders_with_items(after_id=cursor_int(position, 'id'), limit=limit),
+               lambda last: {'id': last['id']}),
+    'clients': (lambda position, limit: get_clients(after_id=cursor_int(position, 'id'), limit=limit),
+                lambda last: {'id': last['id']}),
+    'developer_feedback': (lambda position, limit: get_feedback_by_type('developer', before_id=cursor_int(position, 'id'), limit=limit),
+                           lambda last: {'id': last['id']}),
+    'general_feedback': (lambda position, limit: get_feedback_by_type('general', before_id=cursor_int(position, 'id'), limit=limit),
+                         lambda last: {'id': last['id']}),
+}
+
 
 # Перед доступом до захищених маршрутів перевіряємо, чи увійшов адмін
 @admin_bp.before_request
@@ -38,20 +57,26 @@ def logout():
 
 @admin_bp.route('/admin')
 def admin():
-    conn = get_db_connection()
-    feedback = conn.execute('SELECT * FROM feedback').fetchall()
-    conn.close()
-    orders = get_orders()
-    clients = get_clients()
-    products = get_products()
-    return render_template('admin.html', feedback=feedback, orders=orders, clients=clients, products=products)
+    # Лише агрегати (GROUP BY, кешовані на DASHBOARD_CACHE_TTL); таблиці підвантажуються через admin.section
+    return render_template('admin.html', stats=dashboard.get_stats())
+
+
+@admin_bp.route('/admin/section/<any(products, orders, clients, developer_feedback, general_feedback):section>')
+def section(section):
+    """One page of a dashboard table: rendered rows plus the cursor of the next page."""
+    try:
+        position, limit = parse_page_args(request.args, default=ADMIN_PAGE_SIZE,
+                                          maximum=current_app.config['MAX_PAGE_SIZE'])
+        load, next_position = SECTIONS[section]
+        rows, next_cursor = split_page(load(position, limit + 1), limit, next_position)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor or limit', 'code': 'INVALID_PAGINATION'}), 400
+    return jsonify({'html': render_template('admin_rows.html', section=section, rows=rows), 'next_cursor': next_cursor})
 
 @admin_bp.route('/admin/delete_feedback/<int:id>', methods=['POST'])
 def delete_feedback(id):
-    conn = get_db_connection()
-    conn.execute('DELETE FROM feedback WHERE id = ?', (id,))
-    conn.commit()
-    conn.close()
+    remove_feedback(id)
+    dashboard.invalidate()
     return redirect(url_for('admin.admin'))
 
 
@@ -95,12 +120,16 @@ def order_details(order_id):
 @admin_bp.route('/admin/update_order_status/<int:order_id>', methods=['POST'])
 def update_order(order_id):
     status = request.form['status']
-    update_order_status(order_id, status)
+    if not update_order_status(order_id, status):
+        flash('Замовлення не знайдено або воно в архіві (лише для читання)', 'error')
+    dashboard.invalidate()
     return redirect(url_for('admin.admin'))
 
 @admin_bp.route('/admin/delete_order/<int:order_id>', methods=['POST'])
 def delete_order_route(order_id):
-    delete_order(order_id)
+    if not delete_order(order_id):
+        flash('Замовлення не знайдено або воно в архіві (лише для читання)', 'error')
+    dashboard.invalidate()
     return redirect(url_for('admin.admin'))
 
 
@@ -113,6 +142,7 @@ def add_product_route():
         price = float(price)
         if name and price > 0:
             add_product(name, price, image)
+            dashboard.invalidate()
             flash('Товар додано', 'info')
     except ValueError:
         flash('Неправильна ціна', 'error')
@@ -128,6 +158,7 @@ def edit_product_route(product_id):
         price = float(price)
         if name and price > 0:
             update_product(product_id, name, price, image)
+            dashboard.invalidate()
             flash('Товар оновлено', 'info')
     except ValueError:
         flash('Неправильна ціна', 'error')
@@ -137,5 +168,6 @@ def edit_product_route(product_id):
 @admin_bp.route('/admin/products/delete/<int:product_id>', methods=['POST'])
 def delete_product_route(product_id):
     delete_product(product_id)
+    dashboard.invalidate()
     flash('Товар видалено', 'info')
     return redirect(url_for('admin.admin'))
\ No newline at end of file
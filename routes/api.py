@@ -1,7 +1,13 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request
+from datetime import datetime, timedelta
 from functools import wraps
+import feedback_queue
+import serialization
+from export import ENCODERS, FORMATS
+from http_cache import conditional
+from pagination import cursor_int, parse_page_args, split_page
+from serialization import Rows, parse_fields
 from models import (
-    get_db_connection,
     get_products,
     get_product,
     add_product,
@@ -9,13 +15,27 @@ from models import (
     delete_product,
     get_orders,
   get_orders_by_email,
+  get_orders_in_range,
   get_orders_matching_email,
+    get_orders_with_items,
+    get_order_stats_by_status,
+    get_order_stats_by_day,
+    get_top_products,
+    get_product_sales,
     get_order_details,
     add_order,
+    add_orders_bulk,
     update_order_status,
     delete_order,
+    is_order_archived,
+    get_all_feedback as fetch_all_feedback,
     get_feedback_by_type,
-    add_feedback
+    add_feedback,
+    get_feedback,
+    get_feedback_by_submission,
+    delete_feedback as remove_feedback,
+    iter_table_rows,
+    table_columns
 )
 
 api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
@@ -53,16 +73,92 @@ def error_response(message, code, status_code=500, details=None):
         response['details'] = details
     return jsonify(response), status_code
 
-def success_response(data, message=None, status_code=200):
-    """Create a standardized success response."""
+def success_response(data, message=None, status_code=200, **extra):
+    """Create a standardized success response.
+
+    Extra keyword arguments (e.g. ``next_cursor`` for paginated lists) are
+    added to the envelope next to ``data``. Lists of query rows should be
+    passed as ``Rows``: they are encoded without building a dict per row.
+    """
     response = {'status': 'success', 'status_code': status_code}
     if message:
         response['message'] = message
+    response.update(extra)
+    if isinstance(data, Rows):
+        return serialization.response(response, data), status_code
     response['data'] = data
     return jsonify(response), status_code
 
+
+def page_args():
+    """(cursor position, limit) for the current request, limit clamped to MAX_PAGE_SIZE."""
+    return parse_page_args(request.args, maximum=current_app.config['MAX_PAGE_SIZE'])
+
+
+def page_response(rows, limit, next_position, fields=None):
+    """success_response for one page; ``rows`` holds up to ``limit + 1`` rows, ``fields`` picks the keys."""
+    page, next_cursor = split_page(rows, limit, next_position)
+    return success_response(Rows(page, fields), next_cursor=next_cursor, limit=limit)
+
+
+def fields_arg(table):
+    """Sparse fieldset from ``?fields=id,name``, checked against the table's columns; None when absent."""
+    return parse_fields(request.args.get('fields'), table_columns(table))
+
+
+def with_keys(fields, *keys):
+    """Columns to select for ``fields`` plus the keys the cursor needs (None: all columns)."""
+    if fields is None:
+        return None
+    return fields + [key for key in keys if key not in fields]
+
+
+def time_bound(value, end=False):
+    """Epoch seconds for a ``from`` / ``to`` query value.
+
+    Accepts epoch seconds, a date (YYYY-MM-DD) or an ISO datetime; without a
+    UTC offset the value is server local time, like ``orders.date``. With
+    ``end`` the result is an exclusive upper bound: a date covers the whole
+    day, a datetime includes its own second. Raises ValueError.
+    """
+    value = value.strip()
+    if value.lstrip('-').isdigit():
+        moment = int(value)
+    elif len(value) == 10:
+        day = datetime.strptime(value, '%Y-%m-%d')
+        return int((day + timedelta(days=1 if end else 0)).timestamp())
+    else:
+        moment = int(datetime.fromisoformat(value).timestamp())
+    return moment + 1 if end else moment
+
+
+def order_not_writable(order_id):
+    """Error response for a write that found no hot order: 409 if it was archived, 404 otherwise."""
+    if is_order_archived(order_id):
+        return error_response('Archived orders are read-only', 'ORDER_ARCHIVED', 409)
+    return error_response('Order not found', 'ORDER_NOT_FOUND', 404)
+
+
+def order_position(position):
+    """(ts, id) from an order-list cursor; older cursors carry the date string instead of ts.
+
+    Raises ValueError unless both parts are present.
+    """
+    if 'ts' not in position and 'date' in position:
+        try:
+            ts = int(datetime.strptime(str(position['date']), '%Y-%m-%d %H:%M:%S').timestamp())
+        except (OverflowError, OSError) as e:
+            raise ValueError('Invalid cursor') from e
+    else:
+        ts = cursor_int(position, 'ts')
+    order_id = cursor_int(position, 'id')
+    if ts is None or order_id is None:
+        raise ValueError('Invalid cursor')
+    return ts, order_id
+
 # Products endpoints
 @api_bp.route('/products', methods=['GET'])
+@conditional('products')
 def get_all_products():
     """
     Отримати всі продукти з опціональною фільтрацією
@@ -90,25 +186,57 @@ def get_all_products():
         type: boolean
         required: false
         description: Тільки товари з фото
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Розмір сторінки (обмежений MAX_PAGE_SIZE)
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: next_cursor з попередньої сторінки
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Лише ці поля через кому, напр. id,name,price
     responses:
       200:
-        description: Список продуктів
+        description: Сторінка списку продуктів (next_cursor = null на останній)
+      400:
+        description: Некоректний cursor, limit або fields
       500:
         description: Помилка сервера
     """
+    try:
+        fields = fields_arg('products')
+    except ValueError as e:
+        return error_response(str(e), 'INVALID_FIELDS', 400)
     try:
         q = request.args.get('q')
         min_price = request.args.get('min_price')
         max_price = request.args.get('max_price')
         has_image = request.args.get('has_image') in ('true', '1', 'yes') if request.args.get('has_image') else None
-        
-        products = get_products(q=q, min_price=min_price, max_price=max_price, has_image=has_image)
-        return success_response([dict(product) for product in products])
+        position, limit = page_args()
+
+        if q:
+            # Search results are ranked by relevance, so page them by offset
+            offset = cursor_int(position, 'offset') or 0
+            products = get_products(q=q, min_price=min_price, max_price=max_price, has_image=has_image,
+                                    offset=offset, limit=limit + 1, fields=fields)
+            return page_response(products, limit, lambda last: {'offset': offset + limit}, fields)
+        products = get_products(min_price=min_price, max_price=max_price, has_image=has_image,
+                                after_id=cursor_int(position, 'id'), limit=limit + 1, fields=with_keys(fields, 'id'))
+        return page_response(products, limit, lambda last: {'id': last['id']}, fields)
+    except ValueError as e:
+        return error_response(str(e), 'INVALID_PAGINATION', 400)
     except Exception as e:
         return error_response(f'Error retrieving products: {str(e)}', 'PRODUCT_RETRIEVAL_ERROR', 500)
 
 
 @api_bp.route('/products/<int:product_id>', methods=['GET'])
+@conditional('products')
 def get_single_product(product_id):
     """
     Отримати один продукт за ID
@@ -120,17 +248,28 @@ def get_single_product(product_id):
         in: path
         type: integer
         required: true
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Лише ці поля через кому, напр. id,name,price
     responses:
       200:
         description: Продукт
+      400:
+        description: Некоректний fields
       404:
         description: Продукт не знайдено
     """
+    try:
+        fields = fields_arg('products')
+    except ValueError as e:
+        return error_response(str(e), 'INVALID_FIELDS', 400)
     try:
         product = get_product(product_id)
         if not product:
             return error_response('Product not found', 'PRODUCT_NOT_FOUND', 404)
-        return success_response(dict(product))
+        return success_response({field: product[field] for field in fields} if fields else dict(product))
     except Exception as e:
         return error_response(f'Error retrieving product: {str(e)}', 'PRODUCT_RETRIEVAL_ERROR', 500)
 
@@ -274,6 +413,7 @@ def delete_prod(product_id):
 def get_all_orders():
     """
     Отримати всі замовлення або замовлення за email
+    Лише оперативна база: заархівовані замовлення (archive_orders.py) у списки не потрапляють, їх віддає GET /orders/{order_id}.
     ---
     tags:
       - Orders
@@ -283,19 +423,86 @@ def get_all_orders():
         type: string
         required: false
         description: Email для фільтрації замовлень
+      - name: from
+        in: query
+        type: string
+        required: false
+        description: Початок періоду включно - epoch-секунди, YYYY-MM-DD або ISO datetime (місцевий час сервера, якщо без зсуву)
+      - name: to
+        in: query
+        type: string
+        required: false
+        description: Кінець періоду включно (дата без часу - до кінця дня)
+      - name: include
+        in: query
+        type: string
+        required: false
+        enum: ["items"]
+        description: items - додати до кожного замовлення його товари (без окремого запиту на замовлення)
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Розмір сторінки (обмежений MAX_PAGE_SIZE)
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: next_cursor з попередньої сторінки
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Лише ці поля через кому, напр. id,date,total_price,status (з include=items товари додаються завжди)
     responses:
       200:
-        description: Список замовлень
+        description: Сторінка списку замовлень (next_cursor = null на останній); з email - новіші спочатку, з from/to - за часом
+      400:
+        description: Некоректний cursor, limit, період або fields
       500:
         description: Помилка сервера
     """
+    try:
+        since = time_bound(request.args['from']) if request.args.get('from') else None
+        until = time_bound(request.args['to'], end=True) if request.args.get('to') else None
+    except ValueError:
+        return error_response('from / to must be epoch seconds, YYYY-MM-DD or an ISO datetime', 'INVALID_RANGE', 400)
+    if since is not None and until is not None and since >= until:
+        return error_response('from must not be later than to', 'INVALID_RANGE', 400)
+    try:
+        fields = fields_arg('orders')
+    except ValueError as e:
+        return error_response(str(e), 'INVALID_FIELDS', 400)
     try:
         email = request.args.get('email')
+        with_items = request.args.get('include') == 'items'
+        shown = fields + ['items'] if fields and with_items else fields
+        position, limit = page_args()
         if email:
-            orders = get_orders_by_email(email)
+            before = order_position(position) if 'id' in position else None
+            select = with_keys(fields, 'ts', 'id')
+            if with_items:
+                orders = get_orders_with_items(email=email, before=before, limit=limit + 1, since=since, until=until,
+                                               fields=select)
+            else:
+                orders = get_orders_by_email(email, before=before, limit=limit + 1, since=since, until=until, fields=select)
+            return page_response(orders, limit, lambda last: {'ts': last['ts'], 'id': last['id']}, shown)
+        if since is not None or until is not None:
+            after = order_position(position) if 'id' in position else None
+            select = with_keys(fields, 'ts', 'id')
+            if with_items:
+                orders = get_orders_with_items(since=since, until=until, after=after, limit=limit + 1, fields=select)
+            else:
+                orders = get_orders_in_range(since, until, after=after, limit=limit + 1, fields=select)
+            return page_response(orders, limit, lambda last: {'ts': last['ts'], 'id': last['id']}, shown)
+        after_id = cursor_int(position, 'id')
+        if with_items:
+            orders = get_orders_with_items(after_id=after_id, limit=limit + 1, fields=with_keys(fields, 'id'))
         else:
-            orders = get_orders()
-        return success_response([dict(order) for order in orders])
+            orders = get_orders(after_id=after_id, limit=limit + 1, fields=with_keys(fields, 'id'))
+        return page_response(orders, limit, lambda last: {'id': last['id']}, shown)
+    except ValueError:
+        return error_response('Invalid cursor or limit', 'INVALID_PAGINATION', 400)
     except Exception as e:
         return error_response(str(e), 'ORDER_RETRIEVAL_ERROR', 500)
 
@@ -304,6 +511,7 @@ def get_all_orders():
 def search_orders_by_email():
     """
     Пошук замовлень за email (частковий, нечутливий до регістру)
+    Лише оперативна база: заархівовані замовлення не шукаються.
     ---
     tags:
       - Orders
@@ -313,11 +521,27 @@ def search_orders_by_email():
         type: string
         required: true
         description: Email або його частина для пошуку
+      - name: match
+        in: query
+        type: string
+        enum: [contains, prefix, exact]
+        default: contains
+        description: Частина адреси, її початок або вся адреса
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Розмір сторінки (обмежений MAX_PAGE_SIZE)
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: next_cursor з попередньої сторінки
     responses:
       200:
-        description: Список замовлень
+        description: Сторінка замовлень, новіші спочатку (next_cursor = null на останній)
       400:
-        description: Не вказано email
+        description: Не вказано email, некоректний match, cursor або limit
       500:
         description: Помилка сервера
     """
@@ -325,12 +549,58 @@ def search_orders_by_email():
         email = request.args.get('email', '').strip()
         if not email:
             return error_response('Email query parameter is required', 'MISSING_EMAIL', 400)
+        match = request.args.get('match', 'contains')
+        if match not in ('contains', 'prefix', 'exact'):
+            return error_response('match must be contains, prefix or exact', 'INVALID_MATCH', 400)
+        try:
+            position, limit = page_args()
+            before = order_position(position) if position else None
+        except ValueError as e:
+            return error_response(str(e), 'INVALID_PAGINATION', 400)
         # Use the models helper for case-insensitive partial matches
-        orders = get_orders_matching_email(email)
-        return success_response([dict(order) for order in orders])
+        orders = get_orders_matching_email(email, match=match, before=before, limit=limit + 1)
+        return page_response(orders, limit, lambda last: {'ts': last['ts'], 'id': last['id']})
     except Exception as e:
         return error_response(str(e), 'ORDER_SEARCH_ERROR', 500)
 
+@api_bp.route('/orders/details', methods=['GET'])
+def get_orders_details():
+    """
+    Отримати кілька замовлень разом з товарами одним запитом
+    ---
+    tags:
+      - Orders
+    parameters:
+      - name: ids
+        in: query
+        type: string
+        required: true
+        description: ID замовлень через кому (не більше MAX_PAGE_SIZE), напр. 1,2,3
+    responses:
+      200:
+        description: Замовлення з товарами у порядку ids; ненайдені ID - у полі missing
+      400:
+        description: ids відсутні, некоректні або їх забагато
+      500:
+        description: Помилка сервера
+    """
+    try:
+        ids = [int(part) for part in request.args.get('ids', '').split(',') if part.strip()]
+    except ValueError:
+        return error_response('ids must be comma-separated integers', 'INVALID_IDS', 400)
+    if not ids:
+        return error_response('ids query parameter is required', 'INVALID_IDS', 400)
+    maximum = current_app.config['MAX_PAGE_SIZE']
+    if len(ids) > maximum:
+        return error_response(f'At most {maximum} ids per request', 'INVALID_IDS', 400)
+    try:
+        found = {order['id']: order for order in get_orders_with_items(ids=ids)}
+        orders = [found[order_id] for order_id in dict.fromkeys(ids) if order_id in found]
+        missing = [order_id for order_id in dict.fromkeys(ids) if order_id not in found]
+        return success_response(orders, missing=missing)
+    except Exception as e:
+        return error_response(str(e), 'ORDER_RETRIEVAL_ERROR', 500)
+
 @api_bp.route('/orders/<int:order_id>', methods=['GET'])
 def get_order(order_id):
     """
@@ -416,6 +686,72 @@ def create_order():
     except Exception as e:
         return error_response(f'Error creating order: {str(e)}', 'ORDER_CREATION_ERROR', 500)
 
+@api_bp.route('/orders/batch', methods=['POST'])
+@require_json('orders')
+def create_orders_batch():
+    """
+    Створити багато замовлень однією транзакцією
+    ---
+    tags:
+      - Orders
+    description: >
+      Кожне замовлення перевіряється окремо: невалідні повертаються зі статусом
+      "invalid" і не зупиняють решту. Замовлення з уже відомим idempotency_key
+      не створюється вдруге (статус "duplicate", order_id першого), тож
+      повторна відправка того самого пакета безпечна.
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          required:
+            - orders
+          properties:
+            orders:
+              type: array
+              items:
+                type: object
+                required:
+                  - email
+                  - address
+                properties:
+                  idempotency_key:
+                    type: string
+                    example: "marketplace-10042"
+                  email:
+                    type: string
+                    example: "user@example.com"
+                  address:
+                    type: string
+                    example: "вул. Шевченка, 10"
+                  phone:
+                    type: string
+                    example: "+380123456789"
+                  cart:
+                    type: object
+                    example: {"1": {"id": 1, "price": 100.0, "quantity": 2}}
+    responses:
+      200:
+        description: Результат для кожного замовлення (created / duplicate / invalid)
+      400:
+        description: orders не є списком або перевищено ORDER_BATCH_MAX
+      500:
+        description: Помилка сервера
+    """
+    orders = request.get_json()['orders']
+    if not isinstance(orders, list):
+        return error_response('orders must be a list', 'INVALID_BATCH', 400)
+    maximum = current_app.config['ORDER_BATCH_MAX']
+    if len(orders) > maximum:
+        return error_response(f'At most {maximum} orders per batch', 'BATCH_TOO_LARGE', 400)
+    try:
+        results = add_orders_bulk(orders)
+    except Exception as e:
+        return error_response(f'Error creating orders: {str(e)}', 'ORDER_CREATION_ERROR', 500)
+    counts = {status: sum(1 for r in results if r['status'] == status) for status in ('created', 'duplicate', 'invalid')}
+    return success_response({'results': results, **counts})
+
 @api_bp.route('/orders/<int:order_id>', methods=['PUT'])
 @require_json('status')
 def update_order(order_id):
@@ -447,12 +783,17 @@ def update_order(order_id):
         description: Замовлення оновлено
       400:
         description: Не вказано статус
+      404:
+        description: Замовлення не знайдено
+      409:
+        description: Замовлення в архіві (лише для читання)
       500:
         description: Помилка сервера
     """
     try:
         data = request.get_json()
-        update_order_status(order_id, data['status'])
+        if not update_order_status(order_id, data['status']):
+            return order_not_writable(order_id)
         return success_response({'message': 'Order updated successfully'})
     except Exception as e:
         return error_response(str(e), 'ORDER_UPDATE_ERROR', 500)
@@ -473,34 +814,63 @@ def remove_order(order_id):
     responses:
       200:
         description: Замовлення видалено
+      404:
+        description: Замовлення не знайдено
+      409:
+        description: Замовлення в архіві (лише для читання)
       500:
         description: Помилка сервера
     """
     try:
-        delete_order(order_id)
+        if not delete_order(order_id):
+            return order_not_writable(order_id)
         return success_response({'message': 'Order deleted successfully'})
     except Exception as e:
         return error_response(str(e), 'ORDER_DELETE_ERROR', 500)
 
 # Feedback endpoints
 @api_bp.route('/feedback', methods=['GET'])
+@conditional('feedback')
 def get_all_feedback():
     """
     Отримати всі відгуки
     ---
     tags:
       - Feedback
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Розмір сторінки (обмежений MAX_PAGE_SIZE)
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: next_cursor з попередньої сторінки
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Лише ці поля через кому, напр. id,name,message
     responses:
       200:
-        description: Список відгуків
+        description: Сторінка відгуків, новіші першими (next_cursor = null на останній)
+      400:
+        description: Некоректний cursor, limit або fields
       500:
         description: Помилка сервера
     """
     try:
-        conn = get_db_connection()
-        feedback = conn.execute('SELECT * FROM feedback ORDER BY id DESC').fetchall()
-        conn.close()
-        return success_response([dict(f) for f in feedback])
+        fields = fields_arg('feedback')
+    except ValueError as e:
+        return error_response(str(e), 'INVALID_FIELDS', 400)
+    try:
+        position, limit = page_args()
+        feedback = fetch_all_feedback(before_id=cursor_int(position, 'id'), limit=limit + 1, fields=with_keys(fields, 'id'))
+        return page_response(feedback, limit, lambda last: {'id': last['id']}, fields)
+    except ValueError as e:
+        return error_response(str(e), 'INVALID_PAGINATION', 400)
     except Exception as e:
         return error_response(str(e), 'FEEDBACK_RETRIEVAL_ERROR', 500)
 
@@ -535,23 +905,64 @@ def create_feedback():
               default: general
     responses:
       201:
-        description: Відгук створено
+        description: Відгук збережено (черга вимкнена, FEEDBACK_QUEUE=0)
+      202:
+        description: Відгук прийнято в чергу; data.provisional_id - тимчасовий ідентифікатор
+      503:
+        description: Черга відгуків переповнена, повторіть пізніше
       500:
         description: Помилка сервера
     """
     try:
         data = request.get_json()
         feedback_type = data.get('feedback_type', 'general')
+        if feedback_queue.queue_enabled():
+            submission_id = feedback_queue.get_queue().submit(data['name'], data['email'], data['message'], feedback_type)
+            return success_response({
+                'provisional_id': submission_id,
+                'message': 'Feedback accepted'
+            }, status_code=202)
         feedback_id = add_feedback(data['name'], data['email'], data['message'], feedback_type)
         return success_response({
             'feedback_id': feedback_id,
             'message': 'Feedback submitted successfully'
         }, status_code=201)
+    except feedback_queue.QueueFull:
+        return error_response('Feedback queue is full, try again later', 'FEEDBACK_QUEUE_FULL', 503)
     except Exception as e:
         return error_response(f'Error creating feedback: {str(e)}', 'FEEDBACK_CREATION_ERROR', 500)
 
 
+@api_bp.route('/feedback/submissions/<submission_id>', methods=['GET'])
+def get_feedback_submission(submission_id):
+    """
+    Стан відгуку, прийнятого в чергу
+    ---
+    tags:
+      - Feedback
+    parameters:
+      - name: submission_id
+        in: path
+        type: string
+        required: true
+        description: provisional_id з відповіді POST /feedback
+    responses:
+      200:
+        description: Відгук уже записано в БД
+      202:
+        description: Відгук ще в черзі (або ідентифікатор невідомий)
+    """
+    try:
+        feedback = get_feedback_by_submission(submission_id)
+        if feedback is None:
+            return success_response({'provisional_id': submission_id, 'state': 'queued'}, status_code=202)
+        return success_response(dict(feedback))
+    except Exception as e:
+        return error_response(str(e), 'FEEDBACK_RETRIEVAL_ERROR', 500)
+
+
 @api_bp.route('/feedback/type/<feedback_type>', methods=['GET'])
+@conditional('feedback')
 def get_feedback_by_type_endpoint(feedback_type):
     """
     Отримати відгуки за типом (general або developer)
@@ -564,17 +975,43 @@ def get_feedback_by_type_endpoint(feedback_type):
         type: string
         required: true
         enum: [general, developer]
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Розмір сторінки (обмежений MAX_PAGE_SIZE)
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: next_cursor з попередньої сторінки
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Лише ці поля через кому, напр. id,name,message
     responses:
       200:
-        description: Список відгуків
+        description: Сторінка відгуків, новіші першими (next_cursor = null на останній)
+      400:
+        description: Невідомий тип, некоректний cursor, limit або fields
       500:
         description: Помилка сервера
     """
     try:
         if feedback_type not in ('general', 'developer'):
             return error_response('Invalid feedback type', 'INVALID_TYPE', 400)
-        feedback = get_feedback_by_type(feedback_type)
-        return success_response([dict(f) for f in feedback])
+        try:
+            fields = fields_arg('feedback')
+        except ValueError as e:
+            return error_response(str(e), 'INVALID_FIELDS', 400)
+        try:
+            position, limit = page_args()
+            before_id = cursor_int(position, 'id')
+        except ValueError as e:
+            return error_response(str(e), 'INVALID_PAGINATION', 400)
+        feedback = get_feedback_by_type(feedback_type, before_id=before_id, limit=limit + 1, fields=with_keys(fields, 'id'))
+        return page_response(feedback, limit, lambda last: {'id': last['id']}, fields)
     except Exception as e:
         return error_response(str(e), 'FEEDBACK_RETRIEVAL_ERROR', 500)
 
@@ -600,17 +1037,11 @@ def delete_feedback(feedback_id):
         description: Помилка сервера
     """
     try:
-        conn = get_db_connection()
-        feedback = conn.execute('SELECT * FROM feedback WHERE id = ?', (feedback_id,)).fetchone()
-        
+        feedback = get_feedback(feedback_id)
         if not feedback:
-            conn.close()
             return error_response('Feedback not found', 'FEEDBACK_NOT_FOUND', 404)
-            
-        conn.execute('DELETE FROM feedback WHERE id = ?', (feedback_id,))
-        conn.commit()
-        conn.close()
-        
+
+        remove_feedback(feedback_id)
         return success_response({
             'deleted_id': feedback_id,
             'message': 'Feedback deleted successfully'
@@ -618,6 +1049,158 @@ def delete_feedback(feedback_id):
     except Exception as e:
         return error_response(str(e), 'FEEDBACK_DELETE_ERROR', 500)
 
+# ============ Stats endpoints ============
+# Читають лише зведені таблиці (daily_sales, status_counts, product_sales), без сканування замовлень
+
+@api_bp.route('/stats/status', methods=['GET'])
+def stats_by_status():
+    """
+    Кількість замовлень і виручка за статусами
+    ---
+    tags:
+      - Stats
+    responses:
+      200:
+        description: Список {status, orders, revenue}
+    """
+    try:
+        return success_response(Rows(get_order_stats_by_status()))
+    except Exception as e:
+        return error_response(str(e), 'STATS_ERROR', 500)
+
+
+@api_bp.route('/stats/daily', methods=['GET'])
+def stats_by_day():
+    """
+    Кількість замовлень і виручка за днями (від нових до старих)
+    ---
+    tags:
+      - Stats
+    parameters:
+      - name: from
+        in: query
+        type: string
+        required: false
+        description: Перший день (YYYY-MM-DD), за замовчуванням - 30 днів тому
+      - name: to
+        in: query
+        type: string
+        required: false
+        description: Останній день (YYYY-MM-DD) включно
+    responses:
+      200:
+        description: Список {day, orders, revenue}
+      400:
+        description: Некоректна дата
+    """
+    bounds = {}
+    for param in ('from', 'to'):
+        value = request.args.get(param)
+        if value:
+            try:
+                bounds[param] = datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+            except ValueError:
+                return error_response(f'{param} must be a date in YYYY-MM-DD format', 'INVALID_DATE', 400)
+    try:
+        rows = get_order_stats_by_day(since=bounds.get('from'), until=bounds.get('to'))
+        return success_response(Rows(rows))
+    except Exception as e:
+        return error_response(str(e), 'STATS_ERROR', 500)
+
+
+@api_bp.route('/stats/products', methods=['GET'])
+def stats_top_products():
+    """
+    Найпопулярніші товари за кількістю проданих одиниць
+    ---
+    tags:
+      - Stats
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Скільки товарів повернути (10 за замовчуванням, не більше MAX_PAGE_SIZE)
+    responses:
+      200:
+        description: Список {product_id, name, units, orders, revenue}; revenue - за поточною ціною
+      400:
+        description: Некоректний limit
+    """
+    try:
+        _, limit = parse_page_args(request.args, default=10, maximum=current_app.config['MAX_PAGE_SIZE'])
+    except ValueError:
+        return error_response('Invalid limit', 'INVALID_PAGINATION', 400)
+    try:
+        return success_response(Rows(get_top_products(limit)))
+    except Exception as e:
+        return error_response(str(e), 'STATS_ERROR', 500)
+
+
+@api_bp.route('/stats/products/<int:product_id>', methods=['GET'])
+def stats_product(product_id):
+    """
+    Продажі одного товару
+    ---
+    tags:
+      - Stats
+    parameters:
+      - name: product_id
+        in: path
+        type: integer
+        required: true
+    responses:
+      200:
+        description: "{product_id, units, orders}"
+    """
+    try:
+        return success_response(get_product_sales(product_id))
+    except Exception as e:
+        return error_response(str(e), 'STATS_ERROR', 500)
+
+
+# ============ Export endpoints ============
+
+@api_bp.route('/export/<any(orders, feedback, clients):table>.<any(ndjson, csv):fmt>', methods=['GET'])
+def export_table(table, fmt):
+    """
+    Потокове вивантаження всієї таблиці (NDJSON або CSV)
+    ---
+    tags:
+      - Export
+    description: >
+      Рядки читаються порціями (fetchmany) і відправляються клієнту одразу,
+      тому пам'ять сервера не залежить від розміру таблиці.
+    parameters:
+      - name: table
+        in: path
+        type: string
+        required: true
+        enum: ["orders", "feedback", "clients"]
+      - name: fmt
+        in: path
+        type: string
+        required: true
+        enum: ["ndjson", "csv"]
+    responses:
+      200:
+        description: Вміст таблиці, по рядку на запис (CSV - з заголовком)
+    """
+    rows = iter_table_rows(table)
+
+    def stream():
+        try:
+            yield from ENCODERS[fmt](rows)
+        finally:
+            rows.close()
+
+    response = Response(stream(), mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={table}.{fmt}'
+    # Let nginx pass chunks through instead of buffering the whole export
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 # ============ Health check endpoint ============
 
 @api_bp.route('/health', methods=['GET'])
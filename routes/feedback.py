@@ -1,4 +1,5 @@
 from flask import Blueprint, render_template, request, jsonify
+import feedback_queue
 from models import get_db_connection, add_feedback
 
 feedback_bp = Blueprint('feedback', __name__)
@@ -10,6 +11,13 @@ def feedback():
         email = request.form.get('email', '')
         message = request.form.get('message', '')
         
+        if feedback_queue.queue_enabled():
+            try:
+                submission_id = feedback_queue.get_queue().submit(name, email, message, feedback_type='general')
+            except feedback_queue.QueueFull:
+                return jsonify({"status": "error", "message": "Feedback queue is full, try again later"}), 503
+            return jsonify({"status": "accepted", "provisional_id": submission_id}), 202
+
         add_feedback(name, email, message, feedback_type='general')
         
         return jsonify({"status": "success"}), 200
@@ -1,8 +1,13 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from models import get_products, add_order, get_order_details, get_orders_by_email
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, current_app
+from models import get_products, get_product, add_order, get_order_details, get_orders_by_email
+from cart_store import Cart, get_cart_store, new_cart_id
+from pagination import cursor_int, parse_page_args, split_page
 
 shop_bp = Blueprint('shop', __name__)
 
+# Кількість товарів на сторінці магазину (кратна 4 колонкам сітки)
+SHOP_PAGE_SIZE = 24
+
 @shop_bp.route('/shop')
 def shop():
     # Read filter/search parameters from query string
@@ -23,31 +28,81 @@ def shop():
 
     has_image_flag = True if has_image_param in ('1', 'on', 'true', 'yes') else None
 
-    products = get_products(q=q or None, min_price=min_price_val, max_price=max_price_val, has_image=has_image_flag)
-    return render_template('shop.html', products=products, q=q, min_price=min_price, max_price=max_price, has_image=has_image_flag)
+    # Сторінка каталогу: keyset по id, для пошуку (сортування за релевантністю) - offset
+    try:
+        position, limit = parse_page_args(request.args, default=SHOP_PAGE_SIZE,
+                                          maximum=current_app.config['MAX_PAGE_SIZE'])
+        offset = cursor_int(position, 'offset') or 0
+        after_id = cursor_int(position, 'id')
+    except ValueError:
+        offset, after_id, limit = 0, None, SHOP_PAGE_SIZE
+    filters = dict(min_price=min_price_val, max_price=max_price_val, has_image=has_image_flag)
+    if q:
+        rows = get_products(q=q, offset=offset, limit=limit + 1, **filters)
+        products, next_cursor = split_page(rows, limit, lambda last: {'offset': offset + limit})
+    else:
+        rows = get_products(after_id=after_id, limit=limit + 1, **filters)
+        products, next_cursor = split_page(rows, limit, lambda last: {'id': last['id']})
+    return render_template('shop.html', products=products, q=q, min_price=min_price, max_price=max_price, has_image=has_image_flag,
+                           next_cursor=next_cursor, is_first_page=not (offset or after_id))
+
+def _cart_id(create=False):
+    cart_id = session.get('cart_id')
+    if cart_id is None and create:
+        cart_id = session['cart_id'] = new_cart_id()
+    return cart_id
+
+def _priced_lines(cart):
+    """Resolve names and current prices from the catalog; products deleted since are dropped."""
+    lines = {}
+    for product_id, quantity in cart.lines.items():
+        product = get_product(product_id)
+        if product:
+            lines[str(product_id)] = {'id': product_id, 'name': product['name'], 'price': product['price'], 'quantity': quantity}
+    return lines
 
 @shop_bp.route('/add_to_cart/<int:product_id>')
 def add_to_cart(product_id):
-    products = get_products()
-    product = next((p for p in products if p['id'] == product_id), None)
+    product = get_product(product_id)
     if product:
-        cart = session.get('cart', {})
-        if str(product_id) in cart:
-            cart[str(product_id)]['quantity'] += 1
-        else:
-            cart[str(product_id)] = {'id': product_id, 'name': product['name'], 'price': product['price'], 'quantity': 1}
-        session['cart'] = cart
+        get_cart_store().add(_cart_id(create=True), product_id, product['price'])
     return redirect(url_for('shop.shop'))
 
+@shop_bp.route('/cart/update/<int:product_id>', methods=['POST'])
+def update_cart(product_id):
+    cart_id = _cart_id()
+    product = get_product(product_id)
+    if cart_id and product:
+        quantity = request.form.get('quantity', type=int)
+        if quantity is not None:
+            get_cart_store().set_quantity(cart_id, product_id, product['price'], max(quantity, 0))
+    return redirect(url_for('shop.cart'))
+
+@shop_bp.route('/cart/remove/<int:product_id>', methods=['POST'])
+def remove_from_cart(product_id):
+    cart_id = _cart_id()
+    if cart_id:
+        get_cart_store().remove(cart_id, product_id)
+    return redirect(url_for('shop.cart'))
+
 @shop_bp.route('/cart')
 def cart():
-    cart = session.get('cart', {})
-    total = sum(item['price'] * item['quantity'] for item in cart.values())
-    return render_template('cart.html', cart=cart, total=total)
+    cart_id = _cart_id()
+    stored = get_cart_store().get(cart_id) if cart_id else Cart()
+    # Priced like checkout; the prices the lines were added at only point out what changed since
+    lines = _priced_lines(stored)
+    total = round(sum(line['price'] * line['quantity'] for line in lines.values()), 2)
+    added_at = {line['id']: stored.prices[line['id']] for line in lines.values()
+                if stored.prices.get(line['id'], line['price']) != line['price']}
+    unavailable = [product_id for product_id in stored.lines if str(product_id) not in lines]
+    return render_template('cart.html', cart=lines, total=total, added_at=added_at, unavailable=unavailable,
+                           added_total=stored.total)
 
 @shop_bp.route('/checkout', methods=['POST'])
 def checkout():
-    cart = session.get('cart', {})
+    cart_id = _cart_id()
+    # Prices come from the catalog at checkout, never from the cart
+    cart = _priced_lines(get_cart_store().get(cart_id)) if cart_id else {}
     email = request.form['email']
     address = request.form['address']
     phone = request.form.get('phone', '')
@@ -59,7 +114,8 @@ def checkout():
 
     # remember user email in session so they can view order history
     session['user_email'] = email
-    session['cart'] = {}
+    if cart_id:
+        get_cart_store().clear(cart_id)
     flash('Замовлення оформлено успішно.', 'info')
     return redirect(url_for('shop.orders'))
 
@@ -105,14 +161,15 @@ def update_order_contact(order_id):
         return redirect(url_for('shop.orders'))
     # update contact info
     from models import update_order_contact
-    update_order_contact(order_id, address, phone)
-    flash('Контактні дані оновлено', 'info')
+    if update_order_contact(order_id, address, phone):
+        flash('Контактні дані оновлено', 'info')
+    else:
+        flash('Замовлення в архіві, його дані вже не змінюються', 'error')
     return redirect(url_for('shop.order_history_details', order_id=order_id))
 
 
 @shop_bp.route('/product/<int:product_id>')
 def product_detail(product_id):
-    from models import get_product
     product = get_product(product_id)
     if not product:
         flash('Товар не знайдено', 'error')
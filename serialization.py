@@ -0,0 +1,201 @@
+"""JSON encoding for API responses.
+
+``Rows(rows, fields)`` wraps a list of ``sqlite3.Row`` objects (or catalog
+cache dicts) for ``success_response``, which encodes it into the response
+body in one go instead of a second pass through ``jsonify``. Only ``fields``
+are written, in that order (default: every column of the first row), which
+is what ``?fields=`` sparse fieldsets use after narrowing the SELECT.
+
+``init_app`` makes OrjsonProvider the app's JSON provider when orjson is
+installed (JSON_BACKEND=json keeps Flask's stdlib provider). Its output
+differs from the stdlib provider only in leaving non-ASCII characters
+unescaped (the body is UTF-8 either way). With orjson, Rows hands it one
+dict per row: orjson walks dicts in C faster than a per-column template can
+be filled from Python. Without orjson, Rows fills such a template with
+values escaped by the C string encoder, with no dict per row.
+"""
+import math
+import os
+import sqlite3
+from json.encoder import encode_basestring, encode_basestring_ascii
+from operator import itemgetter
+
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # stdlib json only
+    orjson = None
+
+
+def backend():
+    """'orjson' when it is installed and JSON_BACKEND is not 'json', else 'json'."""
+    if orjson is not None and os.environ.get('JSON_BACKEND', 'orjson').lower() != 'json':
+        return 'orjson'
+    return 'json'
+
+
+def init_app(app):
+    if backend() == 'orjson':
+        app.json = OrjsonProvider(app)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask's default JSON provider with orjson doing the encoding and decoding.
+
+    Values orjson does not know natively, and datetimes (HTTP dates, as in
+    Flask), go through the same ``default`` hook; anything orjson refuses
+    (e.g. integers beyond 64 bits) falls back to the stdlib encoder.
+    """
+
+    def _options(self, sort_keys=True):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+        if sort_keys and self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps_bytes(self, obj, sort_keys=True):
+        return orjson.dumps(obj, default=self.default, option=self._options(sort_keys))
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return self.dumps_bytes(obj).decode('utf-8')
+        except TypeError:
+            return super().dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = self.dumps_bytes(obj)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+
+def _float(value):
+    # repr is what json writes for finite floats; NaN / Infinity as json.dumps spells them
+    if math.isfinite(value):
+        return float.__repr__(value)
+    return 'NaN' if value != value else ('Infinity' if value > 0 else '-Infinity')
+
+
+def _scalar_encoders(ensure_ascii):
+    return {
+        str: encode_basestring_ascii if ensure_ascii else encode_basestring,
+        int: int.__repr__,
+        float: _float,
+        bool: lambda value: 'true' if value else 'false',
+        type(None): lambda value: 'null',
+    }
+
+
+_ENCODERS = {True: _scalar_encoders(True), False: _scalar_encoders(False)}
+
+
+class Rows:
+    """Query rows for success_response, encoded as a list of objects with ``fields`` as keys."""
+
+    __slots__ = ('rows', 'fields')
+
+    def __init__(self, rows, fields=None):
+        self.rows = rows
+        if fields:
+            self.fields = tuple(fields)
+        else:
+            self.fields = tuple(rows[0].keys()) if rows else ()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _values(self):
+        """Function from a row to the tuple of its ``fields`` values."""
+        first = self.rows[0]
+        if isinstance(first, sqlite3.Row):
+            columns = first.keys()
+            if tuple(columns) == self.fields:
+                return tuple
+            # Positions: looking a Row up by name scans its column names
+            indexes = [columns.index(field) for field in self.fields]
+        else:
+            indexes = list(self.fields)
+        if len(indexes) == 1:
+            index = indexes[0]
+            return lambda row: (row[index],)
+        return itemgetter(*indexes)
+
+    def to_python(self):
+        """The rows as a list of dicts (what jsonify would have been given)."""
+        if not self.rows:
+            return []
+        values = self._values()
+        if values is tuple:
+            # A Row iterates over its values already in fields order
+            return [dict(zip(self.fields, row)) for row in self.rows]
+        return [dict(zip(self.fields, values(row))) for row in self.rows]
+
+    def encode(self, provider):
+        """JSON array for ``provider``: bytes from orjson, str from the stdlib encoders."""
+        if not self.rows:
+            return b'[]' if isinstance(provider, OrjsonProvider) else '[]'
+        if isinstance(provider, OrjsonProvider):
+            # Keys in fields order, as the stdlib template writes them. A dict
+            # per row: splicing per-value orjson output into a template is slower
+            return provider.dumps_bytes(self.to_python(), sort_keys=False)
+        encoders = _ENCODERS[bool(provider.ensure_ascii)]
+        key = encoders[str]
+        template = '{' + ','.join(key(field).replace('%', '%%') + ':%s' for field in self.fields) + '}'
+
+        def encode_value(value):
+            try:
+                return encoders[type(value)](value)
+            except KeyError:
+                return provider.dumps(value)
+
+        values = self._values()
+        return '[' + ','.join([template % tuple(map(encode_value, values(row))) for row in self.rows]) + ']'
+
+
+def response(envelope, rows):
+    """JSON response for the ``envelope`` dict with ``rows`` (a Rows) as its ``data``."""
+    provider = current_app.json
+    data = rows.encode(provider)
+    if isinstance(provider, OrjsonProvider):
+        head = provider.dumps_bytes(envelope).rstrip()
+        body = head[:-1] + b',"data":' + data + b'}\n'
+    else:
+        if provider.compact is False or (provider.compact is None and current_app.debug):
+            head = provider.dumps(envelope, indent=2)
+        else:
+            head = provider.dumps(envelope, separators=(',', ':'))
+        body = head.rstrip()[:-1] + ',"data":' + data + '}\n'
+    return current_app.response_class(body, mimetype=provider.mimetype)
+
+
+def parse_fields(value, allowed):
+    """Field names from a ``fields`` query value (comma-separated), or None when absent.
+
+    Raises ValueError for names outside ``allowed``; duplicates are dropped.
+    """
+    if not value:
+        return None
+    fields = []
+    for name in value.split(','):
+        name = name.strip()
+        if not name or name in fields:
+            continue
+        if name not in allowed:
+            raise ValueError(f'Unknown field: {name}')
+        fields.append(name)
+    if not fields:
+        raise ValueError('fields must name at least one field')
+    return fields
@@ -0,0 +1,175 @@
+"""Fixtures for the models.py micro-benchmarks (run with ``pytest --benchmarks``).
+
+The benchmark database is generated once per session by benchmarks.datagen
+at --bench-scale. Each timed function runs in BATCHES batches of about
+TARGET_SECONDS / BATCHES (at least MIN_ROUNDS calls each). Machine speed
+differs between runners and drifts during a run on shared CPUs, so every
+batch is preceded by a short fixed calibration workload and its median is
+taken relative to that. The middle batch (by that ratio) is compared with
+the stored baseline for the scale, which keeps both numbers.
+
+The calibration is CPU-only and in memory, so it can't scale I/O-bound
+benchmarks (``bench(..., io_bound=True)``: add_order, dominated by fsync)
+to another machine. With --bench-report-io their slowdowns are only
+reported; every other benchmark still fails past --bench-tolerance.
+
+Benchmarks that write (add_order, archiving) run on a per-test copy of the
+database (``private_bench_db``), so every other benchmark measures the
+dataset as generated whatever the test order or -k selection.
+"""
+import json
+import os
+import sqlite3
+import statistics
+import time
+
+import pytest
+
+import db
+import models
+from benchmarks import datagen
+
+SCALES = {
+    'small': dict(n_products=2000, n_items=20000, n_feedback=2000, n_clients=200),
+    'medium': dict(n_products=100000, n_items=1000000, n_feedback=50000, n_clients=5000),
+    'large': dict(n_products=1000000, n_items=10000000, n_feedback=200000, n_clients=50000),
+}
+TARGET_SECONDS = 0.5
+BATCHES = 5
+MIN_ROUNDS = 3
+MAX_ROUNDS = 500
+
+
+def calibrate(repeat=3):
+    """Best time (µs) of a small fixed Python + SQLite workload."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)')
+        conn.executemany('INSERT INTO t (v) VALUES (?)', ((str(i),) for i in range(5000)))
+        conn.execute("SELECT COUNT(*) FROM t WHERE v LIKE '%7%'").fetchone()
+        conn.close()
+        sorted(str(i) for i in range(20000))
+        samples.append((time.perf_counter() - started) * 1e6)
+    return min(samples)
+
+
+class Bench:
+    def __init__(self, config):
+        self.scale = config.getoption('--bench-scale')
+        self.tolerance = config.getoption('--bench-tolerance')
+        self.save = config.getoption('--bench-save')
+        self.report_io = config.getoption('--bench-report-io')
+        self.path = config.getoption('--bench-baseline')
+        self.baselines = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                self.baselines = json.load(f)
+        self.results = {}
+
+    def baseline(self, name, calibration):
+        """Baseline time of ``name`` scaled to the current calibration, or None."""
+        stored = self.baselines.get(self.scale, {}).get(name)
+        if stored is None:
+            return None
+        return stored['us'] * calibration / stored['calibration_us']
+
+    def run(self, name, fn, io_bound=False):
+        fn()  # warm caches and prepared statements
+        batches, rounds = [], 0
+        for _ in range(BATCHES):
+            calibration = calibrate()
+            samples = []
+            deadline = time.perf_counter() + TARGET_SECONDS / BATCHES
+            while len(samples) < MIN_ROUNDS or (time.perf_counter() < deadline and len(samples) < MAX_ROUNDS):
+                started = time.perf_counter()
+                fn()
+                samples.append((time.perf_counter() - started) * 1e6)
+            batches.append((statistics.median(samples), calibration))
+            rounds += len(samples)
+        median, calibration = sorted(batches, key=lambda batch: batch[0] / batch[1])[BATCHES // 2]
+        expected = self.baseline(name, calibration)
+        gated = not (io_bound and self.report_io)
+        self.results[name] = (median, calibration, expected, rounds, gated)
+        if (expected is not None and not self.save and gated
+                and median > expected * (1 + self.tolerance / 100)):
+            pytest.fail(f'{name}: median {median:.1f} µs, baseline {expected:.1f} µs at this machine speed '
+                        f'(+{median / expected - 1:.0%}, tolerance {self.tolerance:.0f}%)')
+        return median
+
+    def store(self):
+        scale = self.baselines.setdefault(self.scale, {})
+        scale.update({name: {'us': round(median, 1), 'calibration_us': round(calibration, 1)}
+                      for name, (median, calibration, _, _, _) in self.results.items()})
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+
+_bench_key = pytest.StashKey[Bench]()
+
+
+@pytest.fixture(scope='session')
+def bench_recorder(request):
+    recorder = request.config.stash[_bench_key] = Bench(request.config)
+    yield recorder
+    if recorder.save:
+        recorder.store()
+
+
+@pytest.fixture(scope='session')
+def bench_db_path(request, tmp_path_factory):
+    scale = request.config.getoption('--bench-scale')
+    if scale not in SCALES:
+        raise pytest.UsageError(f'--bench-scale must be one of {", ".join(SCALES)}')
+    path = str(tmp_path_factory.mktemp('bench') / f'{scale}.sqlite')
+    datagen.generate(path, days=365, seed=42, **SCALES[scale])
+    return path
+
+
+@pytest.fixture
+def bench(bench_recorder, bench_db_path, monkeypatch):
+    """``bench(name, fn)``: time fn against the benchmark database and check it against the baseline.
+
+    models runs on the production connection path (pooled, configured
+    connections); the in-memory catalog cache is off unless a test turns it on.
+    """
+    monkeypatch.setattr(models, 'get_db_connection', db.get_connection)
+    monkeypatch.setenv('DB_PATH', bench_db_path)
+    monkeypatch.setenv('CATALOG_CACHE', '0')
+    monkeypatch.setenv('SLOW_QUERY_MS', '0')
+    yield bench_recorder.run
+    db.close_all()
+
+
+@pytest.fixture
+def private_bench_db(bench, bench_db_path, tmp_path, monkeypatch):
+    """Point models at a copy of the benchmark database for a test that writes to it."""
+    path = str(tmp_path / os.path.basename(bench_db_path))
+    source, target = sqlite3.connect(bench_db_path), sqlite3.connect(path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    monkeypatch.setenv('DB_PATH', path)
+    return path
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    recorder = config.stash.get(_bench_key, None)
+    if recorder is None or not recorder.results:
+        return
+    terminalreporter.section(f'models.py micro-benchmarks ({recorder.scale})')
+    terminalreporter.write_line(f"{'function':52s} {'median µs':>11s} {'baseline µs':>12s} {'change':>8s} {'rounds':>7s}")
+    for name, (median, _, expected, rounds, gated) in sorted(recorder.results.items()):
+        change = f'{median / expected - 1:+.0%}' if expected else 'new'
+        if not gated:
+            change += '*'
+        base = f'{expected:12.1f}' if expected else f"{'-':>12s}"
+        terminalreporter.write_line(f'{name:52s} {median:11.1f} {base} {change:>8s} {rounds:7d}')
+    if recorder.save:
+        terminalreporter.write_line(f'baselines saved to {recorder.path}')
+    elif recorder.report_io:
+        terminalreporter.write_line('* I/O-bound, reported only (--bench-report-io)')
@@ -0,0 +1,80 @@
+import itertools
+import time
+
+import pytest
+
+import models
+from pagination import DEFAULT_PAGE_SIZE
+
+pytestmark = pytest.mark.benchmark
+
+PAGE = DEFAULT_PAGE_SIZE
+
+PRODUCT_FILTERS = {
+    'all': {},
+    'q': {'q': 'kalo'},
+    'price': {'min_price': 100, 'max_price': 1000},
+    'has_image': {'has_image': True},
+    'q+price': {'q': 'kalo', 'min_price': 100, 'max_price': 1000},
+    'q+has_image': {'q': 'kalo', 'has_image': True},
+    'price+has_image': {'min_price': 100, 'max_price': 1000, 'has_image': True},
+    'q+price+has_image': {'q': 'kalo', 'min_price': 100, 'max_price': 1000, 'has_image': True},
+    'after_id': {'after_id': 1000},
+}
+
+
+class TestModelsBenchmarks:
+    @pytest.mark.parametrize('combination', PRODUCT_FILTERS)
+    def test_get_products(self, bench, combination):
+        bench(f'get_products[{combination}]', lambda: models.get_products(limit=24, **PRODUCT_FILTERS[combination]))
+
+    @pytest.mark.parametrize('combination', ['all', 'price', 'has_image', 'price+has_image', 'after_id'])
+    def test_get_products_cached(self, bench, monkeypatch, combination):
+        monkeypatch.setenv('CATALOG_CACHE', '1')
+        bench(f'get_products[{combination},cached]', lambda: models.get_products(limit=24, **PRODUCT_FILTERS[combination]))
+
+    @pytest.mark.parametrize('items', [1, 10, 100])
+    def test_add_order(self, bench, private_bench_db, items):
+        cart = {str(i): {'id': i, 'price': 10.0, 'quantity': 1} for i in range(1, items + 1)}
+        bench(f'add_order[{items} items]', lambda: models.add_order('bench@example.com', 'Bench street 1', cart), io_bound=True)
+
+    # One page as /orders/search serves it (limit + 1 rows)
+    @pytest.mark.parametrize('email', ['customer12@example.com', 'customer12', 'CUSTOMER1'])
+    def test_get_orders_matching_email(self, bench, email):
+        bench(f'get_orders_matching_email[{email},page]', lambda: models.get_orders_matching_email(email, limit=PAGE + 1))
+
+    @pytest.mark.parametrize('email,match', [('customer12@example.com', 'exact'), ('customer12', 'prefix')])
+    def test_get_orders_matching_email_modes(self, bench, email, match):
+        bench(f'get_orders_matching_email[{email},{match},page]',
+              lambda: models.get_orders_matching_email(email, match=match, limit=PAGE + 1))
+
+    def test_get_orders_matching_email_next_page(self, bench):
+        last = models.get_orders_matching_email('customer12', limit=PAGE)[-1]
+        bench('get_orders_matching_email[customer12,page 2]',
+              lambda: models.get_orders_matching_email('customer12', before=(last['ts'], last['id']), limit=PAGE + 1))
+
+    def test_get_orders_in_range(self, bench):
+        since = int(time.time()) - 30 * 86400
+        bench('get_orders_in_range[1 day,limit 50]', lambda: models.get_orders_in_range(since, since + 86400, limit=50))
+        bench('get_orders_by_email[customer12,30 days]',
+              lambda: models.get_orders_by_email('customer12@example.com', since=since, until=since + 30 * 86400, limit=50))
+
+    def test_get_order_details(self, bench):
+        ids = itertools.cycle(range(1, 2000, 7))
+        bench('get_order_details', lambda: models.get_order_details(next(ids)))
+
+    def test_get_order_details_archived(self, bench, private_bench_db):
+        models.archive_orders_batch(int(time.time()) - 180 * 86400, batch_size=500)
+        conn = models.get_db_connection()
+        archived = [row[0] for row in conn.execute('SELECT order_id FROM archived_orders ORDER BY order_id LIMIT 500')]
+        conn.close()
+        assert archived
+        ids = itertools.cycle(archived)
+        bench('get_order_details[archived]', lambda: models.get_order_details(next(ids)))
+
+    @pytest.mark.parametrize('feedback_type', ['general', 'developer'])
+    def test_get_feedback_by_type(self, bench, feedback_type):
+        bench(f'get_feedback_by_type[{feedback_type}]', lambda: models.get_feedback_by_type(feedback_type, limit=50))
+
+    def test_get_feedback_by_type_deep_page(self, bench):
+        bench('get_feedback_by_type[developer,before_id]', lambda: models.get_feedback_by_type('developer', before_id=100, limit=50))
@@ -0,0 +1,47 @@
+import pytest
+from flask.json.provider import DefaultJSONProvider
+
+import models
+import serialization
+from app import app as flask_app
+from routes.api import success_response
+from serialization import Rows
+
+pytestmark = pytest.mark.benchmark
+
+PAGE = 200
+
+
+@pytest.fixture
+def encode_with(monkeypatch):
+    """Switch the app's JSON provider ('json' or 'orjson') inside a request context."""
+    def switch(name):
+        if name == 'orjson':
+            if serialization.orjson is None:
+                pytest.skip('orjson not installed')
+            monkeypatch.setattr(flask_app, 'json', serialization.OrjsonProvider(flask_app))
+        else:
+            monkeypatch.setattr(flask_app, 'json', DefaultJSONProvider(flask_app))
+    with flask_app.test_request_context():
+        yield switch
+
+
+class TestSerializationBenchmarks:
+    """success_response for one page of rows: dicts through jsonify (the old path) against Rows."""
+
+    @pytest.mark.parametrize('table', ['products', 'orders'])
+    def test_success_response(self, bench, encode_with, table):
+        rows = models.get_products(limit=PAGE) if table == 'products' else models.get_orders(limit=PAGE)
+        encode_with('json')
+        bench(f'success_response[{table},dicts]', lambda: success_response([dict(row) for row in rows]))
+        bench(f'success_response[{table},Rows,json]', lambda: success_response(Rows(rows)))
+        encode_with('orjson')
+        bench(f'success_response[{table},Rows,orjson]', lambda: success_response(Rows(rows)))
+
+    def test_sparse_fieldset(self, bench, encode_with):
+        fields = ['id', 'name', 'price']
+        encode_with('json')
+        bench('products page[fields=id,name,price,json]',
+              lambda: success_response(Rows(models.get_products(limit=PAGE, fields=fields), fields)))
+        bench('products page[all fields,dicts]',
+              lambda: success_response([dict(row) for row in models.get_products(limit=PAGE)]))
@@ -1,16 +1,52 @@
+import os
 import pytest
+import shutil
 import sqlite3
 import sys
+import tempfile
 from pathlib import Path
 
 # Add the project root to sys.path so imports work in CI environments
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+# Importing the app migrates DB_PATH (INIT_DB): point it away from the tracked ./db.sqlite
+# before the import; the use_temp_db fixture sets the per-session database afterwards
+_import_db_dir = tempfile.mkdtemp(prefix='laba-5-tests-')
+os.environ['DB_PATH'] = os.path.join(_import_db_dir, 'import.sqlite')
+os.environ['INIT_DB'] = '0'
+
 import models
 from app import app as flask_app
 
 
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmarks', 'micro-benchmarks of models.py (tests/benchmarks)')
+    group.addoption('--benchmarks', action='store_true', help='run the micro-benchmarks (skipped otherwise)')
+    group.addoption('--bench-scale', default=os.environ.get('BENCH_SCALE', 'small'),
+                    help='data scale for the benchmark database: small, medium or large')
+    group.addoption('--bench-tolerance', type=float, default=float(os.environ.get('BENCH_TOLERANCE', 50)),
+                    help='allowed slowdown against the baseline, in percent')
+    group.addoption('--bench-save', action='store_true', help='store the measured medians as the new baselines')
+    group.addoption('--bench-report-io', action='store_true', default=os.environ.get('BENCH_REPORT_IO') == '1',
+                    help='only report slowdowns of I/O-bound benchmarks (add_order); the rest still fail')
+    group.addoption('--bench-baseline', default=str(project_root / 'tests' / 'benchmarks' / 'baselines.json'),
+                    help='baseline file')
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_import_db_dir, ignore_errors=True)
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--benchmarks'):
+        return
+    skip = pytest.mark.skip(reason='micro-benchmark: run with --benchmarks')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+
 @pytest.fixture(scope='session')
 def tmp_db_path(tmp_path_factory):
     p = tmp_path_factory.mktemp('data') / 'test_db.sqlite'
@@ -21,11 +57,15 @@ def tmp_db_path(tmp_path_factory):
 def use_temp_db(tmp_db_path, monkeypatch):
     """Replace models.get_db_connection to use a temporary sqlite file for tests."""
     def get_db_connection():
-        conn = sqlite3.connect(tmp_db_path, timeout=30.0, isolation_level='DEFERRED')
+        conn = sqlite3.connect(tmp_db_path, timeout=30.0, isolation_level='DEFERRED', uri=True)
         conn.row_factory = sqlite3.Row
         return conn
 
     monkeypatch.setattr(models, 'get_db_connection', get_db_connection)
+    # Keep DB_PATH in step so per-database state (e.g. the catalog cache) matches the temp file
+    monkeypatch.setenv('DB_PATH', tmp_db_path)
+    # Feedback is written synchronously unless a test turns the write-behind queue on
+    monkeypatch.setenv('FEEDBACK_QUEUE', '0')
     # Re-init DB for each test session
     models.init_db()
     yield
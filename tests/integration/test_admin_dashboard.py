@@ -0,0 +1,77 @@
+import pytest
+
+import dashboard
+import models
+
+
+@pytest.fixture
+def admin_client(client):
+    with client.session_transaction() as sess:
+        sess['admin_logged_in'] = True
+    dashboard.invalidate()
+    yield client
+    dashboard.invalidate()
+
+
+class TestAdminDashboard:
+    def test_dashboard_shows_aggregates(self, admin_client):
+        models.add_product('DashProd', 7.0, '')
+        pid = models.get_products(q='DashProd')[0]['id']
+        models.add_order('dash@example.com', 'A', {str(pid): {'id': pid, 'price': 7.0, 'quantity': 500}}, '')
+        r = admin_client.get('/admin')
+        assert r.status_code == 200
+        page = r.get_data(as_text=True)
+        assert 'Замовлення за статусом' in page
+        assert 'DashProd' in page  # 500 units puts it in the top products
+        # tables are not rendered into the page, only loaded per section
+        assert 'dash@example.com' not in page
+
+    def test_stats_match_sql(self, admin_client):
+        stats = dashboard.get_stats()
+        conn = models.get_db_connection()
+        count, revenue = conn.execute('SELECT COUNT(*), ROUND(COALESCE(SUM(total_price), 0), 2) FROM orders').fetchone()
+        conn.close()
+        assert stats['orders_total'] == count
+        assert stats['revenue_total'] == revenue
+
+    def test_stats_are_cached_for_ttl(self, admin_client, monkeypatch):
+        monkeypatch.setenv('DASHBOARD_CACHE_TTL', '60')
+        before = dashboard.get_stats()['orders_total']
+        models.add_order('ttl@example.com', 'A', {}, '')
+        assert dashboard.get_stats()['orders_total'] == before
+        monkeypatch.setenv('DASHBOARD_CACHE_TTL', '0')
+        dashboard.invalidate()
+        assert dashboard.get_stats()['orders_total'] == before + 1
+
+    def test_admin_change_shows_up_immediately(self, admin_client, monkeypatch):
+        monkeypatch.setenv('DASHBOARD_CACHE_TTL', '60')
+        order_id = models.add_order('fresh@example.com', 'A', {}, '')
+        dashboard.get_stats()
+        admin_client.post(f'/admin/update_order_status/{order_id}', data={'status': 'Fresh status'})
+        assert 'Fresh status' in {row['status'] for row in dashboard.get_stats()['by_status']}
+        admin_client.post(f'/admin/delete_order/{order_id}')
+        assert 'Fresh status' not in {row['status'] for row in dashboard.get_stats()['by_status']}
+
+    def test_sections_are_paginated(self, admin_client):
+        for i in range(3):
+            models.add_client(f'Section client {i}', f'sc{i}@example.com', '', '')
+        seen = []
+        url = '/admin/section/clients?limit=2'
+        while url:
+            body = admin_client.get(url).get_json()
+            seen.append(body['html'].count('client-update-btn'))
+            url = f"/admin/section/clients?limit=2&cursor={body['next_cursor']}" if body['next_cursor'] else None
+        assert all(n <= 2 for n in seen)
+        assert sum(seen) == len(models.get_clients())
+
+    @pytest.mark.parametrize('section', ['products', 'orders', 'developer_feedback', 'general_feedback'])
+    def test_every_section_renders(self, admin_client, section):
+        r = admin_client.get(f'/admin/section/{section}')
+        assert r.status_code == 200
+        assert 'html' in r.get_json()
+
+    def test_sections_require_login(self, client):
+        assert client.get('/admin/section/orders').status_code == 302
+
+    def test_bad_cursor_is_400(self, admin_client):
+        assert admin_client.get('/admin/section/orders?cursor=!!!').status_code == 400
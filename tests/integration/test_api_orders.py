@@ -15,6 +15,13 @@ class TestAPIOrders:
         data = r.get_json()
         assert len(data['data']) >= 1
 
+    def test_search_orders_match_modes_api(self, client):
+        client.post('/api/v1/orders', json={'email': 'Modes@Example.com', 'address': 'X', 'cart': {}})
+        assert len(client.get('/api/v1/orders/search?email=modes@example.com&match=exact').get_json()['data']) == 1
+        assert len(client.get('/api/v1/orders/search?email=MODES&match=prefix').get_json()['data']) == 1
+        assert client.get('/api/v1/orders/search?email=odes@example.com&match=exact').get_json()['data'] == []
+        assert client.get('/api/v1/orders/search?email=x&match=regex').status_code == 400
+
     def test_get_order_details_api(self, client):
         # create product and order with items
         client.post('/api/v1/products', json={'name': 'OIProd', 'price': 2.5})
@@ -29,3 +36,52 @@ class TestAPIOrders:
         oid = items[0]['id']
         detail = client.get(f'/api/v1/orders/{oid}')
         assert detail.status_code == 200
+
+    def test_create_orders_batch_api(self, client):
+        orders = [{'email': 'batch@example.com', 'address': str(i), 'idempotency_key': f'api-batch-{i}'} for i in range(3)]
+        orders.append({'address': 'no email'})
+        r = client.post('/api/v1/orders/batch', json={'orders': orders})
+        assert r.status_code == 200
+        data = r.get_json()['data']
+        assert (data['created'], data['duplicate'], data['invalid']) == (3, 0, 1)
+
+        retry = client.post('/api/v1/orders/batch', json={'orders': orders}).get_json()['data']
+        assert (retry['created'], retry['duplicate']) == (0, 3)
+        assert [r['order_id'] for r in retry['results'][:3]] == [r['order_id'] for r in data['results'][:3]]
+
+    def test_create_orders_batch_rejects_bad_payload(self, client):
+        assert client.post('/api/v1/orders/batch', json={'orders': {}}).status_code == 400
+        client.application.config['ORDER_BATCH_MAX'] = 2
+        try:
+            r = client.post('/api/v1/orders/batch', json={'orders': [{}, {}, {}]})
+            assert r.status_code == 400
+            assert r.get_json()['code'] == 'BATCH_TOO_LARGE'
+        finally:
+            client.application.config['ORDER_BATCH_MAX'] = 1000
+
+    def test_orders_include_items_api(self, client):
+        client.post('/api/v1/products', json={'name': 'IncProd', 'price': 4.0})
+        pid = client.get('/api/v1/products?q=IncProd').get_json()['data'][0]['id']
+        cart = {str(pid): {'id': pid, 'price': 4.0, 'quantity': 3}}
+        oid = client.post('/api/v1/orders', json={'email': 'inc@example.com', 'address': 'Z', 'cart': cart}).get_json()['data']['order_id']
+
+        r = client.get('/api/v1/orders?email=inc@example.com&include=items')
+        [order] = r.get_json()['data']
+        assert order['items'] == [{'product_id': pid, 'quantity': 3, 'name': 'IncProd', 'price': 4.0}]
+        assert 'items' not in client.get('/api/v1/orders?email=inc@example.com').get_json()['data'][0]
+
+        r = client.get(f'/api/v1/orders/details?ids={oid},999999999')
+        body = r.get_json()
+        assert [o['id'] for o in body['data']] == [oid]
+        assert body['data'][0]['items'][0]['name'] == 'IncProd'
+        assert body['missing'] == [999999999]
+
+    def test_write_to_unknown_order_is_404(self, client):
+        r = client.put('/api/v1/orders/999999', json={'status': 'Нове'})
+        assert r.status_code == 404 and r.get_json()['code'] == 'ORDER_NOT_FOUND'
+        r = client.delete('/api/v1/orders/999999')
+        assert r.status_code == 404 and r.get_json()['code'] == 'ORDER_NOT_FOUND'
+
+    def test_orders_details_rejects_bad_ids(self, client):
+        assert client.get('/api/v1/orders/details').status_code == 400
+        assert client.get('/api/v1/orders/details?ids=1,x').status_code == 400
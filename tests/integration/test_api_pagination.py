@@ -0,0 +1,132 @@
+import models
+from pagination import MAX_PAGE_SIZE, encode_cursor
+
+
+class TestAPIPagination:
+    def collect(self, client, url):
+        """Follow next_cursor from ``url`` (which already has a query string) to the last page."""
+        items, pages, cursor = [], 0, None
+        while True:
+            body = client.get(f'{url}&cursor={cursor}' if cursor else url).get_json()
+            items.extend(body['data'])
+            pages += 1
+            cursor = body['next_cursor']
+            if not cursor:
+                return items, pages
+
+    def test_products_keyset_pages_cover_everything_once(self, client):
+        for i in range(7):
+            client.post('/api/v1/products', json={'name': f'Paged {i}', 'price': 1.0})
+        all_ids = [p['id'] for p in client.get(f'/api/v1/products?limit={MAX_PAGE_SIZE}').get_json()['data']]
+        items, pages = self.collect(client, '/api/v1/products?limit=3')
+        ids = [p['id'] for p in items]
+        assert ids == sorted(ids)
+        assert len(ids) == len(set(ids))
+        assert set(all_ids) <= set(ids)
+        assert pages > 1
+
+    def test_search_results_page_by_offset(self, client):
+        for i in range(5):
+            client.post('/api/v1/products', json={'name': f'Pagesearch {i}', 'price': 1.0})
+        items, pages = self.collect(client, '/api/v1/products?q=Pagesearch&limit=2')
+        assert sorted(p['name'] for p in items) == [f'Pagesearch {i}' for i in range(5)]
+        assert pages == 3
+
+    def test_limit_is_clamped(self, client):
+        body = client.get('/api/v1/products?limit=100000').get_json()
+        assert body['limit'] == MAX_PAGE_SIZE
+        assert len(body['data']) <= MAX_PAGE_SIZE
+
+    def test_invalid_cursor_is_rejected(self, client):
+        r = client.get('/api/v1/products?cursor=not-a-cursor')
+        assert r.status_code == 400
+        assert r.get_json()['code'] == 'INVALID_PAGINATION'
+
+    def test_order_cursor_without_ts_is_rejected(self, client):
+        cursor = encode_cursor({'id': 5})
+        for query in ('email=pager@example.com', 'from=2024-01-01'):
+            r = client.get(f'/api/v1/orders?{query}&cursor={cursor}')
+            assert r.status_code == 400
+            assert r.get_json()['code'] == 'INVALID_PAGINATION'
+
+    def test_out_of_range_order_cursor_is_rejected(self, client):
+        for position in ({'id': 2 ** 63}, {'id': 5, 'date': '0001-01-01 00:00:00'}):
+            r = client.get(f"/api/v1/orders?email=pager@example.com&cursor={encode_cursor(position)}")
+            assert r.status_code == 400
+            assert r.get_json()['code'] == 'INVALID_PAGINATION'
+
+    def test_order_list_bug_is_not_blamed_on_the_cursor(self, client, monkeypatch):
+        def broken(**kwargs):
+            raise KeyError('id')
+
+        monkeypatch.setattr('routes.api.get_orders', broken)
+        r = client.get('/api/v1/orders')
+        assert r.status_code == 500
+        assert r.get_json()['code'] == 'ORDER_RETRIEVAL_ERROR'
+
+    def test_orders_by_email_newest_first(self, client):
+        for i in range(5):
+            client.post('/api/v1/orders', json={'email': 'pager@example.com', 'address': str(i), 'cart': {}})
+        items, pages = self.collect(client, '/api/v1/orders?email=pager@example.com&limit=2')
+        assert [o['address'] for o in items] == ['4', '3', '2', '1', '0']
+        assert pages == 3
+
+    def test_orders_in_date_range(self, client):
+        dates = ['2003-02-01 09:00:00', '2003-02-01 23:59:59', '2003-02-02 00:00:00', '2003-01-31 23:59:59', '2003-02-01 12:00:00']
+        ids = [client.post('/api/v1/orders', json={'email': f'range{i % 2}@example.com', 'address': str(i), 'cart': {}})
+               .get_json()['data']['order_id'] for i in range(len(dates))]
+        conn = models.get_db_connection()
+        # ts follows date through the orders_ts_au trigger
+        conn.executemany('UPDATE orders SET date = ? WHERE id = ?', zip(dates, ids))
+        conn.commit()
+        conn.close()
+        models.rebuild_sales_stats()
+
+        items, pages = self.collect(client, '/api/v1/orders?from=2003-02-01&to=2003-02-01&limit=2')
+        assert [o['id'] for o in items] == [ids[0], ids[4], ids[1]]
+        assert items[0]['date'] == '2003-02-01 09:00:00'
+        assert pages == 2
+        items, _ = self.collect(client, '/api/v1/orders?from=2003-02-01T12:00:00&to=2003-02-02 00:00:00&limit=2')
+        assert [o['id'] for o in items] == [ids[4], ids[1], ids[2]]
+        items, _ = self.collect(client, '/api/v1/orders?email=range0@example.com&from=2003-01-01&to=2003-02-01&limit=1')
+        assert [o['id'] for o in items] == [ids[4], ids[0]]
+        assert client.get('/api/v1/orders?from=yesterday').status_code == 400
+        assert client.get('/api/v1/orders?from=2003-02-02&to=2003-02-01').status_code == 400
+
+    def test_feedback_pages_newest_first(self, client):
+        for i in range(3):
+            client.post('/api/v1/feedback', json={'name': 'P', 'email': 'p@example.com', 'message': f'm{i}'})
+        items, _ = self.collect(client, '/api/v1/feedback?limit=2')
+        ids = [f['id'] for f in items]
+        assert ids == sorted(ids, reverse=True)
+
+    def test_feedback_by_type_pages(self, client):
+        for i in range(5):
+            client.post('/api/v1/feedback', json={'name': 'T', 'email': 't@example.com', 'message': f'd{i}',
+                                                  'feedback_type': 'developer'})
+        items, pages = self.collect(client, '/api/v1/feedback/type/developer?limit=2&fields=message')
+        assert [f['message'] for f in items][:5] == ['d4', 'd3', 'd2', 'd1', 'd0']
+        assert all(list(f) == ['message'] for f in items)
+        assert pages >= 3
+        assert client.get('/api/v1/feedback/type/developer?limit=0').status_code == 400
+
+    def test_order_search_pages(self, client):
+        # Several addresses, all in the same second: the merge and the cursor break ties by id
+        ids = [client.post('/api/v1/orders', json={'email': f'Searchpage{i % 3}@example.com', 'address': str(i), 'cart': {}})
+               .get_json()['data']['order_id'] for i in range(7)]
+        for match in ('contains', 'prefix'):
+            items, pages = self.collect(client, f'/api/v1/orders/search?email=searchpage&match={match}&limit=3')
+            assert [o['id'] for o in items] == ids[::-1]
+            assert pages == 3
+        items, _ = self.collect(client, '/api/v1/orders/search?email=searchpage1@example.com&match=exact&limit=1')
+        assert [o['id'] for o in items] == [ids[4], ids[1]]
+        body = client.get(f'/api/v1/orders/search?email=searchpage&limit={MAX_PAGE_SIZE * 10}').get_json()
+        assert body['limit'] == MAX_PAGE_SIZE
+        r = client.get(f"/api/v1/orders/search?email=searchpage&cursor={encode_cursor({'id': 5})}")
+        assert r.status_code == 400
+
+    def test_shop_page_links_to_next_page(self, client):
+        for i in range(30):
+            client.post('/api/v1/products', json={'name': f'Shop page {i}', 'price': 1.0})
+        html = client.get('/shop').get_data(as_text=True)
+        assert 'cursor=' in html
@@ -0,0 +1,31 @@
+from datetime import datetime
+
+import models
+
+
+class TestAPIStats:
+    def test_stats_status_and_daily(self, client):
+        models.add_order('apistats@example.com', 'A', {}, '')
+        status = client.get('/api/v1/stats/status').get_json()['data']
+        assert 'Нове' in [row['status'] for row in status]
+
+        today = datetime.now().strftime('%Y-%m-%d')
+        daily = client.get(f'/api/v1/stats/daily?from={today}&to={today}').get_json()['data']
+        assert [row['day'] for row in daily] == [today]
+        assert daily[0]['orders'] >= 1
+
+    def test_stats_products(self, client):
+        models.add_product('ApiStatsProd', 1.0, '')
+        pid = models.get_products(q='ApiStatsProd')[0]['id']
+        models.add_order('apistats@example.com', 'A', {str(pid): {'id': pid, 'price': 1.0, 'quantity': 10000}}, '')
+        top = client.get('/api/v1/stats/products?limit=1').get_json()['data']
+        assert top[0]['product_id'] == pid
+        assert top[0]['units'] == 10000
+        one = client.get(f'/api/v1/stats/products/{pid}').get_json()['data']
+        assert one == {'product_id': pid, 'units': 10000, 'orders': 1}
+        assert client.get('/api/v1/stats/products/999999999').get_json()['data']['units'] == 0
+
+    def test_stats_daily_rejects_bad_date(self, client):
+        r = client.get('/api/v1/stats/daily?from=yesterday')
+        assert r.status_code == 400
+        assert r.get_json()['code'] == 'INVALID_DATE'
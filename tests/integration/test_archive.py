@@ -0,0 +1,117 @@
+import os
+import sqlite3
+
+import pytest
+
+import archive
+import models
+
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('ARCHIVE_DIR', str(tmp_path / 'archive'))
+    return tmp_path / 'archive'
+
+
+def summaries():
+    conn = models.get_db_connection()
+    result = {table: conn.execute(f'SELECT * FROM {table} ORDER BY 1').fetchall()
+              for table in ('daily_sales', 'status_counts', 'product_sales')}
+    conn.close()
+    return {table: [tuple(row) for row in rows] for table, rows in result.items()}
+
+
+def place_orders(specs):
+    """Orders for ``(date, status)`` pairs, each with one item; returns their ids."""
+    models.add_product('Archive product', 4.0, '')
+    product = models.get_products(q='Archive product')[0]
+    cart = {str(product['id']): {'id': product['id'], 'price': 4.0, 'quantity': 2}}
+    ids = [models.add_order('archive@example.com', 'Addr', cart) for _ in specs]
+    conn = models.get_db_connection()
+    conn.executemany('UPDATE orders SET date = ?, status = ? WHERE id = ?', [(date, status, oid) for (date, status), oid in zip(specs, ids)])
+    conn.commit()
+    conn.close()
+    models.rebuild_sales_stats()
+    return ids
+
+
+class TestOrderArchive:
+    def test_closed_old_orders_move_to_quarter_files(self, archive_dir, client):
+        ids = place_orders([('2001-02-10 10:00:00', 'Доставлено'), ('2001-05-01 09:00:00', 'Скасовано'),
+                            ('2001-02-11 10:00:00', 'Нове'), ('2001-03-31 23:00:00', 'Доставлено')])
+        before = summaries()
+
+        assert models.archive_old_orders(older_than_days=30, batch_size=2, pause=0) == 3
+
+        assert sorted(os.listdir(archive_dir)) == ['orders-2001Q1.sqlite', 'orders-2001Q2.sqlite']
+        conn = models.get_db_connection()
+        hot = {row[0] for row in conn.execute('SELECT id FROM orders WHERE id IN (?, ?, ?, ?)', ids)}
+        conn.close()
+        assert hot == {ids[2]}
+        # Hot orders = all the summaries count minus the archived ones
+        conn = models.get_db_connection()
+        periods = dict(tuple(row) for row in conn.execute("SELECT period, orders FROM archive_periods WHERE period LIKE '2001%'"))
+        assert periods == {'2001Q1': 2, '2001Q2': 1}
+        estimated, counted = conn.execute('SELECT (SELECT SUM(orders) FROM status_counts) - (SELECT SUM(orders) FROM archive_periods), '
+                                          '(SELECT COUNT(*) FROM orders)').fetchone()
+        conn.close()
+        assert estimated == counted
+        # Archival is not a deletion: the summaries still count the moved orders, also after a rebuild
+        assert summaries() == before
+        models.rebuild_sales_stats()
+        assert summaries() == before
+
+        order, items = models.get_order_details(ids[1])
+        assert order['status'] == 'Скасовано' and order['date'] == '2001-05-01 09:00:00'
+        assert [(item['name'], item['quantity']) for item in items] == [('Archive product', 2)]
+        r = client.get(f'/api/v1/orders/{ids[0]}')
+        assert r.status_code == 200
+        assert r.get_json()['data']['items'][0]['quantity'] == 2
+        assert models.get_order_details(ids[2])[0]['status'] == 'Нове'
+
+    def test_archive_is_attached_read_only(self, archive_dir):
+        ids = place_orders([('2002-01-05 10:00:00', 'Доставлено')])
+        models.archive_old_orders(older_than_days=30, pause=0)
+        conn = models.get_db_connection()
+        schema = archive.attach(conn, '2002Q1')
+        # The URI was opened as a URI, not as a file literally named 'file:...?mode=ro'
+        files = {row[1]: row[2] for row in conn.execute('PRAGMA database_list')}
+        assert os.path.samefile(files[schema], archive.archive_path('2002Q1'))
+        with pytest.raises(sqlite3.OperationalError, match='readonly'):
+            conn.execute(f'DELETE FROM {schema}.orders WHERE id = ?', (ids[0],))
+        conn.close()
+
+    def test_order_changed_during_copy_stays_hot(self, archive_dir, monkeypatch):
+        ids = place_orders([('2003-07-01 10:00:00', 'Доставлено'), ('2003-07-02 10:00:00', 'Доставлено')])
+        store = archive.store
+
+        def store_then_edit(period, columns, orders, items):
+            store(period, columns, orders, items)
+            conn = models.get_db_connection()
+            conn.execute('UPDATE orders SET address = ? WHERE id = ?', ('Changed', ids[0]))
+            conn.commit()
+            conn.close()
+
+        monkeypatch.setattr(archive, 'store', store_then_edit)
+        assert models.archive_orders_batch(before_ts=10 ** 10, batch_size=1000) >= 1
+        monkeypatch.setattr(archive, 'store', store)
+
+        order, _ = models.get_order_details(ids[0])
+        assert order['address'] == 'Changed'
+        conn = sqlite3.connect(str(archive_dir / 'orders-2003Q3.sqlite'))
+        archived = {row[0] for row in conn.execute('SELECT id FROM orders')}
+        conn.close()
+        assert ids[0] not in archived and ids[1] in archived
+
+    def test_archived_orders_are_read_only(self, archive_dir, client):
+        ids = place_orders([('2004-01-05 10:00:00', 'Доставлено')])
+        models.archive_old_orders(older_than_days=30, pause=0)
+
+        r = client.put(f'/api/v1/orders/{ids[0]}', json={'status': 'Нове'})
+        assert r.status_code == 409 and r.get_json()['code'] == 'ORDER_ARCHIVED'
+        r = client.delete(f'/api/v1/orders/{ids[0]}')
+        assert r.status_code == 409 and r.get_json()['code'] == 'ORDER_ARCHIVED'
+        assert not models.update_order_contact(ids[0], 'New', '')
+        assert models.get_order_details(ids[0])[0]['status'] == 'Доставлено'
+        # Lists read the hot database only
+        assert ids[0] not in [order['id'] for order in models.get_orders_by_email('archive@example.com')]
@@ -0,0 +1,38 @@
+import pytest
+
+import db
+import models
+from benchmarks.bench_concurrency import run_mixed_workload
+
+
+@pytest.fixture
+def pooled_db(tmp_path, monkeypatch):
+    """Use the real pooled connections (WAL profile) instead of the test override."""
+    monkeypatch.setenv('DB_PATH', str(tmp_path / 'concurrency.sqlite'))
+    monkeypatch.setenv('DB_PROFILE', 'wal')
+    monkeypatch.setattr(models, 'get_db_connection', db.get_connection)
+    yield
+    db.close_all()
+
+
+class TestConcurrency:
+    def test_wal_profile_enabled(self, pooled_db):
+        conn = models.get_db_connection()
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+        conn.close()
+
+    def test_writers_and_readers_without_lock_errors(self, pooled_db):
+        result = run_mixed_workload(writers=4, readers=4, ops=25)
+        assert result['lock_errors'] == 0
+        assert result['other_errors'] == 0
+        assert result['writes'] == 4 * 25
+        assert result['reads'] == 4 * 25
+
+    def test_write_transaction_rolls_back_on_error(self, pooled_db):
+        models.init_db()
+        with pytest.raises(RuntimeError):
+            with models.write_transaction() as conn:
+                conn.execute("INSERT INTO clients (name) VALUES ('Rolled back')")
+                raise RuntimeError('boom')
+        assert not any(c['name'] == 'Rolled back' for c in models.get_clients())
@@ -1,5 +1,7 @@
 import sqlite3
+from datetime import datetime
 
+import migrations
 import models
 
 
@@ -11,3 +13,47 @@ class TestDatabase:
         tables = [r[0] for r in curs.fetchall()]
         conn.close()
         assert 'orders' in tables and 'products' in tables and 'feedback' in tables
+
+    def test_migrations_are_recorded(self):
+        conn = models.get_db_connection()
+        version = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()[0]
+        indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+        conn.close()
+        assert version == migrations.LATEST_VERSION
+        assert {'idx_orders_email_norm_ts', 'idx_orders_ts', 'idx_order_items_order', 'idx_feedback_type', 'idx_products_price'} <= indexes
+
+    def test_init_db_is_noop_when_current(self):
+        assert models.init_db() == []
+
+    def test_legacy_database_is_upgraded(self, tmp_path):
+        # Schema as created by versions before the description/phone/has_courses columns
+        conn = sqlite3.connect(str(tmp_path / 'legacy.sqlite'))
+        conn.execute('CREATE TABLE products (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, price REAL, image TEXT)')
+        conn.execute("INSERT INTO products (name, price, image) VALUES ('Old', 1.0, '')")
+        conn.execute('CREATE TABLE orders (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT, address TEXT, total_price REAL, status TEXT, date TEXT)')
+        conn.commit()
+
+        applied = migrations.migrate(conn)
+
+        conn = sqlite3.connect(str(tmp_path / 'legacy.sqlite'))
+        product_columns = {r[1] for r in conn.execute('PRAGMA table_info(products)')}
+        order_columns = {r[1] for r in conn.execute('PRAGMA table_info(orders)')}
+        count = conn.execute('SELECT COUNT(*) FROM products').fetchone()[0]
+        conn.close()
+        assert applied == [number for number, _, _ in migrations.MIGRATIONS]
+        assert 'description' in product_columns and 'phone' in order_columns
+        assert count == 1
+
+    def test_order_timestamps_backfilled(self, tmp_path):
+        conn = sqlite3.connect(str(tmp_path / 'dates.sqlite'))
+        conn.execute('CREATE TABLE orders (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT, address TEXT, total_price REAL, status TEXT, date TEXT)')
+        conn.execute("INSERT INTO orders (email, date) VALUES ('old@example.com', '2020-05-01 10:30:00')")
+        conn.commit()
+
+        migrations.migrate(conn)
+
+        conn = sqlite3.connect(str(tmp_path / 'dates.sqlite'))
+        ts = conn.execute('SELECT ts FROM orders').fetchone()[0]
+        conn.close()
+        # orders.date is server local time
+        assert ts == int(datetime(2020, 5, 1, 10, 30).timestamp())
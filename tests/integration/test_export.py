@@ -0,0 +1,75 @@
+import csv
+import io
+import json
+import os
+
+import pytest
+
+import db
+import migrations
+import models
+
+
+def private_rss_bytes():
+    """Resident memory minus file-backed pages (the SQLite mmap of the database counts as resident too)."""
+    with open('/proc/self/statm') as f:
+        _, resident, shared = (int(value) for value in f.read().split()[:3])
+    return (resident - shared) * os.sysconf('SC_PAGE_SIZE')
+
+
+class TestExport:
+    def test_orders_ndjson(self, client):
+        oid = models.add_order('export@example.com', 'Вулиця 1', {}, '123')
+        r = client.get('/api/v1/export/orders.ndjson')
+        assert r.status_code == 200
+        assert r.mimetype == 'application/x-ndjson'
+        assert 'attachment; filename=orders.ndjson' == r.headers['Content-Disposition']
+        rows = [json.loads(line) for line in r.get_data(as_text=True).splitlines()]
+        exported = {row['id']: row for row in rows}
+        assert exported[oid]['address'] == 'Вулиця 1'
+        assert [row['id'] for row in rows] == sorted(exported)
+
+    def test_clients_csv(self, client):
+        models.add_client('Export, Client', 'ec@example.com', '1', 'Addr')
+        r = client.get('/api/v1/export/clients.csv')
+        assert r.mimetype == 'text/csv'
+        rows = list(csv.reader(io.StringIO(r.get_data(as_text=True))))
+        assert rows[0][:2] == ['id', 'name']
+        assert ['Export, Client', 'ec@example.com'] in [row[1:3] for row in rows[1:]]
+
+    def test_empty_table_csv_has_header(self, client, tmp_path, monkeypatch):
+        monkeypatch.setenv('DB_PATH', str(tmp_path / 'empty.sqlite'))
+        migrations.migrate(db.connect())
+        r = client.get('/api/v1/export/feedback.csv')
+        assert r.get_data(as_text=True).startswith('id,')
+        assert len(r.get_data(as_text=True).splitlines()) == 1
+
+    def test_unknown_export_is_404(self, client):
+        assert client.get('/api/v1/export/products.csv').status_code == 404
+        assert client.get('/api/v1/export/orders.xml').status_code == 404
+
+    @pytest.mark.skipif(not os.path.exists('/proc/self/statm'), reason='needs /proc to read RSS')
+    def test_million_rows_constant_memory(self, client, tmp_path, monkeypatch):
+        """1M feedback rows (~130 MB of NDJSON) stream while RSS grows by far less than the export size."""
+        monkeypatch.setenv('DB_PATH', str(tmp_path / 'big.sqlite'))
+        migrations.migrate(db.connect())
+        conn = db.connect()
+        conn.execute("""WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 1000000)
+            INSERT INTO feedback (name, email, message, feedback_type)
+            SELECT 'user ' || i, 'user' || i || '@example.com', printf('%.60c', 'x'), 'general' FROM n""")
+        conn.commit()
+        conn.close()
+
+        r = client.get('/api/v1/export/feedback.ndjson', buffered=False)
+        baseline = private_rss_bytes()
+        peak = baseline
+        size = lines = 0
+        for chunk in r.response:
+            size += len(chunk)
+            lines += chunk.count(b'\n')
+            peak = max(peak, private_rss_bytes())
+        r.close()
+
+        assert lines == 1000000
+        assert size > 100 * 1024 * 1024
+        assert peak - baseline < 30 * 1024 * 1024
@@ -0,0 +1,76 @@
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import models
+
+
+def settle(table, seconds=10):
+    """Move ``table``'s last change ``seconds`` into the past."""
+    conn = models.get_db_connection()
+    conn.execute('UPDATE change_counters SET changed_at = ? WHERE table_name = ?', (int(time.time()) - seconds, table))
+    conn.commit()
+    conn.close()
+
+
+class TestHTTPCache:
+    def test_products_carry_validators(self, client):
+        settle('products')
+        r = client.get('/api/v1/products')
+        assert r.status_code == 200
+        assert r.headers['ETag'].startswith('"')
+        assert 'public' in r.headers['Cache-Control'] and 'max-age' in r.headers['Cache-Control']
+        assert 'Last-Modified' in r.headers
+
+    def test_matching_etag_returns_304(self, client):
+        etag = client.get('/api/v1/products').headers['ETag']
+        r = client.get('/api/v1/products', headers={'If-None-Match': etag})
+        assert r.status_code == 304
+        assert r.data == b''
+        assert r.headers['ETag'] == etag
+
+    def test_weak_etag_from_proxy_returns_304(self, client):
+        etag = client.get('/api/v1/products').headers['ETag']
+        r = client.get('/api/v1/products', headers={'If-None-Match': f'W/{etag}'})
+        assert r.status_code == 304
+
+    def test_etag_changes_after_write(self, client):
+        etag = client.get('/api/v1/products').headers['ETag']
+        client.post('/api/v1/products', json={'name': 'Etag bump', 'price': 1.0})
+        r = client.get('/api/v1/products', headers={'If-None-Match': etag})
+        assert r.status_code == 200
+        assert r.headers['ETag'] != etag
+
+    def test_etag_depends_on_query(self, client):
+        a = client.get('/api/v1/products?limit=1').headers['ETag']
+        b = client.get('/api/v1/products?limit=2').headers['ETag']
+        assert a != b
+
+    def test_feedback_tracks_its_own_table(self, client):
+        etag = client.get('/api/v1/feedback').headers['ETag']
+        client.post('/api/v1/products', json={'name': 'Unrelated', 'price': 1.0})
+        assert client.get('/api/v1/feedback', headers={'If-None-Match': etag}).status_code == 304
+        client.post('/api/v1/feedback', json={'name': 'E', 'email': 'e@example.com', 'message': 'etag'})
+        assert client.get('/api/v1/feedback', headers={'If-None-Match': etag}).status_code == 200
+
+    def test_if_modified_since(self, client):
+        settle('products')
+        future = format_datetime(datetime.now(timezone.utc) + timedelta(days=1), usegmt=True)
+        assert client.get('/api/v1/products', headers={'If-Modified-Since': future}).status_code == 304
+        past = format_datetime(datetime(2000, 1, 1, tzinfo=timezone.utc), usegmt=True)
+        assert client.get('/api/v1/products', headers={'If-Modified-Since': past}).status_code == 200
+
+    def test_change_in_the_current_second(self, client):
+        client.post('/api/v1/products', json={'name': 'Same second', 'price': 1.0})
+        settle('products', seconds=0)
+        r = client.get('/api/v1/products')
+        assert 'Last-Modified' not in r.headers
+        # A date from that same second could predate a later write in it
+        now = format_datetime(datetime.now(timezone.utc), usegmt=True)
+        assert client.get('/api/v1/products', headers={'If-Modified-Since': now}).status_code == 200
+        assert client.get('/api/v1/products', headers={'If-None-Match': r.headers['ETag']}).status_code == 304
+
+    def test_errors_are_not_cacheable(self, client):
+        r = client.get('/api/v1/products/999999')
+        assert r.status_code == 404
+        assert 'ETag' not in r.headers
@@ -0,0 +1,137 @@
+"""EXPLAIN QUERY PLAN regression test for the queries issued by models.py.
+
+Every data-access helper is called with representative arguments while a
+trace callback records its SQL; each statement is then explained and any
+full-table scan (index scans included) fails the test unless the table is in
+TINY_TABLES or the helper is listed in FULL_SCAN_OK.
+"""
+import re
+
+import pytest
+
+import models
+
+# helper name -> why a full scan is expected
+FULL_SCAN_OK = {
+    'get_products': 'lists the whole catalog',
+    'get_products(has_image)': 'non-empty image is not selective',
+    'get_orders': 'lists every order',
+    'get_clients': 'lists every client',
+    'get_all_feedback': 'lists all feedback',
+    'get_feedback_counts_by_type': 'counts every feedback row',
+    'get_orders_matching_email(short)': 'under three characters the trigram index cannot help',
+    'get_orders_matching_email(page)': 'newest-first walk of idx_orders_ts that stops after limit matches',
+}
+
+# table -> why scanning it is fine whatever the data size
+TINY_TABLES = {
+    'status_counts': 'one row per order status',
+}
+
+# Any SCAN is a full pass, "USING [COVERING] INDEX" included; an FTS5
+# "SCAN x VIRTUAL TABLE INDEX n:M..." runs a MATCH against the full-text index
+SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)\b(?! VIRTUAL TABLE INDEX \d+:M)')
+# Schema lookups and FTS5's own statements against its shadow tables
+INTERNAL_RE = re.compile(r"sqlite_master|'main'\.")
+
+
+def scenarios():
+    return [
+        ('get_products', lambda: models.get_products()),
+        ('get_products(page)', lambda: models.get_products(after_id=1, limit=10)),
+        ('get_products(price)', lambda: models.get_products(min_price=1, max_price=50)),
+        ('get_products(has_image)', lambda: models.get_products(has_image=True)),
+        ('get_products(q)', lambda: models.get_products(q='Plan')),
+        ('get_product', lambda: models.get_product(1)),
+        ('update_product', lambda: models.update_product(1, 'Plan product', 2.0)),
+        ('get_orders', lambda: models.get_orders()),
+        ('get_orders(page)', lambda: models.get_orders(after_id=1, limit=10)),
+        ('get_orders_by_email', lambda: models.get_orders_by_email('plan@example.com')),
+        ('get_orders_by_email(page)', lambda: models.get_orders_by_email('plan@example.com', (4102444800, 5), 10)),
+        ('get_orders_by_email(range)', lambda: models.get_orders_by_email('plan@example.com', since=0, until=4102444800)),
+        ('get_orders_in_range', lambda: models.get_orders_in_range(0, 4102444800, limit=10)),
+        ('get_orders_in_range(page)', lambda: models.get_orders_in_range(0, 4102444800, after=(0, 5), limit=10)),
+        ('get_orders_matching_email', lambda: models.get_orders_matching_email('plan@')),
+        ('get_orders_matching_email(short)', lambda: models.get_orders_matching_email('pl')),
+        ('get_orders_matching_email(page)', lambda: models.get_orders_matching_email('plan@', limit=10)),
+        ('get_orders_matching_email(prefix)', lambda: models.get_orders_matching_email('PLAN', match='prefix')),
+        ('get_orders_matching_email(exact)', lambda: models.get_orders_matching_email(' Plan@example.com', match='exact')),
+        ('get_order_details', lambda: models.get_order_details(1)),
+        ('update_order_contact', lambda: models.update_order_contact(1, 'Addr', '')),
+        ('update_order_status', lambda: models.update_order_status(1, 'Нове')),
+        ('delete_order', lambda: models.delete_order(-1)),
+        ('get_orders_with_items', lambda: models.get_orders_with_items(ids=[1, 2])),
+        ('get_orders_with_items(page)', lambda: models.get_orders_with_items(after_id=1, limit=10)),
+        ('get_order_stats_by_status', lambda: models.get_order_stats_by_status()),
+        ('get_order_stats_by_day', lambda: models.get_order_stats_by_day()),
+        ('get_top_products', lambda: models.get_top_products()),
+        ('get_product_sales', lambda: models.get_product_sales(1)),
+        ('get_feedback_counts_by_type', lambda: models.get_feedback_counts_by_type()),
+        ('get_clients', lambda: models.get_clients()),
+        ('get_clients(page)', lambda: models.get_clients(after_id=1, limit=10)),
+        ('get_client', lambda: models.get_client(1)),
+        ('update_client', lambda: models.update_client(-1, 'n', 'e', 'p', 'a')),
+        ('delete_client', lambda: models.delete_client(-1)),
+        ('get_all_feedback', lambda: models.get_all_feedback()),
+        ('get_all_feedback(page)', lambda: models.get_all_feedback(before_id=100, limit=10)),
+        ('get_feedback', lambda: models.get_feedback(1)),
+        ('get_feedback_by_type', lambda: models.get_feedback_by_type('developer')),
+        ('get_feedback_by_type(page)', lambda: models.get_feedback_by_type('developer', before_id=100, limit=10)),
+        ('delete_feedback', lambda: models.delete_feedback(-1)),
+        ('delete_product', lambda: models.delete_product(-1)),
+    ]
+
+
+@pytest.fixture
+def traced_statements(monkeypatch):
+    models.add_product('Plan product', 1.0, '')
+    product = models.get_products(q='Plan product')[0]
+    models.add_order('plan@example.com', 'Addr', {str(product['id']): {'id': product['id'], 'price': 1.0, 'quantity': 1}})
+    models.add_feedback('Plan', 'plan@example.com', 'msg', 'developer')
+
+    # Plans of the SQL path; cached catalog reads issue no queries
+    monkeypatch.setenv('CATALOG_CACHE', '0')
+    statements = []
+    original = models.get_db_connection
+
+    def get_db_connection():
+        conn = original()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(models, 'get_db_connection', get_db_connection)
+    return statements
+
+
+class TestQueryPlans:
+    @pytest.mark.parametrize('name,call', scenarios(), ids=[name for name, _ in scenarios()])
+    def test_queries_use_indexes(self, name, call, traced_statements):
+        call()
+        queries = [s for s in traced_statements
+                   if s.split()[0].upper() in ('SELECT', 'UPDATE', 'DELETE') and not INTERNAL_RE.search(s)]
+        assert queries, f'{name} issued no queries'
+
+        conn = models.get_db_connection()
+        conn.set_trace_callback(None)
+        scans = []
+        for sql in queries:
+            for row in conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall():
+                scan = SCAN_RE.match(row[3])
+                if scan and scan.group(1) not in TINY_TABLES:
+                    scans.append(f'{sql} -> {row[3]}')
+        conn.close()
+
+        if name in FULL_SCAN_OK:
+            return
+        assert not scans, f'{name} does a full table scan:\n' + '\n'.join(scans)
+
+    @pytest.mark.parametrize('term,match', [('plan@exam', 'contains'), ('pl', 'contains'), ('Plan', 'prefix'),
+                                            ('plan@example.com', 'exact')])
+    def test_email_search_without_sort(self, term, match, traced_statements):
+        assert models.get_orders_matching_email(term, match=match)
+        queries = [s for s in traced_statements if s.split()[0].upper() == 'SELECT' and not INTERNAL_RE.search(s)]
+        conn = models.get_db_connection()
+        conn.set_trace_callback(None)
+        plans = [row[3] for sql in queries for row in conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()]
+        conn.close()
+        assert not [step for step in plans if 'TEMP B-TREE' in step], plans
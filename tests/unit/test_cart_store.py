@@ -0,0 +1,151 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import cart_store
+import models
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request):
+    if request.param == 'memory':
+        return cart_store.MemoryCartStore()
+    return cart_store.SQLiteCartStore()
+
+
+class TestCartStore:
+    def test_missing_cart_is_empty(self, store):
+        cart = store.get('nope')
+        assert not cart
+        assert cart.total == 0
+
+    def test_running_total(self, store):
+        cid = cart_store.new_cart_id()
+        store.add(cid, 1, 10.0)
+        store.add(cid, 1, 10.0)
+        store.add(cid, 2, 2.5, quantity=3)
+        cart = store.get(cid)
+        assert cart.lines == {1: 2, 2: 3}
+        assert cart.total == 27.5
+        assert len(cart) == 5
+
+        store.set_quantity(cid, 1, 10.0, 1)
+        assert store.get(cid).total == 17.5
+        store.remove(cid, 2)
+        cart = store.get(cid)
+        assert cart.lines == {1: 1}
+        assert cart.total == 10.0
+
+    def test_total_follows_line_prices(self, store):
+        # Lines leave the total at the price they entered it with
+        cid = cart_store.new_cart_id()
+        store.add(cid, 1, 2.0)
+        store.add(cid, 2, 5.0)
+        store.remove(cid, 1)
+        assert store.get(cid).total == 5.0
+        store.set_quantity(cid, 2, 6.0, 2)
+        assert store.get(cid).total == 12.0
+        store.add(cid, 2, 7.0)
+        cart = store.get(cid)
+        assert cart.total == 21.0
+        assert cart.prices == {2: 7.0}
+        store.remove(cid, 2)
+        cart = store.get(cid)
+        assert not cart
+        assert cart.total == 0
+
+    def test_emptied_cart_total_is_zero(self, store):
+        cid = cart_store.new_cart_id()
+        store.add(cid, 1, 0.1, quantity=3)
+        store.set_quantity(cid, 1, 0.1, 0)
+        assert store.get(cid).total == 0
+        store.remove(cid, 1)
+        assert store.get(cid).total == 0
+
+    def test_clear(self, store):
+        cid = cart_store.new_cart_id()
+        store.add(cid, 1, 5.0)
+        store.clear(cid)
+        assert not store.get(cid)
+
+    def test_carts_are_separate(self, store):
+        store.add('a', 1, 1.0)
+        store.add('b', 2, 2.0)
+        assert store.get('a').lines == {1: 1}
+        assert store.get('b').lines == {2: 1}
+
+    def test_expired_cart_is_empty(self, store):
+        store.ttl = -1
+        store.add('old', 1, 1.0)
+        assert not store.get('old')
+
+    def test_add_to_expired_cart_starts_afresh(self, store, monkeypatch):
+        store.add('stale', 1, 10.0)
+        store.add('stale', 2, 5.0)
+        later = cart_store.DEFAULT_TTL + 60
+        monkeypatch.setattr(cart_store, 'time', SimpleNamespace(time=lambda: time.time() + later,
+                                                               monotonic=lambda: time.monotonic() + later))
+        assert not store.get('stale')
+        store.add('stale', 3, 1.0)
+        cart = store.get('stale')
+        assert cart.lines == {3: 1}
+        assert cart.total == 1.0
+
+
+class TestMemoryCartStore:
+    def test_lru_eviction(self):
+        store = cart_store.MemoryCartStore(max_carts=2)
+        store.add('a', 1, 1.0)
+        store.add('b', 1, 1.0)
+        store.get('a')  # touch: 'b' is now least recently used
+        store.add('c', 1, 1.0)
+        assert store.get('a')
+        assert not store.get('b')
+        assert store.get('c')
+
+
+class TestCartPages:
+    def test_add_update_checkout(self, client):
+        models.add_product('Cart item', 4.0, '')
+        pid = models.get_products(q='Cart item')[0]['id']
+        client.get(f'/add_to_cart/{pid}')
+        client.get(f'/add_to_cart/{pid}')
+        with client.session_transaction() as sess:
+            assert 'cart' not in sess
+            cart_id = sess['cart_id']
+        assert cart_store.get_cart_store().get(cart_id).total == 8.0
+
+        client.post(f'/cart/update/{pid}', data={'quantity': '3'})
+        r = client.get('/cart')
+        assert 'Cart item' in r.get_data(as_text=True)
+        assert '12.0 грн' in r.get_data(as_text=True)
+
+        # the page charges what checkout will, and shows the price the line was added at
+        models.update_product(pid, 'Cart item', 5.0, '')
+        page = client.get('/cart').get_data(as_text=True)
+        assert 'Загальна вартість: 15.0 грн' in page
+        assert '(було 4.0 грн)' in page and 'тоді: 12.0 грн' in page
+        client.post('/checkout', data={'email': 'cart@example.com', 'address': 'A', 'phone': '1'})
+        orders = models.get_orders_by_email('cart@example.com')
+        assert orders[0]['total_price'] == 15.0
+        assert not cart_store.get_cart_store().get(cart_id)
+
+    def test_remove_deleted_product(self, client):
+        models.add_product('Gone item', 2.0, '')
+        models.add_product('Kept item', 5.0, '')
+        gone, kept = (models.get_products(q=name)[0]['id'] for name in ('Gone item', 'Kept item'))
+        client.get(f'/add_to_cart/{gone}')
+        client.get(f'/add_to_cart/{kept}')
+        models.delete_product(gone)
+        page = client.get('/cart').get_data(as_text=True)
+        assert 'Товар більше не продається' in page
+        assert 'Загальна вартість: 5.0 грн' in page
+
+        client.post(f'/cart/remove/{gone}')
+        client.post(f'/cart/remove/{kept}')
+        with client.session_transaction() as sess:
+            cart_id = sess['cart_id']
+        cart = cart_store.get_cart_store().get(cart_id)
+        assert not cart
+        assert cart.total == 0
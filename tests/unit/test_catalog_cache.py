@@ -0,0 +1,60 @@
+import sqlite3
+
+import pytest
+
+import catalog_cache
+import db
+import models
+
+
+@pytest.fixture
+def catalog():
+    cache = catalog_cache.for_db(db.get_db_path())
+    cache.invalidate()
+    return cache
+
+
+class TestCatalogCache:
+    def test_cache_hits_do_not_touch_db(self, catalog, monkeypatch):
+        models.add_product('Cached', 3.0, '')
+        pid = models.get_products(q='Cached')[0]['id']
+        models.get_product(pid)  # load
+
+        def no_db():
+            raise AssertionError('database used on a cache hit')
+        monkeypatch.setattr(models, 'get_db_connection', no_db)
+        assert models.get_product(pid)['name'] == 'Cached'
+        assert any(p['id'] == pid for p in models.get_products(min_price=2, max_price=4))
+
+    def test_writes_patch_the_cache(self, catalog):
+        models.get_products()  # load
+        catalog.check_interval = 3600  # no re-checks: only write-through can update it
+        models.add_product('Write through', 7.0, '')
+        pid = models.get_products(q='Write through')[0]['id']
+        assert models.get_product(pid)['price'] == 7.0
+        models.update_product(pid, 'Write through', 8.0)
+        assert models.get_product(pid)['price'] == 8.0
+        assert pid in [p['id'] for p in models.get_products(min_price=8, max_price=8)]
+        models.delete_product(pid)
+        assert models.get_product(pid) is None
+        assert pid not in [p['id'] for p in models.get_products()]
+
+    def test_other_process_writes_are_noticed(self, catalog, tmp_db_path):
+        models.get_products()  # load
+        catalog.check_interval = 0
+        other = sqlite3.connect(tmp_db_path)
+        pid = other.execute("INSERT INTO products (name, price, image) VALUES ('From elsewhere', 1.0, '')").lastrowid
+        other.commit()
+        other.close()
+        assert models.get_product(pid)['name'] == 'From elsewhere'
+
+    def test_filters_match_sql(self, catalog, monkeypatch):
+        models.add_product('Range A', 11.0, 'img')
+        models.add_product('Range B', 12.0, '')
+        models.add_product('Range C', 13.0, 'img')
+        args = dict(min_price=11, max_price=13, has_image=True)
+        cached = [p['id'] for p in models.get_products(**args)]
+        cached_page = [p['id'] for p in models.get_products(after_id=1, limit=3)]
+        monkeypatch.setenv('CATALOG_CACHE', '0')
+        assert cached == [p['id'] for p in models.get_products(**args)]
+        assert cached_page == [p['id'] for p in models.get_products(after_id=1, limit=3)]
@@ -0,0 +1,106 @@
+import gzip
+import zlib
+
+import pytest
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+import compression
+import models
+from app import app as flask_app
+
+
+@pytest.fixture
+def compressor(monkeypatch):
+    compressor = flask_app.extensions['compression']
+    monkeypatch.setattr(compressor, 'min_size', 0)
+    monkeypatch.setattr(compressor, 'cache', compression.CompressedCache(1024 * 1024))
+    return compressor
+
+
+def accept(header):
+    return parse_accept_header(header, Accept)
+
+
+class TestNegotiation:
+    @pytest.mark.parametrize('header,expected', [
+        ('gzip, deflate', 'gzip'),
+        ('*', 'gzip'),
+        ('gzip;q=0', None),
+        ('*;q=0.5, gzip;q=0', None),
+        ('identity', None),
+        ('', None),
+    ])
+    def test_gzip_only(self, header, expected):
+        encoder = compression.negotiate(accept(header), [compression.Gzip()])
+        assert (encoder and encoder.name) == expected
+
+    @pytest.mark.skipif(compression.brotli is None, reason='brotli not installed')
+    def test_prefers_br_unless_client_ranks_gzip_higher(self):
+        encoders = compression.available_encodings()
+        assert compression.negotiate(accept('gzip, br'), encoders).name == 'br'
+        assert compression.negotiate(accept('gzip, br;q=0.5'), encoders).name == 'gzip'
+
+    def test_gzip_stream_is_one_member(self):
+        chunks = [b'{"id": %d}\n' % i for i in range(100)]
+        assert zlib.decompress(b''.join(compression.Gzip().stream(iter(chunks))), 31) == b''.join(chunks)
+
+    def test_cache_bounded(self):
+        cache = compression.CompressedCache(10)
+        cache.put('a', b'12345')
+        cache.put('b', b'12345')
+        cache.get('a')
+        cache.put('c', b'123')
+        assert cache.get('b') is None and cache.get('a') == b'12345' and cache.get('c') == b'123'
+
+
+class TestCompressionMiddleware:
+    def test_json_compressed(self, client, compressor, sample_products):
+        plain = client.get('/api/v1/products')
+        assert 'Content-Encoding' not in plain.headers
+        assert 'Accept-Encoding' in plain.headers['Vary']
+        r = client.get('/api/v1/products', headers={'Accept-Encoding': 'gzip'})
+        assert r.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in r.headers['Vary']
+        assert gzip.decompress(r.data) == plain.data
+        assert int(r.headers['Content-Length']) == len(r.data)
+
+    def test_small_body_not_compressed(self, client, compressor, monkeypatch):
+        monkeypatch.setattr(compressor, 'min_size', 10 ** 6)
+        r = client.get('/api/v1/health', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in r.headers
+        assert r.get_json()['status'] == 'success'
+
+    def test_compressed_once_per_etag(self, client, compressor, sample_products):
+        headers = {'Accept-Encoding': 'gzip'}
+        first = client.get('/api/v1/products?limit=5', headers=headers)
+        etag = first.headers['ETag'].strip('"')
+        assert etag.endswith('-gzip')
+        second = client.get('/api/v1/products?limit=5', headers=headers)
+        assert second.data == first.data
+        assert (compressor.cache.misses, compressor.cache.hits) == (1, 1)
+
+        # Revalidation with the compressed representation's tag
+        r = client.get('/api/v1/products?limit=5', headers={**headers, 'If-None-Match': first.headers['ETag']})
+        assert r.status_code == 304
+        assert r.headers['ETag'] == first.headers['ETag']
+        assert 'Accept-Encoding' in r.headers['Vary']
+
+        # New data, new tag: compressed again
+        models.add_product('Compressed', 1.0, '')
+        third = client.get('/api/v1/products?limit=5', headers=headers)
+        assert third.headers['ETag'] != first.headers['ETag']
+        assert compressor.cache.misses == 2
+
+    def test_streamed_export(self, client, compressor):
+        models.add_feedback('Stream', 'stream@example.com', 'compressed chunks')
+        plain = client.get('/api/v1/export/feedback.ndjson')
+        r = client.get('/api/v1/export/feedback.ndjson', headers={'Accept-Encoding': 'gzip'})
+        assert r.headers['Content-Encoding'] == 'gzip'
+        assert 'Content-Length' not in r.headers
+        assert gzip.decompress(r.data) == plain.data
+
+    def test_html_page(self, client, compressor):
+        r = client.get('/about', headers={'Accept-Encoding': 'gzip'})
+        assert r.headers['Content-Encoding'] == 'gzip'
+        assert b'</html>' in gzip.decompress(r.data).lower()
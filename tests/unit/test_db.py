@@ -0,0 +1,55 @@
+import threading
+
+import db
+
+
+class TestConnectionPool:
+    def test_same_thread_reuses_connection(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('DB_PATH', str(tmp_path / 'pool.sqlite'))
+        conn = db.get_connection()
+        conn.close()
+        assert db.get_connection() is conn
+        db.close_all()
+
+    def test_close_rolls_back_uncommitted_work(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('DB_PATH', str(tmp_path / 'pool.sqlite'))
+        conn = db.get_connection()
+        conn.execute('CREATE TABLE t (x INTEGER)')
+        conn.commit()
+        conn.execute('INSERT INTO t VALUES (1)')
+        conn.close()
+        conn = db.get_connection()
+        assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+        conn.close()
+        db.close_all()
+
+    def test_nested_close_keeps_outer_transaction(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('DB_PATH', str(tmp_path / 'pool.sqlite'))
+        outer = db.get_connection()
+        outer.execute('CREATE TABLE t (x INTEGER)')
+        outer.execute('INSERT INTO t VALUES (1)')
+        inner = db.get_connection()
+        inner.close()
+        outer.commit()
+        outer.close()
+        assert db.get_connection().execute('SELECT COUNT(*) FROM t').fetchone()[0] == 1
+        db.close_all()
+
+    def test_threads_get_their_own_connection(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('DB_PATH', str(tmp_path / 'pool.sqlite'))
+        main_conn = db.get_connection()
+        seen = []
+        t = threading.Thread(target=lambda: seen.append(db.get_connection()))
+        t.start()
+        t.join()
+        assert seen[0] is not main_conn
+        db.close_all()
+
+    def test_pool_can_be_disabled(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('DB_PATH', str(tmp_path / 'pool.sqlite'))
+        monkeypatch.setenv('DB_POOL', '0')
+        a = db.get_connection()
+        b = db.get_connection()
+        assert a is not b
+        a.close()
+        b.close()
@@ -0,0 +1,75 @@
+import cProfile
+import json
+
+import db
+import diagnostics
+
+
+def read_log(path):
+    return [json.loads(line.split(' ', 3)[3]) for line in path.read_text(encoding='utf-8').splitlines()]
+
+
+class TestSlowQueryLog:
+    def test_slow_statement_logged_with_plan_and_redacted_params(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('LOG_DIR', str(tmp_path))
+        monkeypatch.setenv('SLOW_QUERY_MS', '0.000001')
+        conn = db.connect(str(tmp_path / 'slow.sqlite'))
+        conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, email TEXT)')
+        conn.executemany('INSERT INTO t (email) VALUES (?)', [('a@example.com',), ('b@example.com',)])
+        conn.execute('SELECT id FROM t WHERE email = ? AND id > ?', ('a@example.com', 0)).fetchall()
+        conn.close()
+
+        entries = read_log(tmp_path / 'slow_queries.log')
+        select = next(e for e in entries if e['sql'].startswith('SELECT'))
+        assert select['params'] == ['<str:13>', 0]
+        assert select['duration_ms'] >= 0
+        assert any('SCAN t' in line or 'SEARCH t' in line for line in select['plan'])
+        insert = next(e for e in entries if e['sql'].startswith('INSERT'))
+        assert insert['batch_size'] == 2
+        assert 'example.com' not in (tmp_path / 'slow_queries.log').read_text(encoding='utf-8')
+
+    def test_fast_statements_not_logged(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('LOG_DIR', str(tmp_path))
+        monkeypatch.setenv('SLOW_QUERY_MS', '60000')
+        conn = db.connect(str(tmp_path / 'slow.sqlite'))
+        conn.execute('SELECT 1').fetchall()
+        conn.close()
+        assert not (tmp_path / 'slow_queries.log').exists()
+
+
+class TestRequestProfiler:
+    def test_call_tree(self):
+        def inner():
+            return sum(range(20000))
+
+        def outer():
+            return [inner() for _ in range(5)]
+
+        profile = cProfile.Profile()
+        profile.enable()
+        outer()
+        profile.disable()
+        tree = diagnostics.call_tree(profile, min_share=0)
+        outer_line = next(line for line in tree.splitlines() if ' outer  ' in line)
+        inner_line = next(line for line in tree.splitlines() if ' inner  ' in line)
+        # inner is nested below outer and called 5 times
+        assert len(inner_line) - len(inner_line.lstrip()) > len(outer_line) - len(outer_line.lstrip())
+        assert '5x' in inner_line
+
+    def test_admin_gets_call_tree(self, client, tmp_path, monkeypatch):
+        monkeypatch.setenv('LOG_DIR', str(tmp_path))
+        with client.session_transaction() as sess:
+            sess['admin_logged_in'] = True
+        r = client.get('/api/v1/products', headers={'X-Profile': '1'})
+        assert r.status_code == 200
+        assert r.mimetype == 'text/plain'
+        body = r.get_data(as_text=True)
+        assert body.startswith('GET /api/v1/products -> 200 in ')
+        assert 'get_all_products' in body
+        assert 'get_all_products' in (tmp_path / 'profiles.log').read_text(encoding='utf-8')
+
+    def test_header_ignored_without_admin_session(self, client, tmp_path, monkeypatch):
+        monkeypatch.setenv('LOG_DIR', str(tmp_path))
+        r = client.get('/api/v1/products', headers={'X-Profile': '1'})
+        assert r.is_json
+        assert not (tmp_path / 'profiles.log').exists()
@@ -0,0 +1,159 @@
+import os
+import time
+
+import pytest
+
+import feedback_queue
+import models
+
+
+def stored(submission_id):
+    row = models.get_feedback_by_submission(submission_id)
+    return dict(row) if row else None
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = feedback_queue.FeedbackQueue(str(tmp_path / 'spool'), flush_interval=60)
+    yield q
+    q.stop()
+
+
+def spool_files(directory):
+    return [name for name in os.listdir(directory) if name.endswith(feedback_queue.SPOOL_SUFFIX)]
+
+
+class TestFeedbackQueue:
+    def test_flush_inserts_batch_and_removes_segment(self, queue):
+        ids = [queue.submit(f'User {i}', f'u{i}@example.com', 'Привіт', 'developer') for i in range(3)]
+        assert queue.depth == 3
+        assert stored(ids[0]) is None
+        assert len(spool_files(queue.directory)) == 1
+
+        assert queue.flush()
+        assert queue.depth == 0
+        assert spool_files(queue.directory) == []
+        row = stored(ids[2])
+        assert (row['name'], row['message'], row['feedback_type']) == ('User 2', 'Привіт', 'developer')
+
+    def test_background_flusher(self, tmp_path):
+        q = feedback_queue.FeedbackQueue(str(tmp_path / 'spool'), flush_interval=0.05)
+        try:
+            submission_id = q.submit('Bg', 'bg@example.com', 'later')
+            deadline = time.monotonic() + 5
+            while stored(submission_id) is None and time.monotonic() < deadline:
+                time.sleep(0.02)
+            assert stored(submission_id) is not None
+        finally:
+            q.stop()
+
+    def test_bounded(self, tmp_path):
+        q = feedback_queue.FeedbackQueue(str(tmp_path / 'spool'), max_depth=2, flush_interval=60)
+        try:
+            q.submit('a', 'a@example.com', 'one')
+            q.submit('b', 'b@example.com', 'two')
+            with pytest.raises(feedback_queue.QueueFull):
+                q.submit('c', 'c@example.com', 'three')
+            assert q.rejected == 1
+            assert q.flush()
+            q.submit('c', 'c@example.com', 'three')
+        finally:
+            q.stop()
+
+    def test_failed_flush_keeps_entries(self, queue, monkeypatch):
+        submission_id = queue.submit('Retry', 'retry@example.com', 'msg')
+
+        def fail(entries):
+            raise RuntimeError('database is locked')
+
+        add_feedback_batch = models.add_feedback_batch
+        monkeypatch.setattr(models, 'add_feedback_batch', fail)
+        assert not queue.flush()
+        assert queue.depth == 1 and queue.errors == 1
+        assert len(spool_files(queue.directory)) == 1
+        # not monkeypatch.undo(): that would also undo use_temp_db's patches
+        monkeypatch.setattr(models, 'add_feedback_batch', add_feedback_batch)
+        assert queue.flush()
+        assert stored(submission_id) is not None
+
+    def test_orphaned_segment_replayed_once(self, tmp_path):
+        directory = str(tmp_path / 'spool')
+        crashed = feedback_queue.FeedbackQueue(directory, flush_interval=60)
+        submission_id = crashed.submit('Crash', 'crash@example.com', 'before restart')
+        segment_path = crashed._segment.path
+        with open(segment_path, 'rb') as f:
+            content = f.read()
+        # The owner dies: its lock goes away, the file stays. A torn last line was never acknowledged
+        crashed._segment.close()
+        with open(segment_path, 'ab') as f:
+            f.write(b'{"id": "torn", "na')
+
+        survivor = feedback_queue.FeedbackQueue(directory, flush_interval=60)
+        assert survivor.recover() == 1
+        assert spool_files(directory) == []
+        assert stored(submission_id)['message'] == 'before restart'
+        assert stored('torn') is None
+
+        # Crash after the commit but before the segment was deleted: replay inserts nothing new
+        with open(segment_path, 'wb') as f:
+            f.write(content)
+        survivor.recover()
+        conn = models.get_db_connection()
+        count = conn.execute('SELECT COUNT(*) FROM feedback WHERE submission_id = ?', (submission_id,)).fetchone()[0]
+        conn.close()
+        assert count == 1
+
+    def test_live_segments_not_claimed(self, queue):
+        queue.submit('Live', 'live@example.com', 'still queued')
+        other = feedback_queue.FeedbackQueue(queue.directory, flush_interval=60)
+        assert other.recover() == 0
+        assert queue.depth == 1
+
+
+class TestFeedbackQueueRoutes:
+    @pytest.fixture
+    def queued(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('FEEDBACK_QUEUE', '1')
+        monkeypatch.setenv('FEEDBACK_SPOOL_DIR', str(tmp_path / 'spool'))
+        monkeypatch.setenv('FEEDBACK_FLUSH_INTERVAL', '60')
+        monkeypatch.setattr(feedback_queue, '_queues', {})
+        yield feedback_queue.get_queue()
+        feedback_queue.shutdown()
+
+    def test_api_accepts_with_provisional_id(self, client, queued):
+        r = client.post('/api/v1/feedback', json={'name': 'API', 'email': 'api@example.com', 'message': 'queued'})
+        assert r.status_code == 202
+        submission_id = r.get_json()['data']['provisional_id']
+        assert client.get(f'/api/v1/feedback/submissions/{submission_id}').status_code == 202
+
+        metrics_text = client.get('/metrics').get_data(as_text=True)
+        assert 'feedback_queue_depth{pid="%d"} 1' % os.getpid() in metrics_text
+
+        queued.flush()
+        r = client.get(f'/api/v1/feedback/submissions/{submission_id}')
+        assert r.status_code == 200
+        assert r.get_json()['data']['message'] == 'queued'
+        assert 'feedback_queue_flush_seconds_count' in client.get('/metrics').get_data(as_text=True)
+
+    def test_form_accepts(self, client, queued):
+        r = client.post('/feedback', data={'name': 'Form', 'email': 'form@example.com', 'message': 'hi'})
+        assert r.status_code == 202
+        assert r.get_json()['status'] == 'accepted'
+        queued.flush()
+        assert stored(r.get_json()['provisional_id'])['name'] == 'Form'
+
+    def test_full_queue_answers_503(self, client, queued, monkeypatch):
+        monkeypatch.setattr(queued, 'max_depth', 0)
+        r = client.post('/api/v1/feedback', json={'name': 'X', 'email': 'x@example.com', 'message': 'm'})
+        assert r.status_code == 503
+        assert r.get_json()['code'] == 'FEEDBACK_QUEUE_FULL'
+
+    def test_about_contact_form_accepts_queued(self, client, queued):
+        page = client.get('/about').get_data(as_text=True)
+        # The contact form reports success for any 2xx, so a queued 202 is not shown as an error
+        assert 'if (r.ok)' in page
+        r = client.post('/api/v1/feedback', json={'name': 'Dev', 'email': 'dev@example.com',
+                                                  'message': 'hello', 'feedback_type': 'developer'})
+        assert r.status_code == 202
+        queued.flush()
+        assert stored(r.get_json()['data']['provisional_id'])['feedback_type'] == 'developer'
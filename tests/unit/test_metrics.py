@@ -0,0 +1,63 @@
+import re
+
+import db
+import metrics
+import models
+
+
+class TestMetrics:
+    def test_histogram_render(self):
+        m = metrics.EndpointMetrics(latency_buckets=(0.1, 1.0), query_buckets=(1, 10))
+        labels = ('api', 'api.x', 'GET', 200)
+        m.observe(labels, 0.05, 1, 0.01)
+        m.observe(labels, 0.5, 3, 0.02)
+        m.observe(labels, 5, 30, 0.03)
+        text = m.render()
+        series = r'pid="\d+",blueprint="api",endpoint="api.x",method="GET",status="200"'
+        assert re.search(r'http_request_duration_seconds_bucket\{%s,le="0.1"\} 1' % series, text)
+        assert re.search(r'http_request_duration_seconds_bucket\{%s,le="1.0"\} 2' % series, text)
+        assert re.search(r'http_request_duration_seconds_bucket\{%s,le="\+Inf"\} 3' % series, text)
+        assert re.search(r'http_request_duration_seconds_sum\{%s\} 5.55' % series, text)
+        assert re.search(r'http_request_db_queries_bucket\{%s,le="10"\} 2' % series, text)
+        assert re.search(r'db_queries_total\{%s\} 34' % series, text)
+
+    def test_label_values_are_escaped(self):
+        m = metrics.EndpointMetrics()
+        m.observe(('', 'say "hi"\n', 'GET', 200), 0.01, 0, 0.0)
+        assert 'endpoint="say \\"hi\\"\\n"' in m.render()
+
+    def test_queries_counted_and_timed_per_request(self):
+        stats = metrics._local.stats = metrics.RequestStats()
+        try:
+            conn = db.connect()
+            conn.execute('CREATE TEMP TABLE t (x)')
+            conn.executemany('INSERT INTO t VALUES (?)', [(1,), (2,)])
+            conn.execute('SELECT x FROM t').fetchall()
+            conn.close()
+        finally:
+            metrics._local.stats = None
+        # the PRAGMAs run at connect, CREATE, two INSERTs, SELECT
+        assert stats.queries >= 5
+        assert stats.query_time > 0
+
+    def test_no_stats_outside_requests(self):
+        conn = db.connect()
+        conn.execute('SELECT 1').fetchall()
+        conn.close()
+        assert metrics.current_stats() is None
+
+
+class TestMetricsEndpoint:
+    def test_server_timing_and_metrics(self, client, monkeypatch):
+        # The instrumented pooled connection instead of the plain test connection
+        monkeypatch.setattr(models, 'get_db_connection', db.get_connection)
+        monkeypatch.setenv('CATALOG_CACHE', '0')
+        r = client.get('/api/v1/products')
+        timing = r.headers['Server-Timing']
+        db_timing = re.fullmatch(r'app;dur=[\d.]+, db;dur=[\d.]+;desc="(\d+) queries"', timing)
+        assert db_timing and int(db_timing.group(1)) >= 1
+
+        text = client.get('/metrics').get_data(as_text=True)
+        assert re.search(r'http_request_duration_seconds_count\{pid="\d+",blueprint="api",'
+                         r'endpoint="api.get_all_products",method="GET",status="200"\} \d+', text)
+        assert re.search(r'db_queries_total\{pid="\d+",blueprint="api",endpoint="api.get_all_products",method="GET",status="200"\} [1-9]', text)
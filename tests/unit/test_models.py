@@ -1,7 +1,8 @@
-import pytest
 import sqlite3
 from datetime import datetime
 
+import pytest
+
 import models
 
 
@@ -42,6 +43,59 @@ class TestModels:
         matches = models.get_orders_matching_email('user@exam')
         assert len(matches) >= 1
 
+    def test_get_orders_matching_email_modes(self):
+        ids = [models.add_order(email, 'Addr', {}, '') for email in
+               (' Mode.One@Shop.test', 'mode.one@shop.test', 'mode.two@shop.test', 'other.mode@shop.test')]
+        conn = models.get_db_connection()
+        for day, order_id in enumerate(ids, start=1):
+            conn.execute('UPDATE orders SET date = ? WHERE id = ?', (f'2001-01-0{day} 10:00:00', order_id))
+        conn.commit()
+        conn.close()
+        models.rebuild_sales_stats()
+
+        def found(term, match):
+            return [o['id'] for o in models.get_orders_matching_email(term, match=match)]
+
+        assert found('MODE.ONE@shop.test ', 'exact') == [ids[1], ids[0]]
+        assert found('Mode.', 'prefix') == [ids[2], ids[1], ids[0]]
+        assert found('@shop.test', 'contains') == [ids[3], ids[2], ids[1], ids[0]]
+        assert found('de.o', 'contains') == [ids[1], ids[0]]
+
+    @pytest.mark.parametrize('cost', [0, 10 ** 9], ids=['merge', 'single pass'])
+    def test_email_search_pages_same_either_way(self, monkeypatch, cost):
+        monkeypatch.setattr(models, 'EMAIL_QUERY_COST', cost)
+        ids = [models.add_order(f'Pages{i % 4}@walk.test', 'Addr', {}, '') for i in range(9)]
+        conn = models.get_db_connection()
+        for i, order_id in enumerate(ids):
+            # two orders per second, out of id order
+            conn.execute('UPDATE orders SET date = ? WHERE id = ?', (f'2002-03-04 10:00:0{(i * 7) % 5}', order_id))
+        conn.commit()
+        expected = [row[0] for row in conn.execute("SELECT id FROM orders WHERE email LIKE '%@walk.test' ORDER BY ts DESC, id DESC")]
+        conn.close()
+        models.rebuild_sales_stats()
+        for match, term in (('contains', 'walk.test'), ('prefix', 'pages')):
+            pages, before = [], None
+            while True:
+                page = models.get_orders_matching_email(term, match=match, before=before, limit=2)
+                pages.extend(o['id'] for o in page)
+                if len(page) < 2:
+                    break
+                before = (page[-1]['ts'], page[-1]['id'])
+            assert pages == expected
+
+    def test_order_email_index_follows_changes(self):
+        oid = models.add_order('before@index.test', 'Addr', {}, '')
+        conn = models.get_db_connection()
+        conn.execute('UPDATE orders SET email = ? WHERE id = ?', ('After@Index.test', oid))
+        conn.commit()
+        conn.close()
+        assert [o['id'] for o in models.get_orders_matching_email('after@index')] == [oid]
+        assert models.get_orders_matching_email('before@index') == []
+        models.delete_order(oid)
+        conn = models.get_db_connection()
+        assert conn.execute("SELECT COUNT(*) FROM order_emails WHERE email = 'after@index.test'").fetchone()[0] == 0
+        conn.close()
+
     def test_get_order_details_items(self):
         # create product and an order with that product
         models.add_product('ItemX', 7.5, '')
@@ -75,3 +129,105 @@ class TestModels:
         with pytest.raises(Exception):
             # malformed cart missing price/quantity
             models.add_order('bad@b', 'A', {'x': {'id': 999}}, '')
+
+    def test_add_orders_bulk(self):
+        models.add_product('BulkProd', 3.0, '')
+        pid = models.get_products(q='BulkProd')[0]['id']
+        cart = {str(pid): {'id': pid, 'price': 3.0, 'quantity': 2}}
+        results = models.add_orders_bulk([
+            {'email': 'bulk1@b', 'address': 'A', 'cart': cart, 'idempotency_key': 'bulk-1'},
+            {'email': '', 'address': 'A'},
+            {'email': 'bulk2@b', 'address': 'B', 'cart': {'x': {'id': pid, 'price': 1, 'quantity': 0}}},
+            {'email': 'bulk1@b', 'address': 'A', 'cart': cart, 'idempotency_key': 'bulk-1'},
+            {'email': 'bulk3@b', 'address': 'C'},
+        ])
+        assert [r['status'] for r in results] == ['created', 'invalid', 'invalid', 'duplicate', 'created']
+        assert results[1]['errors'] == ['email is required']
+        assert results[3]['order_id'] == results[0]['order_id']
+        assert results[4]['order_id'] == results[0]['order_id'] + 1
+        order, items = models.get_order_details(results[0]['order_id'])
+        assert order['total_price'] == 6.0
+        assert [item['quantity'] for item in items] == [2]
+
+    def test_add_orders_bulk_retry_is_idempotent(self):
+        batch = [{'email': 'retry@b', 'address': 'A', 'idempotency_key': f'retry-{i}'} for i in range(3)]
+        first = models.add_orders_bulk(batch)
+        second = models.add_orders_bulk(batch)
+        assert [r['status'] for r in second] == ['duplicate'] * 3
+        assert [r['order_id'] for r in second] == [r['order_id'] for r in first]
+        assert len(models.get_orders_by_email('retry@b')) == 3
+
+    def test_add_orders_bulk_ids_follow_deleted_orders(self):
+        # AUTOINCREMENT never reuses ids, bulk ids must not either
+        oid = models.add_order('gone@b', 'A', {}, '')
+        models.delete_order(oid)
+        [result] = models.add_orders_bulk([{'email': 'next@b', 'address': 'A'}])
+        assert result['order_id'] > oid
+
+    def test_get_orders_with_items_constant_queries(self, monkeypatch):
+        models.add_product('WithItemsA', 1.0, '')
+        models.add_product('WithItemsB', 2.0, '')
+        a, b = (models.get_products(q=name)[0]['id'] for name in ('WithItemsA', 'WithItemsB'))
+        ids = [models.add_order('wi@b', 'A', {str(a): {'id': a, 'price': 1.0, 'quantity': n},
+                                             str(b): {'id': b, 'price': 2.0, 'quantity': 1}}, '') for n in (1, 2, 3)]
+        empty = models.add_order('wi@b', 'A', {}, '')
+
+        statements = []
+        get_connection = models.get_db_connection
+
+        def traced():
+            conn = get_connection()
+            conn.set_trace_callback(statements.append)
+            return conn
+        monkeypatch.setattr(models, 'get_db_connection', traced)
+
+        orders = models.get_orders_with_items(ids=ids + [empty, 10 ** 9])
+        assert len([s for s in statements if s.startswith('SELECT')]) == 2
+        assert [order['id'] for order in orders] == ids + [empty]
+        assert [item['quantity'] for item in orders[1]['items']] == [2, 1]
+        assert orders[1]['items'][0] == {'product_id': a, 'quantity': 2, 'name': 'WithItemsA', 'price': 1.0}
+        assert orders[3]['items'] == []
+
+        by_email = models.get_orders_with_items(email='wi@b', limit=2)
+        assert [order['id'] for order in by_email] == [empty, ids[2]]
+
+    def _sales_summaries(self):
+        conn = models.get_db_connection()
+        snapshot = {
+            'daily': conn.execute('SELECT day, orders, revenue FROM daily_sales WHERE orders != 0 ORDER BY day').fetchall(),
+            'status': conn.execute('SELECT status, orders, revenue FROM status_counts WHERE orders != 0 ORDER BY status').fetchall(),
+            'products': conn.execute('SELECT product_id, units, orders FROM product_sales WHERE orders != 0 ORDER BY product_id').fetchall(),
+        }
+        conn.close()
+        return {name: [tuple(row) for row in rows] for name, rows in snapshot.items()}
+
+    def test_sales_summaries_follow_order_changes(self):
+        models.add_product('StatsProd', 2.5, '')
+        pid = models.get_products(q='StatsProd')[0]['id']
+        cart = {str(pid): {'id': pid, 'price': 2.5, 'quantity': 4}}
+        kept = models.add_order('stats@b', 'A', cart, '')
+        gone = models.add_order('stats@b', 'A', cart, '')
+        models.add_orders_bulk([{'email': 'stats@b', 'address': 'A', 'cart': cart}])
+        assert models.get_product_sales(pid) == {'product_id': pid, 'units': 12, 'orders': 3}
+
+        models.update_order_status(kept, 'Доставлено')
+        models.update_order_status(kept, 'Доставлено')  # unchanged status: no double count
+        models.delete_order(gone)
+        assert models.get_product_sales(pid)['units'] == 8
+        statuses = {row['status']: row['orders'] for row in models.get_order_stats_by_status()}
+        assert statuses['Доставлено'] >= 1
+
+        incremental = self._sales_summaries()
+        models.rebuild_sales_stats()
+        assert self._sales_summaries() == incremental
+
+    def test_rebuild_sales_stats_repairs_drift(self):
+        conn = models.get_db_connection()
+        conn.execute("UPDATE status_counts SET orders = orders + 100")
+        conn.commit()
+        conn.close()
+        models.rebuild_sales_stats()
+        conn = models.get_db_connection()
+        count = conn.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+        assert conn.execute('SELECT SUM(orders) FROM status_counts').fetchone()[0] == count
+        conn.close()
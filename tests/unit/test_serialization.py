@@ -0,0 +1,126 @@
+import json
+import sqlite3
+from datetime import date
+
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import models
+import serialization
+from serialization import Rows
+
+def sample_rows():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT, price REAL, image TEXT, "50%" INTEGER)')
+    conn.executemany('INSERT INTO t (name, price, image, "50%") VALUES (?, ?, ?, ?)',
+                     [('Чай "зелений"\n', 12.5, None, 1), ('Tea \\ coffee', 3.0, 'a.jpg', 0), ('x', 1e-7, '', -7)])
+    rows = conn.execute('SELECT * FROM t ORDER BY id').fetchall()
+    conn.close()
+    return rows
+
+
+# Providers only hold a weak reference to their app
+APPS = [Flask('stdlib')]
+if serialization.orjson is not None:
+    APPS.append(Flask('fast'))
+    APPS[-1].json = serialization.OrjsonProvider(APPS[-1])
+
+
+def providers():
+    return [app.json for app in APPS]
+
+
+class TestRows:
+    @pytest.mark.parametrize('provider', providers(), ids=lambda p: type(p).__name__)
+    @pytest.mark.parametrize('fields', [None, ('name', 'id'), ('50%',)])
+    def test_same_as_dicts(self, provider, fields):
+        rows = sample_rows()
+        expected = [{field: row[field] for field in (fields or row.keys())} for row in rows]
+        for source in (rows, [dict(row) for row in rows]):
+            encoded = Rows(source, fields).encode(provider)
+            assert json.loads(encoded) == json.loads(json.dumps(expected))
+            # keys in fields order, not sorted
+            assert list(json.loads(encoded)[0]) == list(expected[0])
+
+    def test_stdlib_escapes_like_json(self):
+        provider = Flask('escape').json
+        rows = sample_rows()[:2]
+        expected = json.dumps([dict(row) for row in rows], separators=(',', ':'))
+        assert Rows(rows).encode(provider) == expected
+        provider.ensure_ascii = False
+        assert Rows(rows).encode(provider) == json.dumps([dict(row) for row in rows], separators=(',', ':'), ensure_ascii=False)
+
+    def test_other_values_use_the_provider(self):
+        rows = [{'id': 1, 'day': date(2024, 3, 1), 'tags': ['a'], 'ok': True}]
+        for provider in providers():
+            assert json.loads(Rows(rows).encode(provider)) == [
+                {'id': 1, 'day': 'Fri, 01 Mar 2024 00:00:00 GMT', 'tags': ['a'], 'ok': True}]
+
+    def test_empty(self):
+        assert all(json.loads(Rows([]).encode(provider)) == [] for provider in providers())
+
+    def test_parse_fields(self):
+        assert serialization.parse_fields(None, ('id', 'name')) is None
+        assert serialization.parse_fields(' name,id,name ', ('id', 'name')) == ['name', 'id']
+        with pytest.raises(ValueError):
+            serialization.parse_fields('id,password', ('id', 'name'))
+        with pytest.raises(ValueError):
+            serialization.parse_fields(',', ('id', 'name'))
+
+
+@pytest.mark.skipif(serialization.orjson is None, reason='orjson not installed')
+class TestOrjsonProvider:
+    def test_matches_default_provider(self):
+        app = Flask('orjson')
+        fast = serialization.OrjsonProvider(app)
+        value = {'b': [1, 2.5, None, 'ї', True], 'a': date(2024, 1, 2)}
+        assert json.loads(fast.dumps(value)) == json.loads(DefaultJSONProvider(app).dumps(value))
+        assert fast.loads(b'{"x": [1, "\\u0457"]}') == {'x': [1, 'ї']}
+        # beyond orjson's 64-bit integers: stdlib fallback
+        assert json.loads(fast.dumps({'n': 2 ** 70})) == {'n': 2 ** 70}
+
+    def test_invalid_request_json_is_400(self, client):
+        r = client.post('/api/v1/products', data='{"name": ', content_type='application/json')
+        assert r.status_code == 400
+
+
+class TestSparseFieldsets:
+    def test_products(self, client, sample_products):
+        r = client.get('/api/v1/products?fields=name,price&limit=2')
+        assert r.status_code == 200
+        body = r.get_json()
+        assert [list(product) for product in body['data']] == [['name', 'price'], ['name', 'price']]
+        # the cursor still works without id in the fieldset
+        assert client.get(f"/api/v1/products?fields=name&limit=2&cursor={body['next_cursor']}").status_code == 200
+
+        product_id = client.get('/api/v1/products?fields=id&limit=1').get_json()['data'][0]['id']
+        assert client.get(f'/api/v1/products/{product_id}?fields=id,name').get_json()['data'].keys() == {'id', 'name'}
+
+    def test_only_requested_columns_selected(self, sample_products, monkeypatch):
+        monkeypatch.setenv('CATALOG_CACHE', '0')
+        products = models.get_products(limit=2, fields=['id', 'price'])
+        assert products[0].keys() == ['id', 'price']
+        with pytest.raises(ValueError):
+            models.get_products(fields=['id', 'name FROM products; --'])
+
+    def test_orders_and_feedback(self, client):
+        models.add_order('fields@example.com', 'Addr', {})
+        models.add_feedback('Fields', 'fields@example.com', 'hi')
+        r = client.get('/api/v1/orders?email=fields@example.com&fields=total_price,status')
+        assert [set(order) for order in r.get_json()['data']] == [{'total_price', 'status'}]
+        r = client.get('/api/v1/orders?email=fields@example.com&fields=status&include=items')
+        assert [set(order) for order in r.get_json()['data']] == [{'status', 'items'}]
+        r = client.get('/api/v1/feedback?fields=message&limit=1')
+        assert list(r.get_json()['data'][0]) == ['message']
+
+    @pytest.mark.parametrize('url', ['/api/v1/products?fields=id,secret', '/api/v1/orders?fields=nope',
+                                     '/api/v1/feedback/type/general?fields=x'])
+    def test_unknown_field(self, client, url):
+        r = client.get(url)
+        assert r.status_code == 400
+        assert r.get_json()['code'] == 'INVALID_FIELDS'
+
+    def test_empty_fields_means_all(self, client):
+        assert client.get('/api/v1/feedback?fields=').status_code == 200
@@ -1,6 +1,6 @@
 import pytest
 
-from models import get_products, add_product
+from models import get_products, add_product, update_product, delete_product
 
 
 class TestUtils:
@@ -14,3 +14,27 @@ class TestUtils:
         add_product('OrderB', 2.0, '')
         res = get_products()
         assert res[0]['id'] <= res[-1]['id']
+
+    def test_search_matches_description(self):
+        add_product('Plain box', 1.0, '', 'contains a Zephyrine lamp')
+        res = get_products(q='zephyrine')
+        assert [p['name'] for p in res] == ['Plain box']
+
+    def test_search_ranks_name_hits_first(self):
+        add_product('Other thing', 1.0, '', 'works with Quokkatron')
+        add_product('Quokkatron', 1.0, '', '')
+        res = get_products(q='Quokkatron')
+        assert res[0]['name'] == 'Quokkatron'
+
+    def test_search_index_follows_updates_and_deletes(self):
+        add_product('Snarfblat', 1.0, '')
+        pid = get_products(q='Snarfblat')[0]['id']
+        update_product(pid, 'Grommet', 1.0)
+        assert get_products(q='Snarfblat') == []
+        assert get_products(q='Grommet')[0]['id'] == pid
+        delete_product(pid)
+        assert get_products(q='Grommet') == []
+
+    def test_short_search_term_uses_like(self):
+        add_product('Xq', 1.0, '')
+        assert any(p['name'] == 'Xq' for p in get_products(q='xq'))
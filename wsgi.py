@@ -0,0 +1,10 @@
+"""WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The schema migration runs once in the gunicorn master (see
+gunicorn.conf.py), so workers import the app with INIT_DB=0.
+"""
+from app import app
+
+application = app